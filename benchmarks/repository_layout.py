@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+
+"""
+Benchmark of the layouts of StructureRepository
+
+Creates the directories of many entries (only the file metadata.json)
+on a flat and on a sharded repository and compares the time to list all
+the entries from disk and to locate random entries.
+
+Usage:
+    python repository_layout.py [number_of_entries] [directory]
+
+By default 100000 entries are created on a temporary directory, use a
+directory on the filesystem to evaluate (for example a shared filesystem).
+"""
+
+import os
+import sys
+import time
+import uuid
+import random
+import shutil
+import tempfile
+
+from pychemia.db import StructureRepository
+
+
+def populate(repo, identifiers):
+    """
+    Create minimal entries, enough to be found by scan_entries and locate
+    """
+    for ident in identifiers:
+        path = repo.entry_path(ident)
+        os.makedirs(path)
+        wf = open(path + '/metadata.json', 'w')
+        wf.write('{"children": [], "parents": [], "tags": []}')
+        wf.close()
+
+
+def benchmark(repo, identifiers, nlookups=1000):
+    """
+    Times to list all the entries and to locate random entries
+
+    :return: (tuple) Seconds to scan the repository and average seconds for one lookup
+    """
+    start = time.time()
+    found = repo.scan_entries()
+    scan_time = time.time() - start
+    if len(found) != len(identifiers):
+        raise ValueError('Found %d entries instead of %d' % (len(found), len(identifiers)))
+
+    sample = random.sample(identifiers, min(nlookups, len(identifiers)))
+    start = time.time()
+    for ident in sample:
+        repo.locate(ident)
+    lookup_time = (time.time() - start) / len(sample)
+    return scan_time, lookup_time
+
+
+if __name__ == '__main__':
+
+    nentries = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    basedir = tempfile.mkdtemp(dir=sys.argv[2] if len(sys.argv) > 2 else None)
+    random.seed(0)
+    identifiers = [str(uuid.uuid4()) for i in range(nentries)]
+
+    try:
+        print '%10s %12s %12s %14s' % ('layout', 'create [s]', 'scan [s]', 'lookup [s]')
+        for layout in StructureRepository.layouts:
+            repo = StructureRepository(basedir + '/' + layout, layout=layout)
+            start = time.time()
+            populate(repo, identifiers)
+            create_time = time.time() - start
+            scan_time, lookup_time = benchmark(repo, identifiers)
+            print '%10s %12.3f %12.3f %14.3E' % (layout, create_time, scan_time, lookup_time)
+            repo.index.close()
+
+        # Time to migrate the flat repository
+        repo = StructureRepository(basedir + '/flat')
+        start = time.time()
+        repo.migrate('sharded')
+        print 'Migration of %d entries from flat to sharded: %.3f s' % (nentries, time.time() - start)
+        repo.index.close()
+    finally:
+        shutil.rmtree(basedir)
@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+
+"""
+Benchmark of the wrapping of reduced coordinates
+
+Compares the array implementation of pychemia.utils.mathematics.wrap2_pmhalf
+with the previous implementation based on numpy.vectorize, the results must
+be identical element by element.
+
+Usage:
+    python wrap2_pmhalf.py [size ...]
+"""
+
+import sys
+import timeit
+import numpy as np
+
+from pychemia.utils.mathematics import wrap2_pmhalf
+
+
+def legacy_wrap2_pmhalf(x):
+    """
+    Implementation of wrap2_pmhalf before the vectorization
+    """
+
+    def wrap(num):
+        tol12 = 1e-12
+        if num > 0:
+            ret = (num+0.5-tol12) % 1.0 - 0.5 + tol12
+        else:
+            ret = -(-(num - 0.5 - tol12) % 1.0) + 0.5 + tol12
+        for y in [-0.25, 0.0, 0.25, 0.5]:
+            ret = (lambda num2: y if abs(y-num2) < tol12 else num2)(ret)
+        return ret
+
+    if np.iterable(x):
+        vec = np.vectorize(wrap)
+        return vec(x)
+    else:
+        return wrap(x)
+
+
+def check(values):
+    """
+    Both implementations give exactly the same values
+    """
+    return np.array_equal(legacy_wrap2_pmhalf(values), wrap2_pmhalf(values))
+
+
+def benchmark(size, repeat=3):
+    """
+    Best time of each implementation for an array of reduced coordinates with shape (size, 3)
+
+    :return: (tuple) Times for the previous implementation, the new one and the new one
+             storing the result on a preallocated array
+    """
+    np.random.seed(0)
+    values = 4 * np.random.rand(size, 3) - 2
+    # Include the values where the snapping is applied
+    values[:size / 2] = np.round(4 * values[:size / 2]) / 4
+
+    if not check(values):
+        raise ValueError('Results differ for size %d' % size)
+
+    number = max(1, 100000 / size)
+    out = np.empty(values.shape)
+    times = []
+    for function in [lambda: legacy_wrap2_pmhalf(values),
+                     lambda: wrap2_pmhalf(values),
+                     lambda: wrap2_pmhalf(values, out=out)]:
+        times.append(min(timeit.repeat(function, number=number, repeat=repeat)) / number)
+    return tuple(times)
+
+
+if __name__ == '__main__':
+
+    if len(sys.argv) > 1:
+        sizes = [int(x) for x in sys.argv[1:]]
+    else:
+        sizes = [10, 1000, 100000]
+
+    print '%10s %14s %14s %14s %10s' % ('size', 'vectorize [s]', 'array [s]', 'out [s]', 'speed-up')
+    for size in sizes:
+        old, new, inplace = benchmark(size)
+        print '%10d %14.3E %14.3E %14.3E %10.1f' % (size, old, new, inplace, old / new)
@@ -17,7 +17,10 @@ def helper():
 Computes the hardness of one or several files
 
 Use:
-    hardness.py POSCAR1 [POSCAR2 ...]
+    hardness.py [--nproc N] [--quiet] POSCAR1 [POSCAR2 ...]
+
+    --nproc N   Number of processes used to compute the hardness of the files (default: 1)
+    --quiet     Do not print the details of the computation of each hardness
 """
 
 if __name__ == '__main__':
@@ -26,19 +29,42 @@ if __name__ == '__main__':
         helper()
         sys.exit(1)
 
-    for i in range(1, len(sys.argv)):
+    nproc = 1
+    verbose = True
+    filenames = []
+    i = 1
+    while i < len(sys.argv):
+        if sys.argv[i] == '--nproc':
+            if i + 1 >= len(sys.argv) or not sys.argv[i + 1].isdigit() or int(sys.argv[i + 1]) < 1:
+                print 'The option --nproc requires a positive integer'
+                helper()
+                sys.exit(1)
+            nproc = int(sys.argv[i + 1])
+            i += 2
+            continue
+        elif sys.argv[i] == '--quiet':
+            verbose = False
+            i += 1
+            continue
+        elif sys.argv[i] == '--help':
+            helper()
+            sys.exit()
         filename = sys.argv[i]
+        i += 1
         if not os.path.exists(filename):
             print 'Filename not found ', filename
             continue
+        filenames.append(filename)
 
-        structure = pychemia.code.vasp.read_poscar(filename)
-        analysis = pychemia.analysis.StructureAnalysis(structure, supercell=(2, 2, 2))
-        print 'File : ', filename
+    structures = [pychemia.code.vasp.read_poscar(filename) for filename in filenames]
+    results = pychemia.analysis.hardness_batch(structures, nproc=nproc, supercell=(2, 2, 2), use_laplacian=True,
+                                               verbose=verbose)
+
+    for i in range(len(filenames)):
+        hardness, r_cutoff, coordination = results[i]
+        print 'File : ', filenames[i]
         print 40*'='+' structure '+40*'='
-        print structure
+        print structures[i]
         print 40*'='+' structure '+40*'='
-
-        hardness, r_cutoff = analysis.hardness(use_laplacian=True, verbose=True)
         print 'Hardness : ', hardness
         print 'Cutoff radius :', r_cutoff
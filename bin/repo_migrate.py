@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+
+import os
+import sys
+
+from pychemia.db import StructureRepository
+
+
+def helper():
+    print(""" Move the entries of a structure repository to a new layout
+   Use:
+
+       repo_migrate.py --path 'Repository_Path' --layout [ flat | sharded ]
+
+   The migration can be interrupted and executed again to move the remaining entries
+   """)
+
+
+if __name__ == '__main__':
+
+    # Script starts from here
+    if len(sys.argv) < 2:
+        helper()
+        sys.exit(1)
+
+    path = ''
+    layout = 'sharded'
+    for i in range(1, len(sys.argv)):
+        if sys.argv[i].startswith('--'):
+            option = sys.argv[i][2:]
+            # fetch sys.argv[1] but without the first two characters
+            if option == 'version':
+                print('Version 1.0')
+                sys.exit()
+            elif option == 'help':
+                helper()
+                sys.exit()
+            elif option == 'path':
+                path = sys.argv[i + 1]
+            elif option == 'layout':
+                layout = sys.argv[i + 1]
+            else:
+                print('Unknown option. --' + option)
+
+    if not os.path.isfile(path + '/db.json'):
+        print('No repository found on: ' + path)
+        sys.exit(1)
+
+    repo = StructureRepository(path)
+    print('Current layout: ' + repo.layout)
+    repo.migrate(layout, verbose=True)
@@ -1,5 +1,8 @@
 __author__ = 'Guillermo Avendano-Franco'
 
-from _structure import StructureAnalysis
+from _structure import StructureAnalysis, hardness_kernel, hardness_batch
 from _entry import EntryAnalysis
-from _changer import StructureChanger
\ No newline at end of file
+from _changer import StructureChanger
+from _fingerprint import FingerprintCache
+from _duplicates import DuplicateIndex, canonical_hash, composition_key
+from _matcher import StructureMatcher
@@ -72,7 +72,9 @@ class StructureChanger():
 
     def move_one_atom(self, index, vector):
 
-        self.new_structure.positions[index] += vector
+        positions = self.new_structure.positions.copy()
+        positions[index] += vector
+        self.new_structure.set_positions(positions)
 
         self.operations.append({'move_one_atom': (index, vector)})
 
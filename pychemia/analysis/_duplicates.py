@@ -0,0 +1,220 @@
+"""
+Detection of duplicated structures
+
+Each structure is summarized in a canonical hash that does not depend on the
+order of the atoms, the origin or the choice of the cell. The values entering
+in the hash are quantized with a given tolerance, so structures slightly
+different share the same hash. The hash is used as the key of a dictionary
+and only the structures with the same key are compared in detail.
+"""
+
+__author__ = 'Guillermo Avendano-Franco'
+
+import bisect
+import hashlib
+import numpy as np
+import scipy.spatial.distance
+
+from pychemia.core.neighbors import NeighborList
+
+
+def _close_pairs(structure):
+    """
+    Distances between pairs of atoms that are enough to know the closest neighbor
+    of each atom. For crystals the periodic images inside a sphere with the radius
+    of the shortest lattice vector are used, for other structures all the pairs
+
+    :param structure: (Structure) The structure
+
+    :return: (tuple) Three numpy arrays: the indices i, the indices j and the distances
+    """
+    if structure.is_crystal:
+        # An atom has always one image at the length of the shortest lattice vector
+        radius = np.min(np.sqrt(np.sum(structure.lattice.get_reduced_cell()[0] ** 2, axis=1)))
+        nl = NeighborList.build(structure.cell, structure.reduced, radius * (1 + 1E-6))
+        other = np.logical_or(nl.pairs[:, 0] != nl.pairs[:, 1], np.any(nl.images != 0, axis=1))
+        return nl.pairs[other, 0], nl.pairs[other, 1], nl.distances[other]
+    pairs_i, pairs_j = np.triu_indices(structure.natom, 1)
+    return pairs_i, pairs_j, scipy.spatial.distance.pdist(structure.positions)
+
+
+def canonical_hash(structure, tolerance=0.05, symprec=None):
+    """
+    Computes a hash of a structure that does not depend on the order of the atoms, the
+    origin of coordinates or the choice of the cell. It is built from the number of
+    atoms of each species, the lengths of the Delaunay reduced lattice vectors, the
+    distance from each atom to its closest neighbor, the closest distance between
+    atoms of each pair of species and optionally the space group.
+    Lengths are quantized in units of 'tolerance', two structures with the same hash are
+    probably equal but equal structures could get different hashes when one of the
+    lengths is close to the boundary between two units.
+
+    :param structure: (Structure) The structure
+    :param tolerance: (float) Quantum for the lengths and distances
+    :param symprec: (float) Tolerance used by spglib to find the space group, if None
+                    the space group is not included
+
+    :rtype : str
+    """
+    key = [tuple(sorted(structure.composition.items()))]
+    if structure.is_crystal:
+        lengths = np.sort(np.sqrt(np.sum(structure.lattice.get_reduced_cell()[0] ** 2, axis=1)))
+        key.append(tuple(np.round(lengths / tolerance).astype(int)))
+
+    # Closest neighbor of each atom and closest distance for each pair of species
+    numbers = structure.numbers
+    pairs_i, pairs_j, distances = _close_pairs(structure)
+    nearest = np.inf * np.ones(structure.natom)
+    np.minimum.at(nearest, pairs_i, distances)
+    np.minimum.at(nearest, pairs_j, distances)
+    # A single atom has no neighbors
+    nearest = np.where(np.isfinite(nearest), np.round(nearest / tolerance), -1).astype(int)
+    order = np.lexsort((nearest, numbers))
+    key.append(tuple(zip(numbers[order], nearest[order])))
+    species_pairs = np.sort(np.column_stack((numbers[pairs_i], numbers[pairs_j])), axis=1)
+    species_pairs, inverse = np.unique(species_pairs[:, 0] * 1000 + species_pairs[:, 1], return_inverse=True)
+    closest = np.inf * np.ones(len(species_pairs))
+    np.minimum.at(closest, inverse, distances)
+    key.append(tuple(zip(species_pairs, np.round(closest / tolerance).astype(int))))
+
+    if symprec is not None:
+        from pychemia.symm import USE_SPGLIB
+        if not USE_SPGLIB:
+            raise ValueError('Spglib is required to include the space group in the hash')
+        from pychemia.symm import Symmetry
+        key.append(Symmetry(structure, tolerance=symprec).number)
+
+    return hashlib.sha1(repr(key)).hexdigest()
+
+
+def composition_key(structure, symprec=None):
+    """
+    Computes a coarse key of a structure from the number of atoms of each species
+    and optionally the space group. Unlike canonical_hash no length enters in the key,
+    so structures with small random differences always get the same key.
+
+    :param structure: (Structure) The structure
+    :param symprec: (float) Tolerance used by spglib to find the space group, if None
+                    the space group is not included
+
+    :rtype : str
+    """
+    key = [tuple(sorted(structure.composition.items())), structure.natom]
+    if symprec is not None:
+        from pychemia.symm import USE_SPGLIB
+        if not USE_SPGLIB:
+            raise ValueError('Spglib is required to include the space group in the key')
+        from pychemia.symm import Symmetry
+        key.append(Symmetry(structure, tolerance=symprec).number)
+    return hashlib.sha1(repr(key)).hexdigest()
+
+
+class DuplicateIndex():
+    """
+    Dictionary of identifiers indexed by the canonical hash of their structures.
+    The identifiers with the same hash are candidates to be duplicates, an optional
+    function 'confirm' receives two identifiers and decides if they are duplicates,
+    if no function is given the same hash is enough.
+    Another function of a structure can replace the canonical hash as the key,
+    for example composition_key when near duplicates must be found. With a coarse
+    key the identifiers of each bucket can be kept sorted by a scalar value, as the
+    energy or the volume, and only those inside a window around the scalar of a new
+    structure are candidates
+    """
+
+    def __init__(self, tolerance=0.05, symprec=None, confirm=None, key=None, window=None):
+        """
+        Creates an empty index
+
+        :param tolerance: (float) Quantum for the lengths and distances (see canonical_hash)
+        :param symprec: (float) Tolerance to compute the space group, None to ignore the space group
+        :param confirm: (function) Function of two identifiers that returns True if they are duplicates
+        :param key: (function) Function of a structure that returns its key, if None
+                    canonical_hash is used with 'tolerance' and 'symprec'
+        :param window: (float) Maximal difference between the scalars of candidates, if None
+                       all the identifiers with the same key are candidates
+        """
+        self.tolerance = tolerance
+        self.symprec = symprec
+        self.confirm = confirm
+        self.key = key
+        self.window = window
+        # Each bucket is a pair of lists, the scalars sorted and their identifiers
+        self._buckets = {}
+        self._keys = {}
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, identifier):
+        return identifier in self._keys
+
+    def get_key(self, structure):
+        """
+        Key of a structure in the index
+
+        :rtype : str
+        """
+        if self.key is not None:
+            return self.key(structure)
+        return canonical_hash(structure, tolerance=self.tolerance, symprec=self.symprec)
+
+    def _candidates(self, key, scalar):
+        if key not in self._buckets:
+            return []
+        scalars, identifiers = self._buckets[key]
+        if self.window is None:
+            return list(identifiers)
+        if scalar is None:
+            raise ValueError('A scalar is required for an index with a window')
+        start = bisect.bisect_left(scalars, scalar - self.window)
+        end = bisect.bisect_right(scalars, scalar + self.window)
+        return identifiers[start:end]
+
+    def get_candidates(self, structure, scalar=None):
+        """
+        Identifiers in the index with the same key that a given structure
+        and a scalar inside the window
+
+        :param structure: (Structure) The structure
+        :param scalar: (float) Scalar value of the structure, required if the index has a window
+
+        :rtype : list
+        """
+        return self._candidates(self.get_key(structure), scalar)
+
+    def add(self, identifier, structure, scalar=None):
+        """
+        Add a structure to the index unless a duplicate is already there
+
+        :param identifier: An identifier for the structure, it is passed to the function 'confirm'
+        :param structure: (Structure) The structure
+        :param scalar: (float) Scalar value of the structure, required if the index has a window
+
+        :return: The identifier of the duplicate found on the index, None if the
+                 structure was added
+        """
+        key = self.get_key(structure)
+        for other in self._candidates(key, scalar):
+            if self.confirm is None or self.confirm(other, identifier):
+                return other
+        if scalar is None:
+            scalar = 0.0
+        scalars, identifiers = self._buckets.setdefault(key, ([], []))
+        position = bisect.bisect_right(scalars, scalar)
+        scalars.insert(position, scalar)
+        identifiers.insert(position, identifier)
+        self._keys[identifier] = key
+        return None
+
+    def remove(self, identifier):
+        """
+        Remove an identifier from the index
+        """
+        key = self._keys.pop(identifier)
+        scalars, identifiers = self._buckets[key]
+        position = identifiers.index(identifier)
+        scalars.pop(position)
+        identifiers.pop(position)
+        if len(identifiers) == 0:
+            self._buckets.pop(key)
@@ -0,0 +1,227 @@
+"""
+Cache for structural fingerprints
+
+The fingerprints are stored with a key built from a canonical hash of
+the geometry and the parameters used to compute them. The most recent
+fingerprints are kept in memory and optionally all of them are stored
+on disk, so several processes can share them.
+"""
+
+__author__ = 'Guillermo Avendano-Franco'
+
+import os
+import hashlib
+import multiprocessing
+import numpy as np
+from collections import OrderedDict
+
+from pychemia import Structure
+from _structure import StructureAnalysis
+
+
+def geometry_hash(structure, decimals=6):
+    """
+    Computes a hash of the geometry of a structure that does not depend on
+    the order of the atoms or on periodic translations of the reduced coordinates
+    by integer values. The cell and coordinates are rounded to a given number of decimals
+
+    :param structure: (Structure) The structure
+    :param decimals: (int) Number of decimals kept from cell and reduced coordinates
+
+    :rtype : str
+    """
+    numbers = structure.numbers
+    if structure.is_crystal:
+        coordinates = np.round(np.array(structure.reduced) % 1.0, decimals) % 1.0
+        cell = np.round(structure.cell, decimals)
+    else:
+        coordinates = np.round(structure.positions, decimals)
+        cell = np.zeros((3, 3))
+    coordinates = coordinates.reshape((-1, 3)) + 0.0
+    order = np.lexsort((coordinates[:, 2], coordinates[:, 1], coordinates[:, 0], numbers))
+
+    sha = hashlib.sha1()
+    sha.update(np.ascontiguousarray(numbers[order], dtype=np.int64).tostring())
+    sha.update(np.ascontiguousarray(cell + 0.0).tostring())
+    sha.update(np.ascontiguousarray(coordinates[order]).tostring())
+    return sha.hexdigest()
+
+
+class FingerprintCache():
+    """
+    Cache of Oganov fingerprints (see StructureAnalysis.fp_oganov).
+    The fingerprints are returned as a tuple with the array of bins and a dictionary
+    whose keys are the pairs of species sorted alphabetically, ie ('O', 'Si').
+    Using the symbols instead of the indices of species makes the fingerprints
+    comparable between structures with the same composition.
+
+    The last 'maxsize' fingerprints used are kept in memory, if a 'path' is given
+    every fingerprint is also stored there as a .npz file and read when needed
+    """
+
+    def __init__(self, maxsize=1000, path=None):
+        """
+        Creates a new cache of fingerprints
+
+        :param maxsize: (int) Maximal number of fingerprints kept in memory
+        :param path: (str) Directory to store the fingerprints on disk, None to keep
+                     the fingerprints only in memory
+        """
+        self.maxsize = maxsize
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+        if self.path is not None and not os.path.isdir(self.path):
+            os.makedirs(self.path)
+
+    def __len__(self):
+        return len(self._cache)
+
+    def __contains__(self, key):
+        return key in self._cache or (self.path is not None and os.path.isfile(self._filename(key)))
+
+    @staticmethod
+    def get_key(structure, delta=0.01, sigma=0.01, rcut=10):
+        """
+        Key for a fingerprint of a given structure and parameters
+
+        :rtype : str
+        """
+        return '%s_%r_%r_%r' % (geometry_hash(structure), float(delta), float(sigma), float(rcut))
+
+    @staticmethod
+    def compute(structure, delta=0.01, sigma=0.01, rcut=10):
+        """
+        Computes the fingerprint of a structure without using the cache
+
+        :return: (tuple) The array of bins and the dictionary of fingerprints
+        """
+        x, fp = StructureAnalysis(structure).fp_oganov(delta=delta, sigma=sigma, rcut=rcut)
+        species = structure.species
+        ret = {}
+        for spec_pair in fp:
+            ret[tuple(sorted([species[spec_pair[0]], species[spec_pair[1]]]))] = fp[spec_pair]
+        return x, ret
+
+    def get(self, structure, delta=0.01, sigma=0.01, rcut=10):
+        """
+        Return the fingerprint of a structure, it is computed only if it is
+        not found in memory or on disk
+
+        :param structure: (Structure) The structure
+        :param delta: (float) Width of the bins
+        :param sigma: (float) Standard deviation of the gaussians
+        :param rcut: (float) Maximal distance considered
+
+        :return: (tuple) The array of bins and the dictionary of fingerprints
+        """
+        return self._get(self.get_key(structure, delta, sigma, rcut), structure, delta, sigma, rcut)
+
+    def _get(self, key, structure, delta, sigma, rcut):
+        if key in self._cache:
+            self.hits += 1
+            value = self._cache.pop(key)
+            self._cache[key] = value
+            return value
+
+        value = self._load(key)
+        if value is None:
+            self.misses += 1
+            value = self.compute(structure, delta, sigma, rcut)
+            self._save(key, value)
+        else:
+            self.hits += 1
+        self._remember(key, value)
+        return value
+
+    def get_many(self, structures, delta=0.01, sigma=0.01, rcut=10, nproc=1):
+        """
+        Return the fingerprints for a list of structures, the fingerprints not
+        found in the cache are computed using a pool of 'nproc' processes
+
+        :param structures: (list) List of Structure objects
+        :param delta: (float) Width of the bins
+        :param sigma: (float) Standard deviation of the gaussians
+        :param rcut: (float) Maximal distance considered
+        :param nproc: (int) Number of processes used to compute the missing fingerprints
+
+        :return: (list) List of tuples with the array of bins and the dictionary of fingerprints
+        """
+        keys = [self.get_key(structure, delta, sigma, rcut) for structure in structures]
+        computed = {}
+        if nproc > 1:
+            missing = {}
+            for key, structure in zip(keys, structures):
+                if key not in self and key not in missing:
+                    missing[key] = structure
+            if len(missing) > 1:
+                pool = multiprocessing.Pool(nproc)
+                values = pool.map(_compute_fingerprint,
+                                  [(missing[key].to_dict(), delta, sigma, rcut) for key in missing])
+                pool.close()
+                pool.join()
+                for key, value in zip(missing.keys(), values):
+                    self.misses += 1
+                    self._save(key, value)
+                    self._remember(key, value)
+                    computed[key] = value
+
+        ret = []
+        for key, structure in zip(keys, structures):
+            if key in computed:
+                ret.append(computed[key])
+            else:
+                ret.append(self._get(key, structure, delta, sigma, rcut))
+        return ret
+
+    def clear(self):
+        """
+        Remove all the fingerprints in memory, the fingerprints on disk are kept
+        """
+        self._cache.clear()
+
+    def _remember(self, key, value):
+        self._cache[key] = value
+        while len(self._cache) > self.maxsize:
+            self._cache.popitem(last=False)
+
+    def _filename(self, key):
+        return self.path + os.sep + key + '.npz'
+
+    def _load(self, key):
+        if self.path is None or not os.path.isfile(self._filename(key)):
+            return None
+        data = np.load(self._filename(key))
+        try:
+            x = data['x']
+            fp = {}
+            for name in data.files:
+                if name != 'x':
+                    fp[tuple(name.split('-'))] = data[name]
+        finally:
+            data.close()
+        return x, fp
+
+    def _save(self, key, value):
+        if self.path is None:
+            return
+        x, fp = value
+        arrays = {'x': x}
+        for spec_pair in fp:
+            arrays['-'.join(spec_pair)] = fp[spec_pair]
+        # Write on a temporal file and rename, other processes never read an incomplete file
+        tmpname = self._filename(key) + '.%d.tmp' % os.getpid()
+        wf = open(tmpname, 'wb')
+        np.savez(wf, **arrays)
+        wf.close()
+        os.rename(tmpname, self._filename(key))
+
+
+def _compute_fingerprint(args):
+    """
+    Computes one fingerprint from a structure dictionary, used by FingerprintCache.get_many
+    on the pool of processes
+    """
+    structure_dict, delta, sigma, rcut = args
+    return FingerprintCache.compute(Structure.from_dict(structure_dict), delta, sigma, rcut)
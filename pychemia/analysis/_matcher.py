@@ -0,0 +1,220 @@
+"""
+Comparison of structures by stages
+
+Two structures are compared with a cascade of tests ordered from the
+cheapest to the most expensive one, the comparison stops at the first
+test that fails. Most pairs of different structures are rejected by
+the first tests without computing fingerprints or alignments.
+"""
+
+__author__ = 'Guillermo Avendano-Franco'
+
+import itertools
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+from pychemia.utils.mathematics import unit_vector
+from _duplicates import _close_pairs
+from _fingerprint import FingerprintCache
+
+
+# Integer combinations of lattice vectors explored to find equivalent bases
+_COMBINATIONS = np.array([x for x in itertools.product(range(-2, 3), repeat=3) if any(x)], dtype=float)
+
+
+class StructureMatcher():
+    """
+    Decides if two structures are the same using a cascade of stages:
+
+        composition: The species and their proportions
+        natom: The number of atoms
+        volume: The volume per atom (only for crystals)
+        shells: The sorted distances from each atom to its closest neighbor
+        fingerprint: The distance between the Oganov fingerprints (only for crystals)
+        alignment: The atoms of both structures are matched after searching for an equivalent
+                   reduced cell and an origin, for non periodic structures the sorted distances
+                   between all pairs of atoms are compared
+
+    The attribute 'counters' counts how many comparisons were rejected on each stage
+    and how many were accepted ('match')
+    """
+
+    stages = ['composition', 'natom', 'volume', 'shells', 'fingerprint', 'alignment']
+
+    def __init__(self, volume_tol=0.05, shell_tol=0.1, fingerprint_tol=0.05, lattice_tol=0.05, distance_tol=0.1,
+                 fingerprints=None, rcut=10):
+        """
+        Creates a new matcher
+
+        :param volume_tol: (float) Maximal relative difference of volume per atom
+        :param shell_tol: (float) Maximal difference between the distances to the closest neighbors
+        :param fingerprint_tol: (float) Maximal distance between fingerprints, the same distance
+                                used by StructurePopulation.distance
+        :param lattice_tol: (float) Maximal relative difference between the metrics of the reduced cells
+        :param distance_tol: (float) Maximal distance between matched atoms
+        :param fingerprints: (FingerprintCache) Cache used for the fingerprints, by default a new one
+        :param rcut: (float) Maximal distance considered on the fingerprints
+        """
+        self.volume_tol = volume_tol
+        self.shell_tol = shell_tol
+        self.fingerprint_tol = fingerprint_tol
+        self.lattice_tol = lattice_tol
+        self.distance_tol = distance_tol
+        self.rcut = rcut
+        if fingerprints is None:
+            self.fingerprints = FingerprintCache()
+        else:
+            self.fingerprints = fingerprints
+        self.counters = None
+        self.reset_counters()
+
+    def reset_counters(self):
+        self.counters = dict((stage, 0) for stage in self.stages)
+        self.counters['match'] = 0
+
+    def report(self):
+        """
+        Table with the number of comparisons that stopped on each stage
+
+        :rtype : str
+        """
+        total = sum(self.counters.values())
+        ret = ''
+        for stage in self.stages + ['match']:
+            fraction = 100.0 * self.counters[stage] / total if total > 0 else 0.0
+            ret += '%12s %8d %6.1f%%\n' % (stage, self.counters[stage], fraction)
+        return ret
+
+    def match(self, structure1, structure2):
+        """
+        Return True if both structures are the same within the tolerances
+
+        :param structure1: (Structure) First structure
+        :param structure2: (Structure) Second structure
+
+        :rtype : bool
+        """
+        stage = self.get_failed_stage(structure1, structure2)
+        if stage is None:
+            self.counters['match'] += 1
+            return True
+        self.counters[stage] += 1
+        return False
+
+    def get_failed_stage(self, structure1, structure2):
+        """
+        Name of the first stage where the structures are found to be different,
+        None if the structures are the same. The counters are not modified
+
+        :rtype : str
+        """
+        if structure1.get_composition().formula != structure2.get_composition().formula:
+            return 'composition'
+        if structure1.natom != structure2.natom:
+            return 'natom'
+        crystal = structure1.is_crystal and structure2.is_crystal
+        if crystal:
+            volume1 = structure1.volume / structure1.natom
+            volume2 = structure2.volume / structure2.natom
+            if abs(volume1 - volume2) > self.volume_tol * 0.5 * (volume1 + volume2):
+                return 'volume'
+        elif structure1.is_crystal or structure2.is_crystal:
+            return 'volume'
+        shells1 = self._shells(structure1)
+        shells2 = self._shells(structure2)
+        if len(shells1) > 0 and np.max(np.abs(shells1 - shells2)) > self.shell_tol:
+            return 'shells'
+        if crystal and self._fingerprint_distance(structure1, structure2) > self.fingerprint_tol:
+            return 'fingerprint'
+        if crystal:
+            aligned = self._align_crystals(structure1, structure2)
+        else:
+            aligned = self._compare_pair_distances(structure1, structure2)
+        if not aligned:
+            return 'alignment'
+        return None
+
+    @staticmethod
+    def _shells(structure):
+        """
+        Distances from each atom to its closest neighbor sorted by species and value
+        """
+        pairs_i, pairs_j, distances = _close_pairs(structure)
+        nearest = np.inf * np.ones(structure.natom)
+        np.minimum.at(nearest, pairs_i, distances)
+        np.minimum.at(nearest, pairs_j, distances)
+        nearest[np.isinf(nearest)] = 0.0
+        return nearest[np.lexsort((nearest, structure.numbers))]
+
+    def _fingerprint_distance(self, structure1, structure2):
+        x1, fp1 = self.fingerprints.get(structure1, rcut=self.rcut)
+        x2, fp2 = self.fingerprints.get(structure2, rcut=self.rcut)
+        dij = []
+        for spec_pair in fp1:
+            dij.append(0.5 * (1.0 - np.dot(unit_vector(fp1[spec_pair]), unit_vector(fp2[spec_pair]))))
+        return np.mean(dij)
+
+    def _compare_pair_distances(self, structure1, structure2):
+        distances1 = np.sort(_close_pairs(structure1)[2])
+        distances2 = np.sort(_close_pairs(structure2)[2])
+        return len(distances1) == 0 or np.max(np.abs(distances1 - distances2)) <= self.distance_tol
+
+    def _align_crystals(self, structure1, structure2):
+        """
+        Search for a reduced cell of the second structure with the same metric that the reduced cell
+        of the first one and for a translation that moves each atom of the second structure close to
+        a different atom of the same specie on the first structure
+        """
+        basis1 = structure1.lattice.get_reduced_cell()[0]
+        basis2 = structure2.lattice.get_reduced_cell()[0]
+        reduced1 = np.linalg.solve(basis1.T, structure1.positions.T).T
+
+        numbers1 = structure1.numbers
+        numbers2 = structure2.numbers
+        species = np.unique(numbers1)
+        # The origin is searched over the atoms of the specie with less atoms
+        anchor = species[np.argmin([np.sum(numbers1 == x) for x in species])]
+        anchor1 = np.where(numbers1 == anchor)[0][0]
+
+        for basis in self._equivalent_bases(basis1, basis2):
+            reduced2 = np.linalg.solve(basis.T, structure2.positions.T).T
+            for anchor2 in np.where(numbers2 == anchor)[0]:
+                shifted = reduced2 + reduced1[anchor1] - reduced2[anchor2]
+                if self._assign(reduced1, numbers1, shifted, numbers2, basis1, species):
+                    return True
+        return False
+
+    def _equivalent_bases(self, basis1, basis2):
+        """
+        Bases of the lattice of 'basis2' with the same metric and handedness that 'basis1'
+        """
+        metric1 = np.dot(basis1, basis1.T)
+        tolerance = self.lattice_tol * np.mean(np.diag(metric1))
+        vectors = np.dot(_COMBINATIONS, basis2)
+        lengths2 = np.sum(vectors ** 2, axis=1)
+        candidates = [vectors[np.abs(lengths2 - metric1[i, i]) <= tolerance] for i in range(3)]
+        handedness = np.sign(np.linalg.det(basis1))
+        ret = []
+        for first, second in itertools.product(candidates[0], candidates[1]):
+            if abs(np.dot(first, second) - metric1[0, 1]) > tolerance:
+                continue
+            for third in candidates[2]:
+                if abs(np.dot(first, third) - metric1[0, 2]) > tolerance or \
+                        abs(np.dot(second, third) - metric1[1, 2]) > tolerance:
+                    continue
+                basis = np.array([first, second, third])
+                if np.sign(np.linalg.det(basis)) == handedness:
+                    ret.append(basis)
+        return ret
+
+    def _assign(self, reduced1, numbers1, reduced2, numbers2, basis, species):
+        for specie in species:
+            atoms1 = reduced1[numbers1 == specie]
+            atoms2 = reduced2[numbers2 == specie]
+            diff = atoms1[:, None, :] - atoms2[None, :, :]
+            diff -= np.round(diff)
+            distances = np.sqrt(np.sum(np.dot(diff, basis) ** 2, axis=2))
+            rows, cols = linear_sum_assignment(distances)
+            if np.max(distances[rows, cols]) > self.distance_tol:
+                return False
+        return True
@@ -2,13 +2,20 @@ __author__ = 'Guillermo Avendano-Franco'
 
 import math
 import sys
+import StringIO
 import itertools
+import multiprocessing
 import numpy as np
 import numpy.linalg
+import scipy.sparse
+import scipy.sparse.csgraph
+from scipy.special import erf
 
 from pychemia import Structure
-from pychemia.utils.periodic import atomic_number, covalent_radius, valence
-from pychemia.utils.mathematics import integral_gaussian
+from pychemia.core.neighbors import NeighborList, get_minimal_distances
+from pychemia.core.supercell import SupercellView
+from pychemia.utils.periodic import atomic_number, covalent_radius, valence, atomic_number_array, \
+    covalent_radius_array, valence_array
 
 
 class StructureAnalysis():
@@ -23,13 +30,14 @@ class StructureAnalysis():
 
     def __init__(self, structure, supercell=(1, 1, 1)):
         assert (isinstance(structure, Structure))
+        supercell = tuple(supercell)
         if supercell != (1, 1, 1):
-            print "Creating supercell"
-            self.structure = structure.supercell(supercell)
-            print 'done'
+            # The atoms of the supercell are not created, see SupercellView
+            self.structure = SupercellView(structure.copy(), supercell)
         else:
             self.structure = structure.copy()
 
+        self._neighbor_list = None
         self._distances = None
         self._pairs = None
         self.supercell = supercell
@@ -40,103 +48,135 @@ class StructureAnalysis():
 
         :return: None
         """
+        self._neighbor_list = None
         self._distances = None
         self._pairs = None
 
+    def neighbor_list(self, radius=50):
+        """
+        Computes the distances for all the atoms and their periodic images
+        inside a sphere of a given radius
+        The distances are computed again only if the radius is larger
+        than the radius used in previous calls
+
+        :param radius: (float) The radius of the sphere were the distances will be computed
+
+        :rtype : NeighborList
+        """
+        if self._neighbor_list is None or radius > self._neighbor_list.radius:
+            if isinstance(self.structure, SupercellView):
+                self._neighbor_list = self.structure.get_neighbor_list(radius)
+            else:
+                self._neighbor_list = NeighborList.build(self.structure.cell, self.structure.reduced, radius)
+            self._distances = None
+            self._pairs = None
+        return self._neighbor_list
+
     def close_distances(self, verbose=False, radius=50):
         """
         Computes the closest distances for all the atoms
+        This is a version of 'neighbor_list' that returns the distances as
+        dictionaries, use 'neighbor_list' for large structures
+
+        :param verbose: (bool) Print some info about the number of distances computed
+        :param radius: (float) The radius of the sphere were the distances will be computed
 
         :return: (tuple) Return a bond's dictionary and distance's list
         """
+        nl = self.neighbor_list(radius=radius)
         if self._pairs is None or self._distances is None:
             if verbose:
-                print 'Computing distances from scratch...'
-            pairs_dict = {}
-            distances_list = []
-            index = 0
-            for i, j in itertools.combinations(range(self.structure.natom), 2):
-                if verbose and index % 100 == 0:
-                    print 'Computing distance between atoms ', i, ' and ', j
-                ret = self.structure.get_cell().distance2(self.structure.reduced[i], self.structure.reduced[j],
-                                                          radius=radius)
-                for k in ret:
-                    if str(i) not in pairs_dict:
-                        pairs_dict[str(i)] = [index]
-                    else:
-                        pairs_dict[str(i)].append(index)
-                    if str(j) not in pairs_dict:
-                        pairs_dict[str(j)] = [index]
-                    else:
-                        pairs_dict[str(j)].append(index)
-                    ret[k]['pair'] = (i, j)
-                    distances_list.append(ret[k])
-                    index += 1
-            for i in range(self.structure.natom):
-                ret = self.structure.get_cell().distance2(self.structure.reduced[i], self.structure.reduced[i])
-                for k in ret:
-                    if str(i) not in pairs_dict:
-                        pairs_dict[str(i)] = [index]
-                    else:
-                        pairs_dict[str(i)].append(index)
-                    ret[k]['pair'] = (i, i)
-                    distances_list.append(ret[k])
-                    index += 1
-            self._pairs = pairs_dict
-            self._distances = distances_list
-
-        # print self.structure.natom
-        #print len(self._pairs)
-        #print len(self._distances)
+                print 'Number of distances computed: ', len(nl)
+            reduced = self.structure.reduced
+            vectors = reduced[nl.pairs[:, 1]] + nl.images - reduced[nl.pairs[:, 0]]
+            self._pairs = {}
+            for i in range(nl.natom):
+                self._pairs[str(i)] = list(nl.get_indices(i))
+            self._distances = [{'distance': nl.distances[index], 'image': vectors[index],
+                                'pair': (int(nl.pairs[index, 0]), int(nl.pairs[index, 1]))}
+                               for index in range(len(nl))]
         return self._pairs, self._distances
 
     def distances_between_species(self, radius=50):
-        bonds_dict, distances = self.close_distances(verbose=False, radius=radius)
+        nl = self.neighbor_list(radius=radius)
+
+        spec_pairs = np.sort(self.structure.species_index[nl.pairs], axis=1)
 
         dist_spec = {}
         for i, j in itertools.combinations_with_replacement(range(self.structure.nspecies), 2):
-            key = tuple(sorted([i, j]))
-            dist_spec[key] = []
-        for idistance in distances:
-            atom_pair = idistance['pair']
-            spec_pair = tuple(self.structure.species.index(self.structure.symbols[x]) for x in atom_pair)
-            key = tuple(sorted(spec_pair))
-            dist_spec[key].append(idistance['distance'])
-        for x in dist_spec:
-            dist_spec[x].sort()
+            mask = np.logical_and(spec_pairs[:, 0] == i, spec_pairs[:, 1] == j)
+            dist_spec[(i, j)] = list(np.sort(nl.distances[mask]))
         return dist_spec
 
-    def structure_distances(self, delta=0.01, sigma=0.01, radius=50, integrated=True):
+    def structure_distances(self, delta=0.01, sigma=0.01, radius=50, integrated=True, dtype=np.float64):
+        """
+        Computes the radial distribution for each pair of species, each distance
+        is smeared with a gaussian and weighted by the inverse of the area of
+        the sphere. Each gaussian is evaluated only on the bins at less than
+        6 sigma from its center
+
+        :param delta: (float) Width of the bins
+        :param sigma: (float) Standard deviation of the gaussians
+        :param radius: (float) Maximal distance considered
+        :param integrated: (bool) If True the integral of the gaussian over each bin is used
+                           instead of the value at the beginning of the bin
+        :param dtype: (numpy.dtype) Type of the returned arrays, use numpy.float32 to save memory
+
+        :return: (tuple) The array with the beginning of each bin and a dictionary with
+                 the distribution for each pair of species
+        """
         dist_spec = self.distances_between_species(radius=radius)
         discrete_rdf = {}
         if radius is None:
             radius = max([max(dist_spec[x]) for x in dist_spec])
         nbins = int((radius + 5 * delta) / delta)
         discrete_rdf_x = np.arange(0, nbins * delta, delta)
+        bins_x = discrete_rdf_x[:nbins]
+
+        nwindow = int(math.ceil(6 * sigma / delta)) + 1
+        window = np.arange(-nwindow, nwindow + 1)
+        # Split the distances in chunks to bound the size of the temporal arrays
+        chunk = max(1, 2 ** 20 // len(window))
         for spec_pair in dist_spec:
-            discrete_rdf[spec_pair] = np.zeros(nbins)
-            for Rij in dist_spec[spec_pair]:
-                if Rij > 0:
-                    for i in range(len(discrete_rdf[spec_pair])):
-                        x = discrete_rdf_x[i]
-                        if not integrated:
-                            discrete_rdf[spec_pair][i] += np.exp(-((x - Rij) ** 2) / (2 * sigma * sigma)) / (
-                                4 * math.pi * Rij * Rij)
-                        else:
-                            discrete_rdf[spec_pair][i] += integral_gaussian(x, x + delta, Rij, sigma) / (
-                                4 * math.pi * Rij * Rij)
+            rdf = np.zeros(nbins)
+            distances = np.array(dist_spec[spec_pair])
+            distances = distances[distances > 0]
+            for start in range(0, len(distances), chunk):
+                rij = distances[start:start + chunk, None]
+                bins = (np.floor(rij / delta)).astype(int) + window
+                valid = np.logical_and(bins >= 0, bins < nbins)
+                x = bins_x[np.clip(bins, 0, nbins - 1)]
+                if not integrated:
+                    values = np.exp(-((x - rij) ** 2) / (2 * sigma * sigma))
+                else:
+                    values = 0.5 * (erf((x + delta - rij) / (sigma * math.sqrt(2.0))) -
+                                    erf((x - rij) / (sigma * math.sqrt(2.0))))
+                values /= 4 * math.pi * rij * rij
+                rdf += np.bincount(bins[valid], weights=values[valid], minlength=nbins)
+            discrete_rdf[spec_pair] = rdf.astype(dtype)
 
         return discrete_rdf_x, discrete_rdf
 
-    def fp_oganov(self, delta=0.01, sigma=0.01, rcut=50):
+    def fp_oganov(self, delta=0.01, sigma=0.01, rcut=50, dtype=np.float64):
+        """
+        Fingerprint from A.R. Oganov and M. Valle (J. Chem. Phys. 130, 104504 (2009))
+        computed from the integrated radial distribution of each pair of species
+
+        :param delta: (float) Width of the bins
+        :param sigma: (float) Standard deviation of the gaussians
+        :param rcut: (float) Maximal distance considered
+        :param dtype: (numpy.dtype) Type of the returned arrays, use numpy.float32 to save memory
+
+        :return: (tuple) The array with the beginning of each bin and a dictionary with
+                 the fingerprint for each pair of species
+        """
         struc_dist_x, struc_dist = self.structure_distances(delta, sigma, rcut)
-        fp_oganov = struc_dist.copy()
+        fp_oganov = {}
         vol = self.structure.volume
         ns = self.structure.composition.values()
         for spec_pair in struc_dist:
-            for i in range(len(struc_dist[spec_pair])):
-                fp_oganov[spec_pair][i] *= vol / (delta * ns[spec_pair[0]] * ns[spec_pair[1]])
-                fp_oganov[spec_pair][i] -= 1
+            factor = vol / (delta * ns[spec_pair[0]] * ns[spec_pair[1]])
+            fp_oganov[spec_pair] = (struc_dist[spec_pair] * factor - 1).astype(dtype)
         return struc_dist_x, fp_oganov
 
     def get_bonds_coordination(self, initial_cutoff_radius=0.8, ensure_conectivity=False, use_laplacian=True,
@@ -145,104 +185,132 @@ class StructureAnalysis():
         Computes simultaneously the bonds for all atoms and the coordination
         number using a multiplicative tolerance for the sum of covalent radius
 
+        If use_laplacian is True the cutoff radius is increased until the graph of bonds
+        is connected and each atom has at least one bond (use_jump=True) or until at
+        least two atoms are bonded (use_jump=False). The minimal cutoff is found by
+        bisection over the sorted ratios between distances and sums of covalent radius,
+        checking the connected components of the sparse graph of bonds. The cutoff is
+        rounded up to the grid initial_cutoff_radius + n * jump, use jump=0 to get the
+        exact minimal cutoff
+
         :param initial_cutoff_radius: (float) Tolerance factor (default is 1.2)
         :param ensure_conectivity: (bool) If True the tolerance of each bond is
                adjusted to ensure that each atom is connected at least once
-        :return: tuple
+        :param use_laplacian: (bool) If True the cutoff radius is increased to connect the atoms
+        :param tol: (float) Not used, kept for compatibility
+        :param jump: (float) Increments for the cutoff radius
+        :param use_jump: (bool) If True the cutoff radius is increased until all the atoms are connected
+        :return: tuple with the bonds of each atom (arrays of indices of distances in the NeighborList),
+                 the coordination, the NeighborList, the tolerances and the final cutoff radius
         """
-        if verbose:
-            print 'Computing all distances...'
-        bonds_dict, distances_list = self.close_distances(verbose=False)
-        if verbose:
-            print 'Number of distances computed: ', len(distances_list)
+        # The species index raises a ValueError for symbols that are not elements
+        covalent = covalent_radius_array(atomic_number_array(self.structure.species)[self.structure.species_index])
+        # Only distances shorter than the cutoff times the largest sum of covalent radius are needed
+        max_covalent = 2.0 * np.max(covalent)
 
         cutoff_radius = initial_cutoff_radius
-        bonds = None
-        coordination = None
-        tolerances = None
+        nl = self.neighbor_list(radius=2.0 * cutoff_radius * max_covalent)
+        proportions = nl.distances / (covalent[nl.pairs[:, 0]] + covalent[nl.pairs[:, 1]])
 
-        while True:
-            if verbose:
-                print 'Current cutoff radius : ', cutoff_radius
-            bonds = []
-            tolerances = []
-            for i in range(self.structure.natom):
-                tole = cutoff_radius
-                while True:
-                    tmp_bonds = []
-                    min_proportion = sys.float_info.max
-                    for j in bonds_dict[str(i)]:
-                        atom1 = self.structure.symbols[distances_list[j]['pair'][0]]
-                        atom2 = self.structure.symbols[distances_list[j]['pair'][1]]
-                        sum_covalent_radius = sum(covalent_radius([atom1, atom2]))
-                        distance = distances_list[j]['distance']
-                        if distance == 0.0:
-                            continue
-                        proportion = distance / sum_covalent_radius
-                        min_proportion = min(min_proportion, proportion)
-                        if proportion <= tole:
-                            tmp_bonds.append(j)
-                    if len(tmp_bonds) == 0 and ensure_conectivity:
-                        tole = min_proportion
-                        cutoff_radius = tole
-                    else:
-                        bonds.append(tmp_bonds)
-                        tolerances.append(min_proportion)
-                        break
-
-            if use_laplacian:
-                size = (self.structure.natom, self.structure.natom)
-                laplacian = np.zeros(size, dtype=np.int8)
-                for listibonds in bonds:
-                    for ibond in listibonds:
-                        data = distances_list[ibond]
-                        i = data['pair'][0]
-                        j = data['pair'][1]
-                        laplacian[i, j] = -1
-                        laplacian[j, i] = -1
-                        # print '%d %d' % (i,j)
-                for i in range(self.structure.natom):
-                    laplacian[i, i] = 0
-                    laplacian[i, i] = -sum(laplacian[i])
+        if use_laplacian and self.structure.natom > 0:
+            while True:
                 if verbose:
-                    print laplacian
-                if np.max(np.abs(laplacian)) == 0:
-                    cutoff_radius += jump
-                    if verbose:
-                        print 'The laplacian is all zero'
-                        print 'Increasing cutoff radius by ', jump, 'A\n'
-                    continue
-
-                # if verbose:
-                #print laplacian
-                #evals, evecs = scipy.sparse.linalg.eigsh(laplacian)
-                ev = numpy.linalg.eigvalsh(laplacian)
-                if verbose:
-                    print 'Number of Eigenvalues close to zero :', sum(ev < tol)
-                    print 'Lowest Eigenvalues :', ev
-                    #print 'Lowest Eigenvalues :', evals
-
-                if sum(ev < tol) > 1 and use_jump:
-                    cutoff_radius += jump
-                    if verbose:
-                        print 'Increasing cutoff radius by ', jump, 'A\n'
+                    print 'Number of distances computed up to %7.3f : %d' % (nl.radius, len(nl))
+                if self._is_connected(nl, proportions, cutoff_radius, use_jump, ensure_conectivity):
+                    minimal_cutoff = cutoff_radius
+                    break
+                # Ratios below this limit are complete on the current list of distances
+                limit = nl.radius / max_covalent
+                candidates = np.unique(proportions[np.logical_and(proportions > cutoff_radius, proportions < limit)])
+                if len(candidates) > 0 and self._is_connected(nl, proportions, candidates[-1], use_jump,
+                                                              ensure_conectivity):
+                    # Bisection for the smallest ratio that connects the atoms
+                    low = 0
+                    high = len(candidates) - 1
+                    while low < high:
+                        middle = (low + high) // 2
+                        if self._is_connected(nl, proportions, candidates[middle], use_jump,
+                                              ensure_conectivity):
+                            high = middle
+                        else:
+                            low = middle + 1
+                    minimal_cutoff = candidates[low]
+                    break
+                # The atoms cannot be connected with the current distances
+                cutoff_radius = max(cutoff_radius, limit)
+                nl = self.neighbor_list(radius=2.0 * nl.radius)
+                proportions = nl.distances / (covalent[nl.pairs[:, 0]] + covalent[nl.pairs[:, 1]])
+
+            cutoff_radius = initial_cutoff_radius
+            if minimal_cutoff > initial_cutoff_radius:
+                if jump > 0:
+                    nsteps = math.ceil((minimal_cutoff - initial_cutoff_radius) / jump)
+                    if initial_cutoff_radius + nsteps * jump < minimal_cutoff:
+                        nsteps += 1
+                    cutoff_radius = initial_cutoff_radius + nsteps * jump
                 else:
-                    increase = False
-                    for i in bonds:
-                        if sum(i) == 0 and use_jump:
-                            increase = True
-                    if increase:
-                        cutoff_radius += jump
-                        if verbose:
-                            print 'Increasing cutoff radius by', jump, 'A\n'
-                    else:
-                        break
-            else:
-                break
+                    cutoff_radius = minimal_cutoff
+            if verbose:
+                print 'Minimal cutoff radius to connect the atoms : ', minimal_cutoff
+
+            if cutoff_radius * max_covalent >= nl.radius:
+                nl = self.neighbor_list(radius=2.0 * cutoff_radius * max_covalent)
+                proportions = nl.distances / (covalent[nl.pairs[:, 0]] + covalent[nl.pairs[:, 1]])
 
-        if bonds is not None:
-            coordination = [len(x) for x in bonds]
-        return bonds, coordination, distances_list, tolerances, cutoff_radius
+        if verbose:
+            print 'Current cutoff radius : ', cutoff_radius
+        bonds, tolerances, cutoff_radius = self._bonds(nl, proportions, cutoff_radius, ensure_conectivity)
+
+        coordination = [len(x) for x in bonds]
+        return bonds, coordination, nl, tolerances, cutoff_radius
+
+    @staticmethod
+    def _bonds(nl, proportions, cutoff_radius, ensure_conectivity=False):
+        """
+        Bonds of each atom for a given cutoff radius, a distance is a bond if the ratio between
+        the distance and the sum of covalent radius is not larger than the cutoff.
+        With ensure_conectivity, the atoms are processed in order and an atom without bonds
+        increases the cutoff (for itself and the following atoms) to its minimal ratio
+
+        :return: (tuple) The bonds of each atom, the minimal ratio for each atom and the final cutoff
+        """
+        rows = np.repeat(np.arange(nl.natom), np.diff(nl.offsets))
+        ids = nl.indices
+        nonzero = nl.distances[ids] != 0.0
+
+        min_proportion = np.inf * np.ones(nl.natom)
+        np.minimum.at(min_proportion, rows[nonzero], proportions[ids[nonzero]])
+        has_neighbors = min_proportion < np.inf
+
+        tole = cutoff_radius * np.ones(nl.natom)
+        if ensure_conectivity and np.any(has_neighbors):
+            tole = np.maximum(tole, np.maximum.accumulate(np.where(has_neighbors, min_proportion, -np.inf)))
+            cutoff_radius = max(cutoff_radius, np.max(min_proportion[has_neighbors]))
+
+        keep = np.logical_and(nonzero, proportions[ids] <= tole[rows])
+        bonds = np.split(ids[keep], np.cumsum(np.bincount(rows[keep], minlength=nl.natom))[:-1])
+        tolerances = list(np.where(has_neighbors, min_proportion, sys.float_info.max))
+        return bonds, tolerances, cutoff_radius
+
+    def _is_connected(self, nl, proportions, cutoff_radius, all_atoms=True, ensure_conectivity=False):
+        """
+        Check the bonds for a given cutoff radius.
+        If all_atoms is True, checks if the graph of bonds has a single connected component
+        and every atom has at least one bond (to another atom or to one of its images).
+        Otherwise checks that at least two different atoms are bonded
+
+        :rtype : bool
+        """
+        bonds = self._bonds(nl, proportions, cutoff_radius, ensure_conectivity)[0]
+        if all_atoms and min([len(x) for x in bonds]) == 0:
+            return False
+        pairs = nl.pairs[np.concatenate(bonds)]
+        if not all_atoms:
+            return bool(np.any(pairs[:, 0] != pairs[:, 1]))
+        graph = scipy.sparse.coo_matrix((np.ones(len(pairs)), (pairs[:, 0], pairs[:, 1])),
+                                        shape=(nl.natom, nl.natom))
+        ncomponents = scipy.sparse.csgraph.connected_components(graph, directed=False, return_labels=False)
+        return ncomponents == 1
 
     def hardness(self, verbose=False, initial_cutoff_radius=0.8, ensure_conectivity=False, use_laplacian=True,
                  use_jump=True):
@@ -262,7 +330,7 @@ class StructureAnalysis():
             print "Only internal connectivity can be ensure, for complete connectivity in the crystal you must use a " \
                   "supercell at of (2,2,2)"
 
-        bonds, coordination, all_distances, tolerances, cutoff_radius = \
+        bonds, coordination, nl, tolerances, cutoff_radius = \
             self.get_bonds_coordination(initial_cutoff_radius=initial_cutoff_radius,
                                         ensure_conectivity=ensure_conectivity,
                                         use_laplacian=use_laplacian, verbose=verbose, use_jump=use_jump)
@@ -270,61 +338,28 @@ class StructureAnalysis():
         if verbose:
             print 'Structure coordination : ', coordination
 
-        sigma = 3.0
-        c_hard = 1300.0
-        x = 1.
-        tot = 0.0
-        f_d = 0.0
-        f_n = 1.0
-        atomicnumbers = atomic_number(self.structure.species)
+        species = self.structure.species
+        species_numbers = atomic_number_array(species)
+        # Electronegativity factor of each species
+        species_factors = valence_array(species_numbers) / covalent_radius_array(species_numbers)
+        species_index = self.structure.species_index
 
         if verbose:
-            print 'Atomic numbers in the structure :', atomicnumbers
-
-        for i in atomicnumbers:
-            f_d += valence(i) / covalent_radius(i)
-            f_n *= valence(i) / covalent_radius(i)
-
-        # if verbose:
-        #    print 'fd', f_d
-        #    print 'fn', f_n
-        #    print atomicnumbers
-        if f_d == 0:
-            return 0.0
-        f = 1.0 - (len(atomicnumbers) * f_n ** (1.0 / len(atomicnumbers)) / f_d) ** 2
+            print 'Atomic numbers in the structure :', species_numbers
 
         # Selection of different bonds
-        diff_bonds = np.unique(np.array(reduce(lambda xx, y: xx + y, bonds)))
+        diff_bonds = np.unique(np.concatenate(bonds))
         if verbose:
             print 'Number of different bonds : ', len(diff_bonds)
 
-        for i in diff_bonds:
-            i1 = all_distances[i]['pair'][0]
-            i2 = all_distances[i]['pair'][1]
-
-            ei = valence(self.structure.symbols[i1]) / covalent_radius(self.structure.symbols[i1])
-            ej = valence(self.structure.symbols[i2]) / covalent_radius(self.structure.symbols[i2])
-            #print 'bond ->', sqrt(ei * ej), (coordination[i1] * coordination[i2]), all_distances[i]['distance']
-
-            sij = math.sqrt(ei * ej) / (coordination[i1] * coordination[i2]) / all_distances[i]['distance']
-            num_i_j_bonds = len([j for j in diff_bonds if i1 in all_distances[j]['pair'] and
-                                 i2 in all_distances[j]['pair']])
-            #print 'sij', sij
-            #print 'num_i_j_bonds', num_i_j_bonds
-            tot += num_i_j_bonds
-            x *= sij
-            #print 'x', x
-
         vol = self.structure.volume
         if verbose:
             print "Structure volume:", vol
-            #print("f:", f)
-            #print("x:", x)
 
-        #print 'len_bonds', len(diff_bonds
-        hardness_value = c_hard / vol * (len(diff_bonds) * x ** (1. / (len(diff_bonds)))) * math.exp(-sigma * f)
+        hardness_value = hardness_kernel(species_factors, species_index, coordination, nl.pairs[diff_bonds],
+                                         nl.distances[diff_bonds], vol)
 
-        return round(hardness_value, 3), cutoff_radius, coordination
+        return round(hardness_value, 3), cutoff_radius, list(coordination)
 
     def get_bonds(self, radius, noupdate=False, verbose=False, tolerance=0.05):
         """
@@ -354,9 +389,10 @@ class StructureAnalysis():
             ndifbonds = 0
             found = False
             # lap_mat[i,j] = lap_mat[j,i]
+            min_distances = get_minimal_distances(self.structure.cell, self.structure.reduced, radius)
             for i in range(n - 1):
                 for j in range(i + 1, n):
-                    dis = self.structure.get_distance(i, j, with_periodicity=True)
+                    dis = min_distances[i, j]
                     if dis < radius:
                         if len(dis_dic) != 0:
                             for kstr, kj in dis_dic.items():
@@ -421,8 +457,7 @@ class StructureAnalysis():
         :rtype : (float)
         """
 
-        superc = self.structure.copy()
-        superc.supercell(2, 2, 2)
+        superc = self.structure.copy().supercell((2, 2, 2))
         structure_analisys = StructureAnalysis(superc)
 
         natom = superc.natom
@@ -479,3 +514,85 @@ class StructureAnalysis():
             print hardness_value
 
         return round(hardness_value, 3)
+
+
+def hardness_kernel(species_factors, species_index, coordination, bond_pairs, bond_distances, volume):
+    """
+    Computes the hardness from the bonds of a structure, all the
+    operations are done over arrays with one value per bond
+
+    :param species_factors: (numpy.ndarray) Ratio between valence and covalent radius for each species
+    :param species_index: (numpy.ndarray) Index of the species for each atom
+    :param coordination: (numpy.ndarray) Coordination number for each atom
+    :param bond_pairs: (numpy.ndarray) Indices of the atoms for each bond (Nx2)
+    :param bond_distances: (numpy.ndarray) Length of each bond
+    :param volume: (float) Volume of the cell
+
+    :rtype : (float)
+    """
+    sigma = 3.0
+    c_hard = 1300.0
+    species_factors = np.array(species_factors, dtype=float)
+    nspecies = len(species_factors)
+    f_d = np.sum(species_factors)
+    if f_d == 0 or len(bond_distances) == 0:
+        return 0.0
+    f_n = np.prod(species_factors)
+    f = 1.0 - (nspecies * f_n ** (1.0 / nspecies) / f_d) ** 2
+
+    electroneg = species_factors[np.array(species_index)]
+    coordination = np.array(coordination)
+    bond_pairs = np.array(bond_pairs).reshape((-1, 2))
+    i1 = bond_pairs[:, 0]
+    i2 = bond_pairs[:, 1]
+    sij = np.sqrt(electroneg[i1] * electroneg[i2]) / (coordination[i1] * coordination[i2]) / bond_distances
+
+    # Geometric mean from the sum of logarithms, the product of many bonds underflows
+    with np.errstate(divide='ignore'):
+        mean_sij = np.exp(np.mean(np.log(sij)))
+
+    return c_hard / volume * len(bond_distances) * mean_sij * math.exp(-sigma * f)
+
+
+def hardness_batch(structures, nproc=1, supercell=(1, 1, 1), **kwargs):
+    """
+    Computes the hardness for a list of structures distributing
+    the structures over a pool of processes. The output printed by each
+    process is collected and printed in the order of the structures
+
+    :param structures: (list) List of Structure objects
+    :param nproc: (int) Number of processes
+    :param supercell: (tuple) Supercell used for each structure
+    :param kwargs: Extra arguments for StructureAnalysis.hardness
+
+    :return: (list) Tuples (hardness, cutoff radius, coordination) for each structure
+    """
+    if nproc > 1 and len(structures) > 1:
+        # The output of each worker is collected and printed in the order of the structures
+        args = [(structure.to_dict(), supercell, kwargs, True) for structure in structures]
+        pool = multiprocessing.Pool(nproc)
+        results = pool.map(_hardness_worker, args)
+        pool.close()
+        pool.join()
+        ret = []
+        for value, output in results:
+            sys.stdout.write(output)
+            ret.append(value)
+    else:
+        ret = [_hardness_worker((structure.to_dict(), supercell, kwargs, False))[0] for structure in structures]
+    return ret
+
+
+def _hardness_worker(args):
+    structure_dict, supercell, kwargs, capture = args
+    if capture:
+        stdout = sys.stdout
+        sys.stdout = StringIO.StringIO()
+    try:
+        analysis = StructureAnalysis(Structure.from_dict(structure_dict), supercell=supercell)
+        value = analysis.hardness(**kwargs)
+        output = sys.stdout.getvalue() if capture else ''
+    finally:
+        if capture:
+            sys.stdout = stdout
+    return value, output
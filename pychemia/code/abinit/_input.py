@@ -319,9 +319,9 @@ class InputVariables:
             else:
                 symbols.append(atomic_symbol(int(znucl[typat[i] - 1])))
         # POSITIONS
-        xangst = _np.array(self.get_value('xangst', idtset))
-        xcart = _np.array(self.get_value('xcart', idtset))
-        xred = _np.array(self.get_value('xred', idtset))
+        xangst = self.get_value('xangst', idtset)
+        xcart = self.get_value('xcart', idtset)
+        xred = self.get_value('xred', idtset)
         rprim = self.get_value('rprim', idtset)
         acell = _np.array(self.get_value('acell', idtset))
 
@@ -339,33 +339,24 @@ class InputVariables:
         rprimd[1] = rprim[1] * acell
         rprimd[2] = rprim[2] * acell
 
+        positions = None
+        reduced = None
         if xangst is not None:
-            positions = xangst.reshape((natom, 3))
+            positions = _np.array(xangst).reshape((natom, 3))
             if units == 'bohr':
                 positions = positions * angstrom_bohr
         elif xcart is not None:
-            positions = xcart.reshape((natom, 3))
+            positions = _np.array(xcart).reshape((natom, 3))
             if units == 'angstrom':
                 positions = positions * bohr_angstrom
         elif xred is not None:
-            xred = xred.reshape(3, natom)
-            xcart = _np.zeros(3, natom)
-
-            for i in range(natom):
-                xcart[i] = xred[0, i] * rprimd[0] + xred[1, i] * rprimd[1] + xred[2, i] * rprimd[2]
-
-            positions = xcart
-            if units == 'angstrom':
-                positions = positions * bohr_angstrom
-
-        else:
-            positions = None
+            reduced = _np.array(xred).reshape((natom, 3))
 
         if units == 'angstrom':
             rprimd = rprimd * bohr_angstrom
 
         # Create an object atomic_structure
-        crystal = Structure(natom=natom, symbols=symbols, positions=positions, cell=rprimd)
+        crystal = Structure.from_arrays(symbols, positions=positions, reduced=reduced, cell=rprimd)
 
         return crystal
 
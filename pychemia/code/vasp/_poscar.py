@@ -26,11 +26,9 @@ def read_poscar(path):
         print("POSCAR path not found")
         return
 
-    structure = pychemia.core.Structure()
-
     # Reading the POSCAR file
     rf = open(poscarfile, 'r')
-    structure.comment = rf.readline().strip()
+    comment = rf.readline().strip()
     latconst = float(rf.readline())
     newcell = _np.zeros((3, 3))
 
@@ -38,10 +36,6 @@ def read_poscar(path):
     newcell[1, :] = latconst * _np.array([float(x) for x in rf.readline().split()])
     newcell[2, :] = latconst * _np.array([float(x) for x in rf.readline().split()])
 
-    structure.set_cell(newcell)
-
-    # The call to add_atom naturally will increase the
-    # internal variable crystal.natom
     line = rf.readline()
     species = None
     try:
@@ -68,12 +62,14 @@ def read_poscar(path):
     else:
         kmode = 'Direct'
 
-    for i in range(natom):
-        pos = [float(x) for x in rf.readline().split()]
-        if kmode == 'Cartesian':
-            structure.add_atom(symbols[i], pos, option='cartesian')
-        elif kmode == 'Direct':
-            structure.add_atom(symbols[i], pos, option='reduced')
+    # All the coordinates are read before creating the structure
+    coordinates = _np.array([[float(x) for x in rf.readline().split()[:3]] for i in range(natom)]).reshape((-1, 3))
+    rf.close()
+
+    if kmode == 'Cartesian':
+        structure = pychemia.core.Structure.from_arrays(symbols, positions=coordinates, cell=newcell, comment=comment)
+    else:
+        structure = pychemia.core.Structure.from_arrays(symbols, reduced=coordinates, cell=newcell, comment=comment)
 
     return structure
 
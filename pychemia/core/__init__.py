@@ -6,6 +6,9 @@ atomic structure objects
 from structure import Structure
 from lattice import Lattice
 from composition import Composition
+from neighbors import NeighborList
+from supercell import SupercellView
+from generator import random_structures
 
 #__all__ = filter(lambda s: not s.startswith('_'), dir())
 
@@ -1,76 +1,194 @@
 """
-Delaunay Reduction
+Delaunay and Niggli Reductions
+
+Both reductions return the reduced basis as rows of a 3x3 matrix together with
+the integer matrix that transforms the original basis into the reduced one:
+
+    reduced_basis = numpy.dot(transformation, cell)
 """
 
+import itertools
 import numpy as _np
 
+# Pairs of extended bases in the order of a loop over i < j and the other two bases for each pair
+_PAIRS = _np.array([x for x in itertools.combinations(range(4), 2)])
+_OTHERS = _np.array([[k for k in range(4) if k not in x] for x in _PAIRS])
+# Vectors considered for the shortest basis as combinations of the extended bases
+_COMBINATIONS = _np.array([[1, 0, 0, 0], [0, 1, 0, 0], [0, 0, 1, 0], [0, 0, 0, 1],
+                           [1, 1, 0, 0], [0, 1, 1, 0], [1, 0, 1, 0]])
+# Triplets of those vectors in the order of a loop over i < j < k
+_TRIPLETS = _np.array([x for x in itertools.combinations(range(7), 3)])
 
-def get_reduced_bases(cell, tolerance=1e-5):
+
+def get_reduced_bases(cell, tolerance=1e-5, method='delaunay'):
     """
     This is an implementation of Delaunay reduction.
     Some information is found in International table.
+
+    :param cell: (numpy.ndarray) Lattice vectors as rows
+    :param tolerance: (float) Tolerance for the comparisons
+    :param method: (str) 'delaunay' or 'niggli'
+
+    :rtype : numpy.ndarray
     """
-    #print 'get_reduced_bases',tolerance
-    return get_delaunay_reduction(cell, tolerance)
+    return get_reduction(cell, tolerance=tolerance, method=method)[0]
+
 
+def get_reduction(cell, tolerance=1e-5, method='delaunay'):
+    """
+    Reduced basis and the integer transformation matrix from the original basis
 
-def get_delaunay_reduction(lattice, tolerance):
-    #print 'get_delaunay_reduction',tolerance
+    :param cell: (numpy.ndarray) Lattice vectors as rows
+    :param tolerance: (float) Tolerance for the comparisons
+    :param method: (str) 'delaunay' or 'niggli'
+
+    :return: (tuple) The reduced basis and the transformation matrix
+    """
+    if method == 'delaunay':
+        return get_delaunay_reduction(cell, tolerance, transformation=True)
+    elif method == 'niggli':
+        return get_niggli_reduction(cell, tolerance)
+    else:
+        raise ValueError('Unknown reduction method: %s' % method)
+
+
+def get_delaunay_reduction(lattice, tolerance, transformation=False):
     extended_bases = _np.zeros((4, 3), dtype=float)
     extended_bases[:3, :] = lattice
     extended_bases[3] = -_np.sum(lattice, axis=0)
+    # Integer coefficients of the extended bases on the original basis
+    coefficients = _np.zeros((4, 3), dtype=int)
+    coefficients[:3] = _np.eye(3, dtype=int)
+    coefficients[3] = -1
 
     i = 0
     for i in range(100):
-        if reduce_bases(extended_bases, tolerance):
+        if reduce_bases(extended_bases, tolerance, coefficients):
             break
     if i == 99:
         print("Delaunary reduction is failed.")
 
-    shortest = get_shortest_bases_from_extented_bases(extended_bases, tolerance)
+    shortest, matrix = get_shortest_bases_from_extented_bases(extended_bases, tolerance, coefficients)
 
+    if transformation:
+        return shortest, matrix
     return shortest
 
 
-def reduce_bases(extended_bases, tolerance):
-    metric = _np.dot(extended_bases, extended_bases.transpose())
-    #print 'reduce_bases'
-    for i in range(4):
-        for j in range(i + 1, 4):
-            if metric[i][j] > tolerance:
-                for k in range(4):
-                    if (not k == i) and (not k == j):
-                        extended_bases[k] += extended_bases[i]
-                extended_bases[i] = -extended_bases[i]
-                extended_bases[j] = extended_bases[j]
-                return False
+def reduce_bases(extended_bases, tolerance, coefficients=None):
+    """
+    One step of the reduction, the first pair of extended bases with
+    a positive scalar product is modified in place
 
-    # Reduction is completed.
-    # All non diagonal elements of metric tensor is negative.
-    return True
+    :return: (bool) True if the reduction is completed
+    """
+    metric = _np.dot(extended_bases, extended_bases.T)
+    positive = metric[_PAIRS[:, 0], _PAIRS[:, 1]] > tolerance
+    ipair = _np.argmax(positive)
+    if not positive[ipair]:
+        # Reduction is completed.
+        # All non diagonal elements of metric tensor is negative.
+        return True
+
+    i = _PAIRS[ipair, 0]
+    others = _OTHERS[ipair]
+    for array in [extended_bases, coefficients]:
+        if array is not None:
+            array[others] += array[i]
+            array[i] = -array[i]
+    return False
+
+
+def get_shortest_bases_from_extented_bases(extended_bases, tolerance, coefficients=None):
+    """
+    Shortest three linearly independent vectors among the extended bases
+    and the sums of two of them
 
+    :return: (tuple) The basis and the matrix of coefficients, None if the
+             coefficients of the extended bases are not given
+    """
+    basis = _np.dot(_COMBINATIONS, extended_bases)
+    # Sort bases by the lengths (shorter is earlier), the sort is stable
+    order = _np.argsort(_np.sum(basis ** 2, axis=1), kind='mergesort')
+    basis = basis[order]
+    if coefficients is not None:
+        matrix = _np.dot(_COMBINATIONS, coefficients)[order]
+    else:
+        matrix = None
 
-def get_shortest_bases_from_extented_bases(extended_bases, tolerance):
-    #print 'get_shortest_bases_from_extented_bases',tolerance
+    # Choose shortest and linearly independent three bases
+    # This algorithm may not be perfect.
+    independent = _np.abs(_np.linalg.det(basis[_TRIPLETS])) > tolerance
+    if _np.any(independent):
+        triplet = _TRIPLETS[_np.argmax(independent)]
+    else:
+        print("Delaunary reduction is failed.")
+        triplet = _TRIPLETS[0]
+    return basis[triplet], None if matrix is None else matrix[triplet]
 
-    def mycmp(x, y):
-        return cmp(_np.vdot(x, x), _np.vdot(y, y))
 
-    basis = _np.zeros((7, 3), dtype=float)
-    basis[:4] = extended_bases
-    basis[4] = extended_bases[0] + extended_bases[1]
-    basis[5] = extended_bases[1] + extended_bases[2]
-    basis[6] = extended_bases[2] + extended_bases[0]
-    # Sort bases by the lengthes (shorter is earlier)
-    basis = sorted(basis, cmp=mycmp)
+def _sign(x, eps):
+    if x > eps:
+        return 1
+    elif x < -eps:
+        return -1
+    return 0
 
-    # Choose shortest and linearly independent three bases
-    # This algorithm may not be perfect.
-    for i in range(7):
-        for j in range(i + 1, 7):
-            for k in range(j + 1, 7):
-                if abs(_np.linalg.det([basis[i], basis[j], basis[k]])) > tolerance:
-                    return _np.array([basis[i], basis[j], basis[k]])
-
-    print("Delaunary reduction is failed.")
-    return basis[:3]
+
+def get_niggli_reduction(cell, tolerance=1e-5, maxiter=10000):
+    """
+    Niggli reduction using the algorithm of Krivy and Gruber with the
+    tolerances proposed by Grosse-Kunstleve, Sauter and Adams (2004).
+    The transformations preserve the handedness of the basis
+
+    :param cell: (numpy.ndarray) Lattice vectors as rows
+    :param tolerance: (float) Relative tolerance for the comparisons
+    :param maxiter: (int) Maximal number of transformations
+
+    :return: (tuple) The reduced basis and the transformation matrix
+    """
+    cell = _np.array(cell, dtype=float).reshape((3, 3))
+    eps = tolerance * abs(_np.linalg.det(cell)) ** (2.0 / 3.0)
+    matrix = _np.eye(3, dtype=int)
+
+    for i in range(maxiter):
+        basis = _np.dot(matrix, cell)
+        metric = _np.dot(basis, basis.T)
+        a, b, c = _np.diag(metric)
+        xi, eta, zeta = 2 * metric[1, 2], 2 * metric[0, 2], 2 * metric[0, 1]
+
+        if a > b + eps or (abs(a - b) <= eps and abs(xi) > abs(eta) + eps):
+            step = [[0, -1, 0], [-1, 0, 0], [0, 0, -1]]
+        elif b > c + eps or (abs(b - c) <= eps and abs(eta) > abs(zeta) + eps):
+            step = [[-1, 0, 0], [0, 0, -1], [0, -1, 0]]
+        else:
+            signs = [_sign(xi, eps), _sign(eta, eps), _sign(zeta, eps)]
+            if signs[0] * signs[1] * signs[2] == 1:
+                diagonal = signs
+            else:
+                # All the scalar products are made non positive
+                diagonal = [-1 if x == 1 else 1 for x in signs]
+                if _np.prod(diagonal) == -1:
+                    diagonal[max([k for k in range(3) if signs[k] == 0])] = -1
+            if diagonal != [1, 1, 1]:
+                matrix = _np.dot(_np.diag(diagonal), matrix)
+                continue
+
+            if abs(xi) > b + eps or (abs(xi - b) <= eps and 2 * eta < zeta - eps) or \
+                    (abs(xi + b) <= eps and zeta < -eps):
+                step = [[1, 0, 0], [0, 1, 0], [0, -_np.sign(xi), 1]]
+            elif abs(eta) > a + eps or (abs(eta - a) <= eps and 2 * xi < zeta - eps) or \
+                    (abs(eta + a) <= eps and zeta < -eps):
+                step = [[1, 0, 0], [0, 1, 0], [-_np.sign(eta), 0, 1]]
+            elif abs(zeta) > a + eps or (abs(zeta - a) <= eps and 2 * xi < eta - eps) or \
+                    (abs(zeta + a) <= eps and eta < -eps):
+                step = [[1, 0, 0], [-_np.sign(zeta), 1, 0], [0, 0, 1]]
+            elif xi + eta + zeta + a + b < -eps or (abs(xi + eta + zeta + a + b) <= eps and
+                                                    2 * (a + eta) + zeta > eps):
+                step = [[1, 0, 0], [0, 1, 0], [1, 1, 1]]
+            else:
+                return basis, matrix
+        matrix = _np.dot(_np.array(step, dtype=int), matrix)
+
+    print("Niggli reduction is failed.")
+    return _np.dot(matrix, cell), matrix
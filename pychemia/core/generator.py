@@ -0,0 +1,180 @@
+"""
+Generation of random structures in batches
+
+Many candidate lattices and sets of reduced positions are created at
+once and the minimal distances between atoms (and their periodic images)
+are computed for all of them with numpy operations. Each candidate is
+scaled until no pair of atoms is closer than the sum of their covalent
+radii and the candidate with the smallest volume is kept.
+"""
+
+import itertools
+import multiprocessing
+import numpy as _np
+
+from pychemia.core.structure import Structure
+from pychemia.core.composition import Composition
+from pychemia.core.neighbors import get_neighbors
+from pychemia.utils.periodic import atomic_number_array, covalent_radius_array
+
+__author__ = 'Guillermo Avendano-Franco'
+
+# The 27 translations to the neighboring cells
+_OFFSETS = _np.array(list(itertools.product([-1, 0, 1], repeat=3)), dtype=float)
+
+# Maximal number of floats used by the arrays of distances on each batch
+_MAX_BATCH_SIZE = 2 ** 22
+
+
+def random_structures(composition, nstructures=1, maxtrial=100, nproc=1, seed=None):
+    """
+    Generate a list of random crystal structures with a given composition.
+    Each structure is the one with the smallest volume among 'maxtrial'
+    candidates, each candidate is a random cell with a random distribution of
+    atoms scaled until the distance between any two atoms is greater than
+    the sum of their covalent radii.
+
+    The structures can be generated on a pool of 'nproc' processes, each
+    process uses its own random number generator seeded from 'seed'
+
+    :param composition: (dict, Composition) The composition of the structures
+    :param nstructures: (int) Number of structures to generate
+    :param maxtrial: (int) Number of candidates created for each structure
+    :param nproc: (int) Number of processes
+    :param seed: (int) Seed for the random number generator, None to use a random seed
+
+    :rtype : list
+    :return: A list of Structure objects
+    """
+    if isinstance(composition, dict):
+        comp = Composition(composition)
+    elif isinstance(composition, Composition):
+        comp = composition
+    else:
+        raise ValueError('Wrong composition value')
+
+    rng = _np.random.RandomState(seed)
+    nproc = max(1, min(nproc, nstructures))
+    if nproc == 1:
+        ret = _random_batch(comp, nstructures, maxtrial, rng)
+    else:
+        seeds = rng.randint(0, 2 ** 31 - 1, size=nproc)
+        counts = [len(x) for x in _np.array_split(_np.arange(nstructures), nproc)]
+        pool = multiprocessing.Pool(nproc)
+        values = pool.map(_random_worker, [(comp.composition, counts[i], maxtrial, seeds[i]) for i in range(nproc)])
+        pool.close()
+        pool.join()
+        ret = [Structure.from_dict(x) for value in values for x in value]
+    return ret
+
+
+def random_cells(volume, ntrials, rng=None):
+    """
+    Create random cells with a given volume, the lengths of the lattice
+    vectors are random values between 1.0 and 1.5 (before scaling the volume)
+    and the angles are random values between 60 and 120 degrees
+
+    :param volume: (float) Volume of the cells
+    :param ntrials: (int) Number of cells
+    :param rng: (numpy.random.RandomState) Random number generator
+
+    :rtype : numpy.ndarray
+    :return: Array with shape (ntrials, 3, 3) with the lattice vectors as rows
+    """
+    if rng is None:
+        rng = _np.random
+    lengths = 1.0 + 0.5 * rng.rand(ntrials, 3)
+    angles = _np.radians(60.0 + 60.0 * rng.rand(ntrials, 3))
+
+    # Same construction as Lattice.from_parameters_to_cell
+    sin_alpha, sin_beta = _np.sin(angles[:, 0]), _np.sin(angles[:, 1])
+    cos_alpha, cos_beta, cos_gamma = _np.cos(angles[:, 0]), _np.cos(angles[:, 1]), _np.cos(angles[:, 2])
+    gamma_star = _np.arccos(_np.clip((cos_alpha * cos_beta - cos_gamma) / (sin_alpha * sin_beta), -1.0, 1.0))
+
+    cells = _np.zeros((ntrials, 3, 3))
+    cells[:, 0, 0] = sin_beta
+    cells[:, 0, 2] = cos_beta
+    cells[:, 1, 0] = -sin_alpha * _np.cos(gamma_star)
+    cells[:, 1, 1] = sin_alpha * _np.sin(gamma_star)
+    cells[:, 1, 2] = cos_alpha
+    cells[:, 2, 2] = 1.0
+    cells *= lengths[:, :, None]
+
+    factors = (volume / _np.abs(_np.linalg.det(cells))) ** (1.0 / 3.0)
+    return cells * factors[:, None, None]
+
+
+def minimal_distances(cells, reduced):
+    """
+    Computes the minimal distances between every pair of atoms for a batch
+    of cells and reduced positions. The differences of reduced coordinates are
+    wrapped into [-0.5, 0.5] and the 27 neighboring translations are explored,
+    that is exact for cells that are not too far from being reduced.
+    The diagonal contains the length of the shortest lattice vector
+
+    :param cells: (numpy.ndarray) Array with shape (ntrials, 3, 3)
+    :param reduced: (numpy.ndarray) Array with shape (ntrials, natom, 3)
+
+    :rtype : numpy.ndarray
+    :return: Array with shape (ntrials, natom, natom)
+    """
+    ntrials, natom = reduced.shape[:2]
+    ret = _np.zeros((ntrials, natom, natom))
+    zero = _np.all(_OFFSETS == 0, axis=1)
+    diagonal = _np.arange(natom)
+
+    step = max(1, _MAX_BATCH_SIZE // (natom * natom * len(_OFFSETS) * 3))
+    for first in range(0, ntrials, step):
+        last = min(first + step, ntrials)
+        diff = reduced[first:last, None, :, :] - reduced[first:last, :, None, :]
+        diff -= _np.round(diff)
+        diff = diff[:, :, :, None, :] + _OFFSETS
+        cartesian = _np.einsum('tijkl,tlm->tijkm', diff, cells[first:last])
+        distances = _np.sqrt(_np.sum(cartesian ** 2, axis=-1))
+        # An atom is not compared with itself
+        distances[:, diagonal, diagonal, zero] = _np.inf
+        ret[first:last] = _np.min(distances, axis=-1)
+    return ret
+
+
+def _random_batch(comp, nstructures, maxtrial, rng):
+    """
+    Generate 'nstructures' random structures using a given random number generator
+    """
+    natom = comp.natom
+    symbols = comp.symbols
+    covalent = covalent_radius_array(atomic_number_array(symbols))
+    covalent_dim = covalent[:, None] + covalent[None, :]
+
+    ntrials = nstructures * maxtrial
+    cells = random_cells(comp.covalent_volume('cubes'), ntrials, rng)
+    reduced = rng.rand(ntrials, natom, 3)
+    reduced -= _np.min(reduced, axis=1)[:, None, :]
+
+    distances = minimal_distances(cells, reduced)
+    factors = _np.max((covalent_dim / distances).reshape((ntrials, -1)), axis=1)
+    cells *= factors[:, None, None]
+    volumes = _np.abs(_np.linalg.det(cells)).reshape((nstructures, maxtrial))
+
+    ret = []
+    for i in range(nstructures):
+        # The candidates are checked with an exact search of neighbors in order of increasing volume
+        for itrial in i * maxtrial + _np.argsort(volumes[i]):
+            pairs_i, pairs_j, images, distances = get_neighbors(cells[itrial], reduced[itrial], _np.max(covalent_dim))
+            itself = (pairs_i == pairs_j) & _np.all(images == 0, axis=1)
+            if _np.all(distances[~itself] + 1E-8 >= covalent_dim[pairs_i, pairs_j][~itself]):
+                ret.append(Structure(symbols=symbols, reduced=reduced[itrial], cell=cells[itrial],
+                                     periodicity=True))
+                break
+        else:
+            raise ValueError('Could not find a valid structure after %d trials' % maxtrial)
+    return ret
+
+
+def _random_worker(args):
+    """
+    Generate random structures on one process of the pool used by random_structures
+    """
+    composition, nstructures, maxtrial, seed = args
+    rng = _np.random.RandomState(seed)
+    return [x.to_dict() for x in _random_batch(Composition(composition), nstructures, maxtrial, rng)]
@@ -6,6 +6,7 @@ from math import ceil, sqrt, cos, sin, radians, acos, pi
 
 from pychemia.utils.mathematics import length_vectors, angle_vectors, wrap2_pmhalf
 from composition import Composition
+from delaunay import get_reduction
 
 
 __author__ = 'Guillermo Avendano-Franco'
@@ -29,13 +30,16 @@ class Lattice():
         self._periodicity = None
         self.set_periodicity(periodicity)
         self._dims = sum(self._periodicity)
-        assert (_np.prod(_np.array(cell).shape) == self.periodic_dimensions ** 2)
-        self._cell = _np.array(cell).reshape((self.periodic_dimensions, self.periodic_dimensions))
-        self._lengths = length_vectors(self._cell)
-        self._angles = angle_vectors(self._cell, units='deg')
+        self._cell = None
+        self._lengths = None
+        self._angles = None
         self._metric = None
         self._inverse = None
+        self._reciprocal = None
+        self._wigner_seitz_container = None
         self._limits_for_distance2 = None
+        self._reductions = {}
+        self.set_cell(cell)
 
     def __str__(self):
         ret = 'Cell='
@@ -79,12 +83,7 @@ class Lattice():
         dwrap = wrap2_pmhalf(dred)
 
         if limits is None:
-            limits = _np.zeros(3)
-            corners = self.get_wigner_seitz_container()
-
-            limits[0] = min(int(ceil(max(1e-14 + abs(_np.array([corners[x][0] for x in corners]))))), 5)
-            limits[1] = min(int(ceil(max(1e-14 + abs(_np.array([corners[x][1] for x in corners]))))), 5)
-            limits[2] = min(int(ceil(max(1e-14 + abs(_np.array([corners[x][2] for x in corners]))))), 5)
+            limits = self.get_limits_for_distance2()
 
         ret = {}
         for i0 in _np.arange(-limits[0], limits[0] + 1):
@@ -97,6 +96,54 @@ class Lattice():
 
         return ret
 
+    def all_distances(self, reduced, radius=20, limits=None):
+        """
+        Computes in a single pass all the distances between every pair
+        of points (i, j) with i <= j and their periodic images inside a
+        sphere of a given radius. The points are given in reduced coordinates.
+        The images considered are the same used by distance2
+
+        :param reduced: (numpy.ndarray) Reduced coordinates of the points
+        :param radius: (float) Maximal distance considered
+        :param limits: (list) Number of images on each direction, by default
+                       the limits from the Wigner-Seitz container are used
+
+        :return: (tuple) Four numpy arrays: the indices i, the indices j,
+                 the integer lattice translations applied to the point j
+                 and the distances
+        """
+        reduced = _np.atleast_2d(reduced)
+        if limits is None:
+            limits = self.get_limits_for_distance2()
+
+        pairs_i, pairs_j = _np.triu_indices(len(reduced))
+        dred = reduced[pairs_j] - reduced[pairs_i]
+        # Wrap the differences into ]-1/2, 1/2] keeping the translation applied
+        dwrap = wrap2_pmhalf(dred).reshape((-1, 3))
+        shift = _np.rint(dwrap - dred)
+
+        grid = _np.array(list(itertools.product(*[range(-int(x), int(x) + 1) for x in limits])))
+        radius2 = radius * radius
+
+        # Split the pairs in chunks to bound the size of the temporal arrays
+        chunk = max(1, 2 ** 20 // len(grid))
+        ret_pair = []
+        ret_grid = []
+        ret_dist = []
+        for start in range(0, len(pairs_i), chunk):
+            dtot = dwrap[start:start + chunk, None, :] + grid[None, :, :]
+            norm2 = _np.sum(_np.dot(dtot, self.metric) * dtot, axis=2)
+            ipair, igrid = _np.nonzero(norm2 < radius2)
+            ret_pair.append(ipair + start)
+            ret_grid.append(igrid)
+            ret_dist.append(_np.sqrt(norm2[ipair, igrid]))
+
+        ipair = _np.concatenate(ret_pair)
+        igrid = _np.concatenate(ret_grid)
+        images = (shift[ipair] + grid[igrid]).astype(int)
+
+        return pairs_i[ipair], pairs_j[ipair], images, _np.concatenate(ret_dist)
+
     @staticmethod
     def from_parameters_to_cell(a, b, c, alpha, beta, gamma):
         """
@@ -163,16 +210,56 @@ class Lattice():
                 ret.append([tess.vertices[i] for i in tess.ridges[r]])
         return ret
 
+    def get_limits_for_distance2(self):
+        """
+        Number of images on each direction needed to cover the
+        box that contains the Wigner-Seitz cell, the values are
+        limited to a maximum of 5.
+        The limits are computed only once for a given cell
+
+        :return: numpy.ndarray
+        """
+        if self._limits_for_distance2 is None:
+            corners = _np.array(self.get_wigner_seitz_container().values())
+            limits = _np.minimum(_np.ceil(_np.max(1e-14 + _np.abs(corners), axis=0)), 5).astype(int)
+            limits.flags.writeable = False
+            self._limits_for_distance2 = limits
+        return self._limits_for_distance2
+
+    def get_reduced_cell(self, method='delaunay'):
+        """
+        Reduced basis of the lattice, the integer matrix that transforms the cell
+        into the reduced basis and its inverse, that transforms reduced coordinates
+        into reduced coordinates on the reduced basis. The reduction is computed
+        only once for each method and a given cell
+
+        :param method: (str) 'delaunay' or 'niggli'
+
+        :return: (tuple) Three read-only numpy arrays
+        """
+        if method not in self._reductions:
+            basis, matrix = get_reduction(self.cell, method=method)
+            inverse = _np.rint(_np.linalg.inv(matrix)).astype(int)
+            for array in [basis, matrix, inverse]:
+                array.flags.writeable = False
+            self._reductions[method] = (basis, matrix, inverse)
+        return self._reductions[method]
+
     def get_wigner_seitz_container(self):
         """
         Compute the corners of the box that contains the Wigner-Seitz cell
+        The corners are computed only once for a given cell
 
         :return: dict : dictionary with values numpy arrays
         """
-        ret = {}
-        for i in itertools.product((-1, 1), repeat=3):
-            ret[i] = _np.dot(self.reciprocal().metric, i * _np.diagonal(self.metric))
-        return ret
+        if self._wigner_seitz_container is None:
+            ret = {}
+            rmetric = self.reciprocal().metric
+            diagonal = _np.diagonal(self.metric)
+            for i in itertools.product((-1, 1), repeat=3):
+                ret[i] = _np.dot(rmetric, i * diagonal)
+            self._wigner_seitz_container = ret
+        return self._wigner_seitz_container
 
     def minimal_distance(self, x1, x2, option='reduced'):
         distances_dict = self.distance2(x1, x2, option=option)
@@ -186,6 +273,8 @@ class Lattice():
         """
         Computes a matrix with the minimal distances between
         two sets of points represented as reciprocal coordinates
+        The differences are wrapped and the first neighbor images are
+        searched on the Delaunay reduced cell
 
         :param red_coords1: List or array of reduced coordinates for the first
                             set of points
@@ -194,14 +283,13 @@ class Lattice():
         # Just in case of one single coordinate
         red_coords1, red_coords2 = _np.atleast_2d(red_coords1, red_coords2)
 
-        images = _np.array([list(i) for i in itertools.product([-1, 0, 1], repeat=3)])
-
-        red2_images = red_coords2[:, None, :] + images[None, :, :]
+        basis, matrix, inverse = self.get_reduced_cell()
+        diff = _np.dot(red_coords2[None, :, :] - red_coords1[:, None, :], inverse)
+        diff -= _np.round(diff)
 
-        cart_coords1 = self.reduced2cartesian(red_coords1)
-        cart_coords2 = self.reduced2cartesian(red2_images)
+        images = _np.array([list(i) for i in itertools.product([-1, 0, 1], repeat=3)])
 
-        diff_vectors = cart_coords2[None, :, :, :] - cart_coords1[:, None, None, :]
+        diff_vectors = _np.dot(diff[:, :, None, :] + images[None, None, :, :], basis)
         return _np.min(_np.sum(diff_vectors ** 2, axis=3), axis=2) ** 0.5
 
     def distances_in_sphere(self, x1, x2, radius, option='reduced'):
@@ -312,15 +400,40 @@ class Lattice():
     def reciprocal(self):
         """
         Return the reciprocal cell
+        The reciprocal lattice is created only once for a given cell
 
         :rtype : Lattice
         :return:
         """
-        return self.__class__(_np.linalg.inv(self.cell.T))
+        if self._reciprocal is None:
+            self._reciprocal = self.__class__(self.inverse.T)
+        return self._reciprocal
 
     def reduced2cartesian(self, x):
         return _np.dot(x, self.cell)
 
+    def set_cell(self, cell):
+        """
+        Set the lattice vectors, all the quantities derived from
+        the cell (metric, inverse, reciprocal lattice, lengths, angles
+        and limits for distances) are computed again when needed.
+        The internal cell is read-only, changing the cell must be done
+        with this method
+
+        :param cell: (numpy.ndarray) Lattice vectors as rows
+        """
+        assert (_np.prod(_np.array(cell).shape) == self.periodic_dimensions ** 2)
+        self._cell = _np.array(cell).reshape((self.periodic_dimensions, self.periodic_dimensions))
+        self._cell.flags.writeable = False
+        self._lengths = None
+        self._angles = None
+        self._metric = None
+        self._inverse = None
+        self._reciprocal = None
+        self._wigner_seitz_container = None
+        self._limits_for_distance2 = None
+        self._reductions = {}
+
     def set_periodicity(self, periodicity):
         if isinstance(periodicity, bool):
             self._periodicity = 3 * [periodicity]
@@ -365,43 +478,53 @@ class Lattice():
     def metric(self):
         if self._metric is None:
             self._metric = _np.dot(self.cell, self.cell.T)
+            self._metric.flags.writeable = False
         return self._metric
 
     @property
     def inverse(self):
         if self._inverse is None:
             self._inverse = _np.linalg.inv(self.cell)
+            self._inverse.flags.writeable = False
         return self._inverse
 
     @property
     def alpha(self):
-        return self._angles[(1, 2)]
+        return self._get_angles()[(1, 2)]
 
     @property
     def beta(self):
-        return self._angles[(0, 2)]
+        return self._get_angles()[(0, 2)]
 
     @property
     def gamma(self):
-        return self._angles[(0, 1)]
+        return self._get_angles()[(0, 1)]
 
     @property
     def angles(self):
         return self.alpha, self.beta, self.gamma
 
+    def _get_angles(self):
+        if self._angles is None:
+            self._angles = angle_vectors(self.cell, units='deg')
+        return self._angles
+
     @property
     def a(self):
-        return self._lengths[0]
+        return self.lengths[0]
 
     @property
     def b(self):
-        return self._lengths[1]
+        return self.lengths[1]
 
     @property
     def c(self):
-        return self._lengths[2]
+        return self.lengths[2]
 
     @property
     def lengths(self):
+        if self._lengths is None:
+            self._lengths = length_vectors(self.cell)
+            self._lengths.flags.writeable = False
         return self._lengths
 
@@ -0,0 +1,464 @@
+"""
+Neighbor search for periodic structures
+
+The atoms are distributed in bins according to their reduced
+coordinates, only the bins close enough to the bin of each
+atom are explored. The cost of the search scales linearly with
+the number of atoms for a fixed radius.
+"""
+
+import itertools
+import numpy as _np
+
+__author__ = 'Guillermo Avendano-Franco'
+
+
+def get_neighbors(cell, reduced, radius):
+    """
+    Computes all the distances between every pair of atoms (i, j)
+    with i <= j and their periodic images inside a sphere of a given
+    radius. The cell could be triclinic and periodic boundary
+    conditions are assumed in the three directions.
+
+    :param cell: (numpy.ndarray) Lattice vectors as rows of a 3x3 matrix
+    :param reduced: (numpy.ndarray) Reduced coordinates of the atoms
+    :param radius: (float) Maximal distance considered
+
+    :return: (tuple) Four numpy arrays: the indices i, the indices j,
+             the integer lattice translations applied to the atom j
+             and the distances. The values are sorted by i and j
+    """
+    cell = _np.array(cell, dtype=float).reshape((3, 3))
+    reduced = _np.atleast_2d(_np.array(reduced, dtype=float))
+    natom = len(reduced)
+
+    # Bring all the atoms inside the cell keeping track of the translation
+    shift = -_np.floor(reduced)
+    wrapped = reduced + shift
+
+    # Distance between consecutive lattice planes on each direction
+    widths = 1.0 / _np.sqrt(_np.sum(_np.linalg.inv(cell) ** 2, axis=0))
+    max_bins = max(1, int(2 * natom ** (1.0 / 3.0)))
+    nbins = _np.minimum(_np.maximum(1, _np.floor(widths / radius)), max_bins).astype(int)
+    reach = _np.ceil(radius * nbins / widths).astype(int)
+
+    coords = _np.minimum((wrapped * nbins).astype(int), nbins - 1)
+    bin_index = (coords[:, 0] * nbins[1] + coords[:, 1]) * nbins[2] + coords[:, 2]
+    order = _np.argsort(bin_index, kind='mergesort')
+    counts = _np.bincount(bin_index, minlength=_np.prod(nbins))
+    starts = _np.cumsum(counts) - counts
+
+    radius2 = radius * radius
+    atoms = _np.arange(natom)
+    ret_i = []
+    ret_j = []
+    ret_images = []
+    ret_dist = []
+    for offset in itertools.product(*[range(-x, x + 1) for x in reach]):
+        target = coords + _np.array(offset)
+        images = _np.floor_divide(target, nbins)
+        target -= images * nbins
+        target_bin = (target[:, 0] * nbins[1] + target[:, 1]) * nbins[2] + target[:, 2]
+
+        # All the atoms in the target bin of each atom
+        number = counts[target_bin]
+        total = _np.sum(number)
+        if total == 0:
+            continue
+        iatom = _np.repeat(atoms, number)
+        local = _np.arange(total) - _np.repeat(_np.cumsum(number) - number, number)
+        jatom = order[_np.repeat(starts[target_bin], number) + local]
+
+        # Only pairs with i <= j are returned
+        mask = iatom <= jatom
+        iatom = iatom[mask]
+        jatom = jatom[mask]
+        jimages = images[iatom]
+
+        vectors = _np.dot(wrapped[jatom] + jimages - wrapped[iatom], cell)
+        norm2 = _np.sum(vectors ** 2, axis=1)
+        mask = norm2 < radius2
+        iatom = iatom[mask]
+        jatom = jatom[mask]
+        ret_i.append(iatom)
+        ret_j.append(jatom)
+        ret_images.append(jimages[mask] + shift[jatom] - shift[iatom])
+        ret_dist.append(_np.sqrt(norm2[mask]))
+
+    if len(ret_i) == 0:
+        return _np.zeros(0, dtype=int), _np.zeros(0, dtype=int), _np.zeros((0, 3), dtype=int), _np.zeros(0)
+
+    pairs_i = _np.concatenate(ret_i)
+    pairs_j = _np.concatenate(ret_j)
+    images = _np.concatenate(ret_images).astype(int)
+    distances = _np.concatenate(ret_dist)
+    order = _np.lexsort((images[:, 2], images[:, 1], images[:, 0], pairs_j, pairs_i))
+
+    return pairs_i[order], pairs_j[order], images[order], distances[order]
+
+
+def get_minimal_distances(cell, reduced, radius):
+    """
+    Computes the matrix of minimal distances between every pair
+    of atoms considering their periodic images.
+    Pairs of atoms without any image inside the given radius
+    get an infinite distance
+
+    :param cell: (numpy.ndarray) Lattice vectors as rows of a 3x3 matrix
+    :param reduced: (numpy.ndarray) Reduced coordinates of the atoms
+    :param radius: (float) Maximal distance considered
+
+    :return: (numpy.ndarray) Symmetric matrix of minimal distances
+    """
+    natom = len(_np.atleast_2d(reduced))
+    pairs_i, pairs_j, images, distances = get_neighbors(cell, reduced, radius)
+    ret = _np.inf * _np.ones((natom, natom))
+    _np.minimum.at(ret, (pairs_i, pairs_j), distances)
+    ret = _np.minimum(ret, ret.T)
+    return ret
+
+
+class NeighborList():
+    """
+    Compact storage for the distances between atoms and the periodic
+    images of other atoms, all the values are stored in contiguous arrays.
+
+    Each distance is stored once, for a pair of atoms (i, j) with i <= j,
+    together with the integer lattice translation (image) applied to the
+    atom j. The distances associated to each atom are indexed using a
+    compressed sparse row (CSR) layout, the distances for atom 'i' are
+    the positions offsets[i]:offsets[i+1] of the arrays 'indices'
+    (index of the distance) and 'neighbors' (the other atom in the pair)
+    """
+
+    def __init__(self, natom, pairs_i, pairs_j, images, distances, radius=None):
+        """
+        Creates a NeighborList from the flat arrays of distances
+        as returned by get_neighbors
+
+        :param natom: (int) Number of atoms
+        :param pairs_i: (numpy.ndarray) Indices of the first atom, pairs_i <= pairs_j
+        :param pairs_j: (numpy.ndarray) Indices of the second atom
+        :param images: (numpy.ndarray) Integer translations applied to the second atom
+        :param distances: (numpy.ndarray) Distances between the atoms
+        :param radius: (float) Radius used to compute the distances
+        """
+        pairs_i = _np.array(pairs_i, dtype=_np.int32)
+        pairs_j = _np.array(pairs_j, dtype=_np.int32)
+        images = _np.array(images, dtype=int).reshape((-1, 3))
+        if len(images) > 0 and _np.max(_np.abs(images)) > _np.iinfo(_np.int8).max:
+            raise ValueError('Images too far away to be stored, use a smaller radius')
+
+        self.natom = natom
+        self.radius = radius
+        self.pairs = _np.column_stack((pairs_i, pairs_j))
+        self.images = images.astype(_np.int8)
+        self.distances = _np.array(distances, dtype=float)
+
+        # Each distance is indexed on the rows of atoms i and j, only once for distances to its own images
+        ids = _np.arange(len(self.distances), dtype=_np.int32)
+        other = pairs_i != pairs_j
+        rows = _np.concatenate((pairs_i, pairs_j[other]))
+        order = _np.argsort(rows, kind='mergesort')
+        self.indices = _np.concatenate((ids, ids[other]))[order]
+        self.neighbors = _np.concatenate((pairs_j, pairs_i[other]))[order]
+        self.offsets = _np.zeros(natom + 1, dtype=_np.int64)
+        self.offsets[1:] = _np.cumsum(_np.bincount(rows, minlength=natom))
+
+    @classmethod
+    def build(cls, cell, reduced, radius):
+        """
+        Computes the NeighborList for a set of atoms in a periodic cell
+
+        :param cell: (numpy.ndarray) Lattice vectors as rows of a 3x3 matrix
+        :param reduced: (numpy.ndarray) Reduced coordinates of the atoms
+        :param radius: (float) Maximal distance considered
+
+        :rtype : NeighborList
+        """
+        pairs_i, pairs_j, images, distances = get_neighbors(cell, reduced, radius)
+        return cls(len(_np.atleast_2d(reduced)), pairs_i, pairs_j, images, distances, radius=radius)
+
+    def __len__(self):
+        return len(self.distances)
+
+    def restrict(self, radius):
+        """
+        Return a new NeighborList with only the distances shorter than radius
+
+        :param radius: (float) New radius
+
+        :rtype : NeighborList
+        """
+        mask = self.distances < radius
+        return self.__class__(self.natom, self.pairs[mask, 0], self.pairs[mask, 1], self.images[mask],
+                              self.distances[mask], radius=radius)
+
+    def replicate(self, size):
+        """
+        Return the NeighborList of a supercell built from this one without
+        computing any distance. The atom 'i' of the cell with offset (t0, t1, t2)
+        is the atom number (t0 * size[1] * size[2] + t1 * size[2] + t2) * natom + i
+        on the supercell, the same order used by Structure.supercell
+
+        :param size: (tuple) Number of replicas along each lattice vector
+
+        :rtype : NeighborList
+        """
+        size = _np.array(size, dtype=int)
+        nimages = int(_np.prod(size))
+        offsets = _np.indices(size).reshape((3, -1)).T
+
+        # Every distance is repeated once for each offset of the first atom
+        translations = offsets[:, None, :] + self.images[None, :, :]
+        cells_j = _np.ravel_multi_index(tuple(_np.mod(translations, size).reshape((-1, 3)).T), size)
+        images = _np.floor_divide(translations, size).reshape((-1, 3))
+        pairs_i = (_np.arange(nimages)[:, None] * self.natom + self.pairs[None, :, 0]).ravel()
+        pairs_j = cells_j * self.natom + _np.tile(self.pairs[:, 1], nimages)
+        distances = _np.tile(self.distances, nimages)
+
+        # Distances between different atoms are stored with pairs_i <= pairs_j, for distances of one atom
+        # to its own images each distance in the supercell appears twice, one on each order
+        same = _np.tile(self.pairs[:, 0] == self.pairs[:, 1], nimages)
+        keep = ~same | (pairs_i <= pairs_j)
+        swap = pairs_i > pairs_j
+        pairs_i, pairs_j = _np.where(swap, pairs_j, pairs_i), _np.where(swap, pairs_i, pairs_j)
+        images[swap] *= -1
+
+        order = _np.lexsort((pairs_j[keep], pairs_i[keep]))
+        return self.__class__(nimages * self.natom, pairs_i[keep][order], pairs_j[keep][order],
+                              images[keep][order], distances[keep][order], radius=self.radius)
+
+    def row(self, iatom):
+        """
+        Slice on the arrays 'indices' and 'neighbors' for the atom 'iatom'
+
+        :rtype : slice
+        """
+        return slice(self.offsets[iatom], self.offsets[iatom + 1])
+
+    def get_indices(self, iatom):
+        """
+        Indices of the distances that involve the atom 'iatom'
+
+        :rtype : numpy.ndarray
+        """
+        return self.indices[self.row(iatom)]
+
+    def get_neighbors(self, iatom):
+        """
+        Indices of the atoms at the other side of the distances of the atom 'iatom'
+
+        :rtype : numpy.ndarray
+        """
+        return self.neighbors[self.row(iatom)]
+
+    def get_distances(self, iatom):
+        """
+        Distances from the atom 'iatom' to its neighbors
+
+        :rtype : numpy.ndarray
+        """
+        return self.distances[self.get_indices(iatom)]
+
+    def coordination(self, mask=None):
+        """
+        Number of distances per atom, if a boolean mask over the distances
+        is given, only the selected distances are counted
+
+        :param mask: (numpy.ndarray) Boolean array with one value per distance
+
+        :rtype : numpy.ndarray
+        """
+        if mask is None:
+            return _np.diff(self.offsets)
+        rows = _np.repeat(_np.arange(self.natom), _np.diff(self.offsets))
+        return _np.bincount(rows[mask[self.indices]], minlength=self.natom)
+
+
+class SpatialIndex():
+    """
+    Spatial index for repeated neighbor queries on a fixed set of atoms.
+
+    For periodic structures the atoms are distributed in bins according
+    to their reduced coordinates (cell list) and only the bins inside the
+    sphere of search are explored, the lattice can be triclinic.
+    For non-periodic structures a KD-tree from scipy is used.
+    In both cases the cost of a query depends on the number of atoms
+    inside the sphere and not on the total number of atoms
+    """
+
+    def __init__(self, positions, cell=None, atoms_per_bin=2):
+        """
+        Creates the index for a set of atoms
+
+        :param positions: (numpy.ndarray) Cartesian positions of the atoms
+        :param cell: (numpy.ndarray) Lattice vectors as rows of a 3x3 matrix,
+                     None for non-periodic structures
+        :param atoms_per_bin: (int) Average number of atoms on each bin
+        """
+        self.positions = _np.array(positions, dtype=float).reshape((-1, 3))
+        self.natom = len(self.positions)
+        self.periodic = cell is not None
+        self._tree = None
+
+        if not self.periodic:
+            from scipy.spatial import cKDTree
+            if self.natom > 0:
+                self._tree = cKDTree(self.positions)
+            return
+
+        self.cell = _np.array(cell, dtype=float).reshape((3, 3))
+        self.inverse = _np.linalg.inv(self.cell)
+        reduced = _np.dot(self.positions, self.inverse)
+        self.shift = -_np.floor(reduced)
+        self.wrapped = reduced + self.shift
+
+        # Distance between consecutive lattice planes on each direction
+        self.widths = 1.0 / _np.sqrt(_np.sum(self.inverse ** 2, axis=0))
+        bin_size = (atoms_per_bin * abs(_np.linalg.det(self.cell)) / max(1, self.natom)) ** (1.0 / 3.0)
+        self.nbins = _np.maximum(1, _np.floor(self.widths / bin_size)).astype(int)
+
+        self.coords = _np.minimum((self.wrapped * self.nbins).astype(int), self.nbins - 1)
+        bin_index = self._bin_index(self.coords)
+        self.order = _np.argsort(bin_index, kind='mergesort')
+        self.counts = _np.bincount(bin_index, minlength=_np.prod(self.nbins))
+        self.starts = _np.cumsum(self.counts) - self.counts
+
+    def __len__(self):
+        return self.natom
+
+    def _bin_index(self, coords):
+        return (coords[..., 0] * self.nbins[1] + coords[..., 1]) * self.nbins[2] + coords[..., 2]
+
+    def query_radius(self, point, radius):
+        """
+        Search all the atoms (and their periodic images) at a distance
+        smaller than radius from a given point
+
+        :param point: (numpy.ndarray) Cartesian coordinates of the center of the sphere
+        :param radius: (float) Radius of the sphere
+
+        :return: (tuple) Three numpy arrays: the indices of the atoms,
+                 the integer lattice translations applied to each atom and
+                 the distances. The values are sorted by distance
+        """
+        point = _np.array(point, dtype=float).reshape(3)
+        if self.natom == 0:
+            return _np.zeros(0, dtype=int), _np.zeros((0, 3), dtype=int), _np.zeros(0)
+
+        if not self.periodic:
+            atoms = _np.array(self._tree.query_ball_point(point, radius), dtype=int)
+            distances = _np.sqrt(_np.sum((self.positions[atoms] - point) ** 2, axis=1))
+            order = _np.argsort(distances, kind='mergesort')
+            return atoms[order], _np.zeros((len(atoms), 3), dtype=int), distances[order]
+
+        reduced = _np.dot(point, self.inverse)
+        pshift = -_np.floor(reduced)
+        preduced = reduced + pshift
+        pcoord = _np.minimum((preduced * self.nbins).astype(int), self.nbins - 1)
+
+        # All the bins that intersect the sphere
+        reach = _np.ceil(radius * self.nbins / self.widths).astype(int)
+        offsets = _np.array(list(itertools.product(*[range(-x, x + 1) for x in reach])))
+        target = pcoord + offsets
+        bin_images = _np.floor_divide(target, self.nbins)
+        target_bin = self._bin_index(target - bin_images * self.nbins)
+
+        number = self.counts[target_bin]
+        total = _np.sum(number)
+        local = _np.arange(total) - _np.repeat(_np.cumsum(number) - number, number)
+        atoms = self.order[_np.repeat(self.starts[target_bin], number) + local]
+        images = _np.repeat(bin_images, number, axis=0)
+
+        vectors = _np.dot(self.wrapped[atoms] + images - preduced, self.cell)
+        norm2 = _np.sum(vectors ** 2, axis=1)
+        mask = norm2 < radius * radius
+        atoms = atoms[mask]
+        images = (images[mask] + self.shift[atoms] - pshift).astype(int)
+        distances = _np.sqrt(norm2[mask])
+        order = _np.argsort(distances, kind='mergesort')
+        return atoms[order], images[order], distances[order]
+
+    def query_nearest(self, point, k):
+        """
+        Search the k nearest atoms (or periodic images) to a given point
+
+        :param point: (numpy.ndarray) Cartesian coordinates of the point
+        :param k: (int) Number of neighbors
+
+        :return: (tuple) Three numpy arrays: the indices of the atoms,
+                 the integer lattice translations applied to each atom and
+                 the distances. The values are sorted by distance
+        """
+        if self.natom == 0 or k <= 0:
+            return _np.zeros(0, dtype=int), _np.zeros((0, 3), dtype=int), _np.zeros(0)
+
+        if not self.periodic:
+            k = min(k, self.natom)
+            distances, atoms = self._tree.query(point, k=k)
+            atoms = _np.atleast_1d(atoms)
+            return atoms, _np.zeros((len(atoms), 3), dtype=int), _np.atleast_1d(distances)
+
+        # Radius of a sphere that contains in average k atoms, enlarged until k atoms are found
+        volume = abs(_np.linalg.det(self.cell))
+        radius = 1.2 * (3.0 * k * volume / (4.0 * _np.pi * self.natom)) ** (1.0 / 3.0)
+        while True:
+            atoms, images, distances = self.query_radius(point, radius)
+            if len(atoms) >= k:
+                return atoms[:k], images[:k], distances[:k]
+            radius *= 1.5
+
+    def get_neighbors(self, iatom, radius):
+        """
+        Neighbors of the atom 'iatom' inside a sphere, the atom itself is excluded
+        but its periodic images are included
+
+        :param iatom: (int) Index of the atom
+        :param radius: (float) Radius of the sphere
+
+        :return: (tuple) Indices, integer lattice translations and distances
+        """
+        atoms, images, distances = self.query_radius(self.positions[iatom], radius)
+        mask = _np.logical_or(atoms != iatom, _np.any(images != 0, axis=1))
+        return atoms[mask], images[mask], distances[mask]
+
+    def get_nearest_neighbors(self, iatom, k):
+        """
+        The k nearest neighbors of the atom 'iatom', the atom itself is excluded
+        but its periodic images are included
+
+        :param iatom: (int) Index of the atom
+        :param k: (int) Number of neighbors
+
+        :return: (tuple) Indices, integer lattice translations and distances
+        """
+        if not self.periodic:
+            k = min(k, self.natom - 1)
+        atoms, images, distances = self.query_nearest(self.positions[iatom], k + 1)
+        mask = _np.logical_or(atoms != iatom, _np.any(images != 0, axis=1))
+        return atoms[mask][:k], images[mask][:k], distances[mask][:k]
+
+    def minimal_distance(self, iatom, jatom, tolerance=1e-5):
+        """
+        Shortest distance between the atom 'iatom' and any periodic image of the atom 'jatom'
+
+        :param iatom: (int) Index of the first atom
+        :param jatom: (int) Index of the second atom
+        :param tolerance: (float) Tolerance added to the radius of search for periodic images
+
+        :rtype : float
+        """
+        if not self.periodic:
+            return _np.linalg.norm(self.positions[jatom] - self.positions[iatom])
+
+        # The image of jatom with wrapped reduced difference bounds the search
+        dred = self.wrapped[jatom] - self.wrapped[iatom]
+        vector = _np.dot(dred - _np.rint(dred), self.cell)
+        radius = _np.linalg.norm(vector) + tolerance
+
+        # Only the images of jatom inside the sphere are considered
+        reach = _np.ceil(radius / self.widths).astype(int)
+        images = _np.array(list(itertools.product(*[range(-x, x + 1) for x in reach])))
+        vectors = _np.dot(dred - _np.rint(dred) + images, self.cell)
+        return _np.sqrt(_np.min(_np.sum(vectors ** 2, axis=1)))
@@ -11,10 +11,10 @@ from math import sin, cos
 from itertools import combinations
 
 from pychemia.core.lattice import Lattice
-from pychemia.core.delaunay import get_reduced_bases
+from pychemia.core.neighbors import SpatialIndex
 from pychemia.core.composition import Composition
-from pychemia.utils.computing import unicode2string
-from pychemia.utils.periodic import mass, atomic_number, covalent_radius, valence, atomic_symbols
+from pychemia.utils.computing import unicode2string, memoized_property
+from pychemia.utils.periodic import atomic_symbols, valence, atomic_number_array, mass_array, covalent_radius_array
 from pychemia.utils.mathematics import matrix_from_eig, vector_set_perpendicular
 
 
@@ -26,6 +26,9 @@ __email__ = "gtux.gaf@gmail.com"
 __status__ = "Development"
 __date__ = "June 10, 2014"
 
+# Version of the format written by Structure.save_npz
+_NPZ_FORMAT_VERSION = 1
+
 
 class Structure():
     """
@@ -110,6 +113,12 @@ Empty structure
 
         self._lattice = None
         self._composition = None
+        self._spatial_index = None
+        self._symbols_snapshot = None
+        self._numbers = None
+        self._species_index = None
+        # Increased by every change on cell, positions, periodicity or symbols
+        self._version = 0
 
         # Fill the values from args
         if 'name' in kwargs and kwargs['name'] is not None:
@@ -275,6 +284,7 @@ Empty structure
         self.symbols.append(name)
         self.natom += 1
         self._composition = None
+        self._changed()
 
         if option == 'cartesian':
             if self.natom == 0:
@@ -299,10 +309,12 @@ Empty structure
         """
         assert (abs(index) < self.natom)
         self.symbols.pop(index)
-        _np.delete(self.positions, index, 0)
-        _np.delete(self.reduced, index, 0)
+        self.positions = _np.delete(self.positions, index, 0)
+        if self.is_crystal:
+            self.reduced = _np.delete(self.reduced, index, 0)
         self.natom -= 1
         self._composition = None
+        self._changed()
 
     def center_mass(self, list_of_atoms=None):
         """
@@ -315,19 +327,14 @@ Empty structure
         if list_of_atoms is None:
             list_of_atoms = range(self.natom)
 
-        total_mass = 0.0
-        center_of_mass = _np.zeros(3)
         if self.natom == 0:
-            return center_of_mass
+            return _np.zeros(3)
 
-        atomicnumber = atomic_number(list(self.symbols))
+        selected = _np.zeros(self.natom, dtype=bool)
+        selected[_np.array(list(list_of_atoms), dtype=int)] = True
+        masses = mass_array(self._element_numbers())[selected]
 
-        for i in range(self.natom):
-            if i in list_of_atoms:
-                total_mass = total_mass + mass(atomicnumber[i])
-                center_of_mass = center_of_mass + mass(atomicnumber[i]) * self.positions[i]
-
-        return center_of_mass / total_mass
+        return _np.dot(masses, self.positions[selected]) / _np.sum(masses)
 
     def rotation(self, tx, ty, tz):
         """
@@ -342,6 +349,27 @@ Empty structure
 
         for i in range(self.natom):
             self.positions[i] = _np.dot(rotation, self.positions[i])
+        self._changed()
+
+    def _changed(self):
+        """
+        Must be called by the methods that change the cell, positions,
+        periodicity or symbols, the values that depend on them are
+        computed again when requested
+        """
+        self._version += 1
+        self._spatial_index = None
+
+    @property
+    def _species_version(self):
+        """
+        Counter of changes on the Structure for the values that depend on the
+        symbols, the symbols are compared with the last known ones to detect
+        changes made directly on the list
+        """
+        if self.symbols is not None:
+            self._update_species_arrays()
+        return self._version
 
     def get_cell(self):
         if self._lattice is None:
@@ -352,6 +380,49 @@ Empty structure
     def lattice(self):
         return self.get_cell()
 
+    def get_spatial_index(self):
+        """
+        Return the spatial index used for neighbor queries, the index
+        is created on the first call and kept until the cell or the
+        positions of the atoms change
+
+        :rtype : SpatialIndex
+        """
+        if self._spatial_index is None:
+            if self.is_periodic:
+                self._spatial_index = SpatialIndex(self.positions, self.cell)
+            else:
+                self._spatial_index = SpatialIndex(self.positions)
+        return self._spatial_index
+
+    def get_neighbors(self, iatom, radius):
+        """
+        Return the atoms and periodic images inside a sphere of a given
+        radius centered on the atom 'iatom', sorted by distance.
+        The atom itself is excluded but its periodic images are included
+
+        :param iatom: (int) Index of the atom
+        :param radius: (float) Radius of the sphere
+
+        :return: (tuple) Three numpy arrays: the indices of the neighbors, the integer
+                 lattice translations applied to each neighbor and the distances
+        """
+        return self.get_spatial_index().get_neighbors(iatom, radius)
+
+    def get_nearest_neighbors(self, iatom, k):
+        """
+        Return the k nearest atoms or periodic images to the atom 'iatom',
+        sorted by distance.
+        The atom itself is excluded but its periodic images are included
+
+        :param iatom: (int) Index of the atom
+        :param k: (int) Number of neighbors
+
+        :return: (tuple) Three numpy arrays: the indices of the neighbors, the integer
+                 lattice translations applied to each neighbor and the distances
+        """
+        return self.get_spatial_index().get_nearest_neighbors(iatom, k)
+
     def get_composition(self, gcd=True):
         """
         Computes the composition of the Structure
@@ -382,6 +453,7 @@ Empty structure
         for i in range(3):
             if self.periodicity[i]:
                 self.reduced[:, i] %= 1.0
+        self._changed()
 
     def reduced2positions(self):
         """
@@ -389,6 +461,7 @@ Empty structure
         from the adimensional cell-reduced coordinates
         """
         self.positions = _np.dot(self.reduced, self.cell)
+        self._changed()
 
     def relocate_to_cm(self, list_of_atoms=None):
         """
@@ -399,6 +472,7 @@ Empty structure
         """
         cm = self.center_mass(list_of_atoms)
         self.positions = self.positions - cm
+        self._changed()
 
     def get_distance(self, iatom, jatom, with_periodicity=True, tolerance=1e-5):
         """
@@ -408,27 +482,13 @@ Empty structure
         :param iatom: (int) index of first atom
         :param jatom: (int) index of second atom
         :param with_periodicity: (bool) if the periodic images should be considered to compute the shortest distance
-        :param tolerance: (float) Tolerance for the bases reduction
+        :param tolerance: (float) Tolerance added to the radius of search for periodic images
 
         :rtype : (float) distance between iatom and jatom
         """
 
         if with_periodicity:
-            reduced_bases = get_reduced_bases(self.cell, tolerance)
-            scaled_pos = _np.dot(self.positions, _np.linalg.inv(reduced_bases))
-            # move scaled atomic positions into -0.5 < r <= 0.5
-            for pos in scaled_pos:
-                pos -= pos.round()
-
-            # Look for the shortest one in surrounded 3x3x3 cells
-            distances_list = []
-            for i in (-1, 0, 1):
-                for j in (-1, 0, 1):
-                    for k in (-1, 0, 1):
-                        distances_list.append(_np.linalg.norm(
-                            _np.dot(scaled_pos[iatom] - scaled_pos[jatom] +
-                                    _np.array([i, j, k]), reduced_bases)))
-            ret = min(distances_list)
+            ret = self.get_spatial_index().minimal_distance(iatom, jatom, tolerance=tolerance)
 
         else:
             posi = self.positions[iatom]
@@ -459,6 +519,7 @@ Empty structure
 
         natom = comp.natom
         symbols = comp.symbols
+        covalent = covalent_radius_array(atomic_number_array(symbols))
 
         best_volume = sys.float_info.max
         best_structure = None
@@ -475,7 +536,7 @@ Empty structure
 
                 factor = 1.0
                 for i in range(len(rpos)):
-                    covalent_dim = 2.0 * covalent_radius(symbols[i])
+                    covalent_dim = 2.0 * covalent[i]
 
                     this_factor = covalent_dim / lattice.a
                     if this_factor > factor:
@@ -489,7 +550,7 @@ Empty structure
 
                     for j in range(i + 1, len(rpos)):
                         distance = lattice.minimal_distance(rpos[i], rpos[j])
-                        covalent_dim = sum(covalent_radius([symbols[i], symbols[j]]))
+                        covalent_dim = covalent[i] + covalent[j]
                         this_factor = covalent_dim / distance
                         if this_factor > factor:
                             factor = this_factor
@@ -506,7 +567,7 @@ Empty structure
                     for i in range(natom):
                         for j in range(i + 1, natom):
                             distance = lattice.minimal_distance(rpos[i], rpos[j])
-                            covalent_dim = sum(covalent_radius([symbols[i], symbols[j]]))
+                            covalent_dim = covalent[i] + covalent[j]
                             if distance < covalent_dim:
                                 if verbose:
                                     print 'At least two atoms are too close :', covalent_dim / distance
@@ -528,7 +589,7 @@ Empty structure
             rpos = best_structure.reduced
             for i, j in combinations(range(natom), 2):
                 distance = best_structure.lattice.minimal_distance(rpos[i], rpos[j])
-                covalent_distance = sum(covalent_radius([symbols[i], symbols[j]]))
+                covalent_distance = covalent[i] + covalent[j]
                 if distance < covalent_distance:
                     if verbose:
                         print 'Covalent distance: %7.4f  Minimal distance: %7.5f  Difference: %e' % \
@@ -554,7 +615,7 @@ Empty structure
                             mindist = ret[k]['distance']
                             eigv = ret[k]['image']
 
-                    covalent_distance = sum(covalent_radius([symbols[i], symbols[j]]))
+                    covalent_distance = covalent[i] + covalent[j]
                     if mindist < covalent_distance:
                         factor = 1.1 * covalent_distance / mindist
                         v1, v2, v3 = vector_set_perpendicular(eigv)
@@ -566,7 +627,7 @@ Empty structure
                     for i in range(natom):
                         for j in range(i + 1, natom):
                             distance = lattice.minimal_distance(rpos[i], rpos[j])
-                            covalent_dim = sum(covalent_radius([symbols[i], symbols[j]]))
+                            covalent_dim = covalent[i] + covalent[j]
                             if distance < covalent_dim:
                                 if verbose:
                                     print 'At least two atoms are too close :', covalent_dim / distance
@@ -588,7 +649,7 @@ Empty structure
             rpos = best_structure.reduced
             for i, j in combinations(range(natom), 2):
                 distance = best_structure.lattice.minimal_distance(rpos[i], rpos[j])
-                covalent_distance = sum(covalent_radius([symbols[i], symbols[j]]))
+                covalent_distance = covalent[i] + covalent[j]
                 if distance < covalent_distance:
                     if verbose:
                         print 'Covalent distance: %7.4f  Minimal distance: %7.5f  Difference: %e' % \
@@ -620,6 +681,7 @@ Empty structure
         else:
             self.cell = _np.array(cell).reshape([3, 3])
         self._lattice = None
+        self._changed()
 
     def set_mag_moments(self, mag_moments):
         """
@@ -650,6 +712,7 @@ Empty structure
             self.periodicity = 3 * periodicity
         else:
             self.periodicity = list(periodicity)
+        self._changed()
 
     def set_positions(self, positions):
         """
@@ -662,6 +725,7 @@ Empty structure
             with dimensional coordinates
         """
         self.positions = _np.array(positions).reshape([-1, 3])
+        self._changed()
 
     def set_reduced(self, reduced):
         """
@@ -674,6 +738,7 @@ Empty structure
             with adimensional coordinates
         """
         self.reduced = _np.array(reduced).reshape([-1, 3])
+        self._changed()
 
     def sort_byaxis(self, axis):
         """
@@ -690,6 +755,7 @@ Empty structure
         order = _np.argsort(self.positions[:, index])
         self.positions = self.positions[order]
         self.symbols = self.symbols[order]
+        self._changed()
 
     def supercell(self, size):
         """
@@ -697,22 +763,12 @@ Empty structure
         of atoms in the x,y,z directions a number of
         size=(nx,ny,nz) times
         """
-        new_natom = _np.prod(size) * self.natom
-        new_symbols = _np.prod(size) * self.symbols
-        new_positions = _np.zeros((new_natom, 3))
-
-        index = 0
-        for i in range(size[0]):
-            for j in range(size[1]):
-                for k in range(size[2]):
-                    for n in range(self.natom):
-                        new_positions[index] = self.positions[n] + (
-                            i * self.cell[0] + j * self.cell[1] + k * self.cell[2])
-                        index += 1
-        new_cell = _np.zeros((3, 3))
-        new_cell[0] = size[0] * self.cell[0]
-        new_cell[1] = size[1] * self.cell[1]
-        new_cell[2] = size[2] * self.cell[2]
+        size = _np.array(size, dtype=int)
+        # Translations for all the images, the last index runs faster
+        offsets = _np.indices(size).reshape((3, -1)).T
+        new_symbols = len(offsets) * list(self.symbols)
+        new_positions = (_np.dot(offsets, self.cell)[:, None, :] + self.positions[None, :, :]).reshape((-1, 3))
+        new_cell = size[:, None] * self.cell
         return Structure(symbols=new_symbols, positions=new_positions, cell=new_cell)
 
     def copy(self, deep=False):
@@ -722,7 +778,7 @@ Empty structure
         copy_struct = Structure(cell=self.cell,
                                 positions=self.positions,
                                 periodicity=self.periodicity,
-                                symbols=self.symbols)
+                                symbols=list(self.symbols))
         return copy_struct
 
     def plot(self, figname='None', size=(300, 325), save=False):
@@ -738,7 +794,7 @@ Empty structure
         x = self.positions[:, 0]
         y = self.positions[:, 1]
         z = self.positions[:, 2]
-        cr = covalent_radius(self.symbols)
+        cr = covalent_radius_array(self._element_numbers())
 
         mlab.points3d(x, y, z, cr, scale_factor=1)
 
@@ -760,14 +816,14 @@ Empty structure
         ret = {'name': self.name,
                'comment': self.comment,
                'natom': self.natom,
-               'symbols': self.symbols,
+               'symbols': list(self.symbols),
                'periodicity': self.periodicity,
-               'cell': self.cell.tolist(),
+               'cell': None if self.cell is None else self.cell.tolist(),
                'positions': self.positions.tolist(),
-               'reduced': self.reduced.tolist(),
+               'reduced': None if self.reduced is None else self.reduced.tolist(),
                'vector_info': self.vector_info,
                'nspecies': len(self.species),
-               'density': self.density,
+               'density': self.density if self.is_crystal else None,
                'formula': self.formula}
         return ret
 
@@ -779,17 +835,55 @@ Empty structure
         natom = structdict['natom']
         symbols = unicode2string(structdict['symbols'])
         periodicity = structdict['periodicity']
-        cell = _np.array(structdict['cell'])
-        positions = _np.array(structdict['positions'])
-        reduced = _np.array(structdict['reduced'])
         vector_info = structdict['vector_info']
-        return Structure(name=name, comment=comment, natom=natom, symbols=symbols, periodicity=periodicity, cell=cell,
-                         positions=positions, reduced=reduced, vector_info=vector_info)
+        # Structures without cell or reduced coordinates store None
+        arrays = {}
+        for key in ['cell', 'positions', 'reduced']:
+            if structdict[key] is not None:
+                arrays[key] = _np.array(structdict[key])
+        return Structure(name=name, comment=comment, natom=natom, symbols=symbols, periodicity=periodicity,
+                         vector_info=vector_info, **arrays)
+
+    @staticmethod
+    def from_arrays(symbols, positions=None, reduced=None, cell=None, periodicity=True, name=None, comment=None):
+        """
+        Creates a Structure from the complete arrays of symbols and coordinates,
+        the arrays are stored at once and the symbols are not validated one by one.
+        This is the method used by the readers of files, prefer it over
+        successive calls to add_atom for large structures
+
+        :param symbols: (list) Symbols of the atoms
+        :param positions: (numpy.ndarray) Cartesian coordinates of the atoms
+        :param reduced: (numpy.ndarray) Reduced coordinates of the atoms, only used if positions is None
+        :param cell: (numpy.ndarray) Lattice vectors as rows of a 3x3 matrix
+        :param periodicity: (bool, list) Periodicity of the structure
+        :param name: (str) Name of the structure
+        :param comment: (str) Comment about the structure
+
+        :rtype : Structure
+        """
+        ret = Structure(periodicity=periodicity, name=name, comment=comment)
+        ret.symbols = list(symbols)
+        ret.natom = len(ret.symbols)
+        if cell is not None:
+            ret.set_cell(cell)
+        if positions is not None:
+            ret.set_positions(positions)
+            if ret.is_crystal:
+                ret.positions2reduced()
+        elif reduced is not None:
+            ret.set_reduced(reduced)
+            ret.reduced2positions()
+        elif ret.natom > 0:
+            raise ValueError('The positions or the reduced coordinates of the atoms are required')
+        if len(ret.positions) != ret.natom:
+            raise ValueError('The number of symbols and coordinates do not match')
+        return ret
 
     def save_json(self, filename):
 
         filep = open(filename, 'w')
-        json.dump(self.todict(), filep, sort_keys=True, indent=4, separators=(',', ': '))
+        json.dump(self.to_dict(), filep, sort_keys=True, indent=4, separators=(',', ': '))
         filep.close()
 
     @staticmethod
@@ -797,7 +891,59 @@ Empty structure
 
         filep = open(filename, 'r')
         structdict = unicode2string(json.load(filep))
-        return Structure().fromdict(structdict)
+        filep.close()
+        return Structure.from_dict(structdict)
+
+    def save_npz(self, filename):
+        """
+        Save the structure on a binary numpy file (.npz), the arrays are
+        stored without conversion to text. The file includes the version
+        of the format on the field 'format_version'
+
+        :param filename: (str) Path to the file, it should end with '.npz'
+        """
+        arrays = {'format_version': _np.array(_NPZ_FORMAT_VERSION),
+                  'symbols': _np.array(self.symbols, dtype=str),
+                  'periodicity': _np.array(self.periodicity, dtype=bool),
+                  'positions': _np.array(self.positions, dtype=float).reshape((-1, 3)),
+                  'name': _np.array('' if self.name is None else self.name),
+                  'comment': _np.array('' if self.comment is None else self.comment)}
+        if self.cell is not None:
+            arrays['cell'] = _np.array(self.cell, dtype=float)
+        if self.reduced is not None:
+            arrays['reduced'] = _np.array(self.reduced, dtype=float).reshape((-1, 3))
+        if self.vector_info['mag_moments'] is not None:
+            arrays['mag_moments'] = _np.array(self.vector_info['mag_moments'], dtype=float)
+        filep = open(filename, 'wb')
+        _np.savez(filep, **arrays)
+        filep.close()
+
+    @staticmethod
+    def load_npz(filename):
+        """
+        Load a structure saved with save_npz
+
+        :param filename: (str) Path to the file
+
+        :rtype : Structure
+        """
+        data = _np.load(filename, allow_pickle=False)
+        try:
+            version = int(data['format_version'])
+            if version > _NPZ_FORMAT_VERSION:
+                raise ValueError('Format version %d of %s is not supported' % (version, filename))
+            symbols = [str(x) for x in data['symbols']]
+            kwargs = {}
+            for key in ['name', 'comment']:
+                if str(data[key]) != '':
+                    kwargs[key] = str(data[key])
+            for key in ['cell', 'positions', 'reduced', 'mag_moments']:
+                if key in data.files:
+                    kwargs[key] = data[key]
+            periodicity = [bool(x) for x in data['periodicity']]
+        finally:
+            data.close()
+        return Structure(natom=len(symbols), symbols=symbols, periodicity=periodicity, **kwargs)
 
     def distance2(self, atom1, atom2):
         assert (isinstance(atom1, int))
@@ -842,7 +988,7 @@ Empty structure
         """
         return any(self.periodicity)
 
-    @property
+    @memoized_property('_version')
     def is_crystal(self):
         """
         True if structure is periodic in all directions
@@ -857,7 +1003,7 @@ Empty structure
         else:
             return self.get_cell().periodic_dimensions == 3
 
-    @property
+    @memoized_property('_species_version')
     def composition(self):
         """
         Dictionary with the composition, the keys are the species and the values
@@ -869,7 +1015,7 @@ Empty structure
         """
         return self.get_composition().composition
 
-    @property
+    @memoized_property('_species_version')
     def formula(self):
         """
         String with the chemical formula
@@ -880,7 +1026,7 @@ Empty structure
         """
         return self.get_composition().formula
 
-    @property
+    @memoized_property('_species_version')
     def density(self):
         """
         Computes the density of the cell
@@ -889,9 +1035,9 @@ Empty structure
 
         :return: float
         """
-        return sum(_np.array(mass(self.symbols))) / self.volume
+        return _np.sum(mass_array(self._element_numbers())) / self.volume
 
-    @property
+    @memoized_property('_version')
     def volume(self):
         """
         Computes the volume of the cell
@@ -910,11 +1056,79 @@ Empty structure
     def nspecies(self):
         return len(self.get_composition().species)
 
+    def _update_species_arrays(self):
+        """
+        Computes the arrays 'numbers' and 'species_index' again
+        if the symbols changed since they were computed
+        """
+        symbols = self.symbols if isinstance(self.symbols, list) else list(self.symbols)
+        if self._symbols_snapshot is not None and self._symbols_snapshot == symbols:
+            return
+        symbols = list(symbols)
+        if self._symbols_snapshot is not None:
+            self._composition = None
+            self._version += 1
+        self._symbols_snapshot = symbols
+        # Symbols that are not elements (dummy atoms, numeric labels) get numbers after the
+        # last element, in alphabetical order, so equal structures get equal numbers
+        unknown = sorted(set(symbols).difference(atomic_symbols[1:]))
+        if len(unknown) == 0:
+            species = self.species
+            index = dict((species[i], i) for i in range(len(species)))
+            self._numbers = atomic_number_array(symbols)
+            self._species_index = _np.array([index[x] for x in symbols], dtype=int)
+            self._species_index.flags.writeable = False
+        else:
+            known = sorted(set(symbols).difference(unknown))
+            numbers = dict(zip(known, atomic_number_array(known)))
+            numbers.update((unknown[i], len(atomic_symbols) + i) for i in range(len(unknown)))
+            self._numbers = _np.array([numbers[x] for x in symbols], dtype=int)
+            self._species_index = None
+        self._numbers.flags.writeable = False
+
+    @property
+    def numbers(self):
+        """
+        Atomic numbers of the atoms as a read-only array of integers,
+        the array is kept in sync with 'symbols'. Symbols that are not
+        elements get numbers larger than any atomic number
+
+        :rtype: numpy.ndarray
+        """
+        self._update_species_arrays()
+        return self._numbers
+
+    @property
+    def species_index(self):
+        """
+        Index of the specie of each atom on the list 'species' as a
+        read-only array of integers, the array is kept in sync with 'symbols'.
+        A ValueError is raised if some symbol is not an element
+
+        :rtype: numpy.ndarray
+        """
+        self._update_species_arrays()
+        if self._species_index is None:
+            self._raise_not_element()
+        return self._species_index
+
+    def _element_numbers(self):
+        """
+        Atomic numbers of the atoms to look up the properties of the elements,
+        a ValueError is raised if some symbol is not an element
+        """
+        numbers = self.numbers
+        if len(numbers) > 0 and _np.max(numbers) >= len(atomic_symbols):
+            self._raise_not_element()
+        return numbers
+
+    def _raise_not_element(self):
+        unknown = sorted(set(self.symbols).difference(atomic_symbols[1:]))
+        raise ValueError('The symbol %s is not an element' % unknown[0])
+
 
 def load_structure_json(filename):
-    ret = Structure()
-    ret.load_json(filename)
-    return ret
+    return Structure.load_json(filename)
 
 
 class DynamicStructure(Structure):
@@ -0,0 +1,163 @@
+"""
+Definition of the class SupercellView
+A supercell presented through index arithmetic on the
+arrays of the original structure, the replicated atoms
+are never stored
+"""
+
+import numpy as _np
+
+from pychemia.core.neighbors import NeighborList
+
+__author__ = 'Guillermo Avendano-Franco'
+
+
+class SupercellView():
+    """
+    Lightweight view of the supercell of a periodic structure.
+
+    The atom 'i' of the original structure on the replica with offset (t0, t1, t2)
+    is the atom number (t0 * size[1] * size[2] + t1 * size[2] + t2) * natom + i
+    on the supercell, the same order used by Structure.supercell.
+    The positions of the replicated atoms are only computed when requested and the
+    neighbor list is built from the neighbor list of the original structure.
+    The view keeps a reference to the structure, changes on the structure are
+    seen on the view
+    """
+
+    def __init__(self, structure, size):
+        """
+        Creates a view of the supercell of a structure
+
+        :param structure: (Structure) The periodic structure replicated
+        :param size: (tuple) Number of replicas along each lattice vector
+        """
+        assert structure.is_crystal
+        self.parent = structure
+        self.size = tuple(int(x) for x in size)
+        self.nimages = int(_np.prod(self.size))
+
+    def __str__(self):
+        return 'SupercellView of size %s of\n%s' % (str(self.size), str(self.parent))
+
+    def __len__(self):
+        return self.natom
+
+    @property
+    def natom(self):
+        return self.nimages * self.parent.natom
+
+    @property
+    def offsets(self):
+        """
+        Integer offsets of all the replicas, the last index runs faster
+
+        :rtype : numpy.ndarray
+        """
+        return _np.indices(self.size).reshape((3, -1)).T
+
+    def parent_index(self, index):
+        """
+        Index on the original structure for atoms of the supercell
+
+        :param index: (int, numpy.ndarray) Indices of atoms on the supercell
+        """
+        return _np.mod(index, self.parent.natom)
+
+    def image_offset(self, index):
+        """
+        Integer offset of the replica for atoms of the supercell
+
+        :param index: (int, numpy.ndarray) Indices of atoms on the supercell
+
+        :rtype : numpy.ndarray
+        """
+        return _np.array(_np.unravel_index(_np.floor_divide(index, self.parent.natom), self.size)).T
+
+    @property
+    def cell(self):
+        return _np.array(self.size)[:, None] * self.parent.cell
+
+    @property
+    def volume(self):
+        return self.nimages * self.parent.volume
+
+    @property
+    def is_crystal(self):
+        return True
+
+    @property
+    def periodicity(self):
+        return self.parent.periodicity
+
+    @property
+    def symbols(self):
+        return self.nimages * list(self.parent.symbols)
+
+    @property
+    def numbers(self):
+        return _np.tile(self.parent.numbers, self.nimages)
+
+    @property
+    def species(self):
+        return self.parent.species
+
+    @property
+    def nspecies(self):
+        return self.parent.nspecies
+
+    @property
+    def species_index(self):
+        return _np.tile(self.parent.species_index, self.nimages)
+
+    @property
+    def composition(self):
+        composition = self.parent.composition
+        return dict((specie, self.nimages * composition[specie]) for specie in composition)
+
+    def get_position(self, index):
+        """
+        Cartesian position of one atom of the supercell
+
+        :param index: (int) Index of the atom on the supercell
+
+        :rtype : numpy.ndarray
+        """
+        return self.parent.positions[self.parent_index(index)] + _np.dot(self.image_offset(index), self.parent.cell)
+
+    @property
+    def positions(self):
+        positions = _np.dot(self.offsets, self.parent.cell)[:, None, :] + self.parent.positions[None, :, :]
+        return positions.reshape((-1, 3))
+
+    @property
+    def reduced(self):
+        reduced = (self.offsets[:, None, :] + self.parent.reduced[None, :, :]) / _np.array(self.size, dtype=float)
+        return reduced.reshape((-1, 3))
+
+    def get_neighbor_list(self, radius):
+        """
+        Computes the NeighborList of the supercell from the distances
+        on the original structure
+
+        :param radius: (float) Maximal distance considered
+
+        :rtype : NeighborList
+        """
+        return NeighborList.build(self.parent.cell, self.parent.reduced, radius).replicate(self.size)
+
+    def to_structure(self):
+        """
+        Creates the supercell as a new Structure
+
+        :rtype : Structure
+        """
+        return self.parent.supercell(self.size)
+
+    def copy(self):
+        """
+        Get a copy of the supercell, the atoms are created on a new Structure
+
+        :rtype : Structure
+        """
+        return self.to_structure()
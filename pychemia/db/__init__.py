@@ -2,7 +2,8 @@
 Routines related to Metadata info and Repositories
 """
 
-from _repo import StructureEntry, ExecutionRepository, PropertiesEntry
+from _repo import StructureEntry, StructureRepository, ExecutionRepository, PropertiesEntry
+from _index import StructureIndex
 try:
     from _db import PyChemiaDB
     USE_MONGO = True
@@ -0,0 +1,199 @@
+"""
+Bulk import of structure files into a StructureRepository
+
+The files are parsed by a pool of processes and the structures are sent
+back to the main process, the only one that writes on the repository.
+The canonical hash stored on the index is also computed by the workers.
+The entries are written in batches, the index and db.json are updated
+once per batch. Every file processed is recorded on a journal inside the
+repository, so an interrupted import can be resumed skipping the files
+already processed. The files of a batch are recorded as pending before
+the entries are written, a pending file whose entry reached the index
+counts as imported when the import is resumed.
+"""
+
+__author__ = 'Guillermo Avendano-Franco'
+
+import os as _os
+import time as _time
+import shutil as _shutil
+import multiprocessing
+
+from pychemia.core.structure import Structure
+from pychemia.analysis._duplicates import canonical_hash
+
+JOURNAL = 'import_journal.txt'
+
+
+def read_cif(filename, primitive=True):
+    """
+    Default reader for the importer, read a CIF file with pymatgen
+
+    :rtype : Structure
+    """
+    from pychemia.external.pymatgen import cif2structure
+    return cif2structure(filename, primitive=primitive)
+
+
+def _read_worker(args):
+    """
+    Read one file on a worker process, the structure is returned
+    as a dictionary together with its canonical hash and the error
+    message if any
+    """
+    filename, reader = args
+    try:
+        structure = reader(filename)
+        if structure is None:
+            return filename, None, None, 'No structure read'
+        structure_hash = canonical_hash(structure)
+    except Exception as exc:
+        return filename, None, None, '%s: %s' % (exc.__class__.__name__, str(exc))
+    return filename, structure.to_dict(), structure_hash, None
+
+
+def read_journal(repository, pending=None):
+    """
+    Files recorded on the journal of imports of a repository.
+    The files recorded as pending are imported only if their entries
+    are on the index of the repository
+
+    :param pending: (dict) If given, it is filled with the files recorded as pending whose
+                    entries are not on the index and their identifiers
+    :return: (tuple) Dictionary with the files imported and their identifiers and
+             dictionary of the files that failed and the reason
+    """
+    imported = {}
+    failed = {}
+    written = {}
+    filename = repository.path + '/' + JOURNAL
+    if _os.path.isfile(filename):
+        rf = open(filename, 'r')
+        for line in rf:
+            fields = line.rstrip('\n').split('\t')
+            if len(fields) != 3:
+                # Incomplete line written when the import was interrupted
+                continue
+            if fields[0] == 'OK':
+                imported[fields[1]] = fields[2]
+            elif fields[0] == 'PENDING':
+                written[fields[1]] = fields[2]
+            else:
+                failed[fields[1]] = fields[2]
+        rf.close()
+    for filename in written:
+        if filename in imported:
+            continue
+        if written[filename] in repository.index:
+            imported[filename] = written[filename]
+        elif pending is not None:
+            pending[filename] = written[filename]
+    return imported, failed
+
+
+def import_files(repository, filenames, tags=None, reader=None, nproc=1, batch_size=100, resume=True,
+                 verbose=False):
+    """
+    Import structure files into a repository
+
+    :param repository: (StructureRepository) The repository
+    :param filenames: (list) Paths to the files
+    :param tags: (str, list) Tags added to all the new entries
+    :param reader: (function) Function that receives a filename and returns a Structure or None,
+                   it must be defined at module level when nproc > 1. By default CIF files are read
+    :param nproc: (int) Number of processes reading files
+    :param batch_size: (int) Number of entries written on each update of the repository
+    :param resume: (bool) Skip the files found on the journal from previous imports,
+                   including the files that failed
+    :param verbose: (bool) Print the progress after each batch
+
+    :return: (dict) Report with the keys 'imported' (dictionary of files and identifiers), 'failed'
+             (dictionary of files and reasons), 'skipped' (number of files already on the journal),
+             'time' (seconds) and 'rate' (files processed per second)
+    """
+    from _repo import StructureEntry
+
+    if reader is None:
+        reader = read_cif
+    if tags is None:
+        tags = []
+    elif isinstance(tags, basestring):
+        tags = [tags]
+
+    filenames = [_os.path.abspath(x) for x in filenames]
+    if resume:
+        interrupted = {}
+        done_ok, done_failed = read_journal(repository, interrupted)
+        # Entries written by an interrupted batch that never reached the index
+        for identifier in interrupted.values():
+            if _os.path.isdir(repository.entry_path(identifier)):
+                _shutil.rmtree(repository.entry_path(identifier))
+        pending = [x for x in filenames if x not in done_ok and x not in done_failed]
+    else:
+        pending = filenames
+    report = {'imported': {}, 'failed': {}, 'skipped': len(filenames) - len(pending)}
+
+    start = _time.time()
+    journal = open(repository.path + '/' + JOURNAL, 'a')
+    if nproc > 1 and len(pending) > 1:
+        pool = multiprocessing.Pool(nproc)
+        chunksize = max(1, min(batch_size, len(pending) / (4 * nproc)))
+        results = pool.imap_unordered(_read_worker, [(x, reader) for x in pending], chunksize)
+    else:
+        pool = None
+        results = (_read_worker((x, reader)) for x in pending)
+
+    batch = []
+    failed = []
+    try:
+        nprocessed = 0
+        for filename, structdict, structure_hash, error in results:
+            nprocessed += 1
+            if structdict is None:
+                failed.append((filename, error))
+            else:
+                structure = Structure.from_dict(structdict)
+                batch.append((filename, StructureEntry(structure=structure, original_file=filename,
+                                                       tags=list(tags)), structure_hash))
+            if len(batch) + len(failed) >= batch_size or nprocessed == len(pending):
+                current = (batch, failed)
+                batch = []
+                failed = []
+                _flush(repository, current[0], current[1], journal, report)
+                if verbose:
+                    elapsed = _time.time() - start
+                    print 'Processed %d of %d files (%.1f files/s), %d failed' % (nprocessed, len(pending),
+                                                                                  nprocessed / max(elapsed, 1E-6),
+                                                                                  len(report['failed']))
+    finally:
+        # Whatever was read before an interruption is kept
+        if len(batch) + len(failed) > 0:
+            _flush(repository, batch, failed, journal, report)
+        journal.close()
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+
+    report['time'] = _time.time() - start
+    nfiles = len(report['imported']) + len(report['failed'])
+    report['rate'] = nfiles / report['time'] if report['time'] > 0 else 0.0
+    return report
+
+
+def _flush(repository, batch, failed, journal, report):
+    """
+    Write a batch of entries on the repository and record them on the journal,
+    the files are recorded as pending before writing the entries
+    """
+    for filename, entry, structure_hash in batch:
+        journal.write('PENDING\t%s\t%s\n' % (filename, entry.identifier))
+    journal.flush()
+    _os.fsync(journal.fileno())
+    repository.add_entries([x[1] for x in batch], hashes=[x[2] for x in batch])
+    for filename, entry, structure_hash in batch:
+        journal.write('OK\t%s\t%s\n' % (filename, entry.identifier))
+        report['imported'][filename] = entry.identifier
+    for filename, error in failed:
+        journal.write('FAILED\t%s\t%s\n' % (filename, ' '.join(str(error).split())))
+        report['failed'][filename] = error
+    journal.flush()
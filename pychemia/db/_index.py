@@ -0,0 +1,228 @@
+"""
+Index of the entries of a StructureRepository
+
+The index is an SQLite database stored next to the file db.json of the
+repository. For each entry it keeps the formula, number of atoms, number
+of species, density, canonical hash, species and tags, so the repository
+can be queried without reading the directories of the entries.
+"""
+
+__author__ = 'Guillermo Avendano-Franco'
+
+import sqlite3 as _sqlite3
+import threading as _threading
+
+from pychemia.analysis._duplicates import canonical_hash
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (identifier TEXT PRIMARY KEY, formula TEXT, natom INTEGER,
+                                    nspecies INTEGER, density REAL, hash TEXT);
+CREATE TABLE IF NOT EXISTS species (identifier TEXT, specie TEXT);
+CREATE TABLE IF NOT EXISTS tags (identifier TEXT, tag TEXT);
+CREATE INDEX IF NOT EXISTS entries_formula ON entries (formula);
+CREATE INDEX IF NOT EXISTS entries_natom ON entries (natom);
+CREATE INDEX IF NOT EXISTS entries_density ON entries (density);
+CREATE INDEX IF NOT EXISTS entries_hash ON entries (hash);
+CREATE INDEX IF NOT EXISTS species_specie ON species (specie, identifier);
+CREATE INDEX IF NOT EXISTS species_identifier ON species (identifier);
+CREATE INDEX IF NOT EXISTS tags_tag ON tags (tag, identifier);
+CREATE INDEX IF NOT EXISTS tags_identifier ON tags (identifier);
+"""
+
+
+class StructureIndex():
+    """
+    SQLite index of the entries of a StructureRepository.
+    The index could be shared by several threads, the modifications
+    are serialized with a lock
+    """
+
+    def __init__(self, filename):
+        """
+        Opens the index, the file is created if it does not exist
+
+        :param filename: (str) Path to the SQLite file
+        """
+        self.filename = filename
+        self._lock = _threading.Lock()
+        self._connection = _sqlite3.connect(filename, check_same_thread=False)
+        self._connection.text_factory = str
+        self._connection.executescript(_SCHEMA)
+        self._connection.commit()
+
+    def __len__(self):
+        return self._query('SELECT COUNT(*) FROM entries')[0][0]
+
+    def __contains__(self, identifier):
+        return len(self._query('SELECT 1 FROM entries WHERE identifier = ?', (identifier,))) > 0
+
+    def _query(self, sql, parameters=()):
+        with self._lock:
+            return self._connection.execute(sql, parameters).fetchall()
+
+    def close(self):
+        self._connection.close()
+
+    def commit(self):
+        with self._lock:
+            self._connection.commit()
+
+    def add(self, entry, commit=True, structure_hash=None):
+        """
+        Add an entry to the index or update it if it is already there
+
+        :param entry: (StructureEntry) The entry, its structure must be loaded
+        :param commit: (bool) If False the changes are not written until the next commit
+        :param structure_hash: (str) The canonical hash of the structure if it was already computed
+        """
+        structure = entry.structure
+        composition = structure.composition
+        if structure.is_crystal:
+            density = float(structure.density)
+        else:
+            density = None
+        if structure_hash is None:
+            structure_hash = canonical_hash(structure)
+        row = (entry.identifier, structure.formula, structure.natom, len(composition), density, structure_hash)
+        with self._lock:
+            self._delete(entry.identifier)
+            self._connection.execute('INSERT INTO entries VALUES (?, ?, ?, ?, ?, ?)', row)
+            self._connection.executemany('INSERT INTO species VALUES (?, ?)',
+                                         [(entry.identifier, x) for x in sorted(composition)])
+            if entry.tags is not None:
+                self._connection.executemany('INSERT INTO tags VALUES (?, ?)',
+                                             [(entry.identifier, x) for x in sorted(set(entry.tags))])
+            if commit:
+                self._connection.commit()
+
+    def remove(self, identifier, commit=True):
+        """
+        Remove an entry from the index
+
+        :param identifier: (str) Identifier of the entry
+        :param commit: (bool) If False the changes are not written until the next commit
+        """
+        with self._lock:
+            self._delete(identifier)
+            if commit:
+                self._connection.commit()
+
+    def _delete(self, identifier):
+        for table in ['entries', 'species', 'tags']:
+            self._connection.execute('DELETE FROM %s WHERE identifier = ?' % table, (identifier,))
+
+    def clear(self):
+        """
+        Remove all the entries from the index
+        """
+        with self._lock:
+            for table in ['entries', 'species', 'tags']:
+                self._connection.execute('DELETE FROM %s' % table)
+            self._connection.commit()
+
+    def get_identifiers(self):
+        """
+        Identifiers of all the entries on the index
+
+        :rtype : list
+        """
+        return [x[0] for x in self._query('SELECT identifier FROM entries ORDER BY identifier')]
+
+    def get_formulas(self):
+        """
+        Dictionary with the formulas as keys and the list of
+        identifiers with each formula as values
+
+        :rtype : dict
+        """
+        formulas = {}
+        for formula, identifier in self._query('SELECT formula, identifier FROM entries ORDER BY identifier'):
+            formulas.setdefault(formula, []).append(identifier)
+        return formulas
+
+    def get_tags(self):
+        """
+        Dictionary with the tags as keys and the list of
+        identifiers with each tag as values
+
+        :rtype : dict
+        """
+        tags = {}
+        for tag, identifier in self._query('SELECT tag, identifier FROM tags ORDER BY identifier'):
+            tags.setdefault(tag, []).append(identifier)
+        return tags
+
+    def get_hashes(self):
+        """
+        Dictionary with the canonical hashes as keys and the list of
+        identifiers with each hash as values
+
+        :rtype : dict
+        """
+        hashes = {}
+        for key, identifier in self._query('SELECT hash, identifier FROM entries ORDER BY identifier'):
+            hashes.setdefault(key, []).append(identifier)
+        return hashes
+
+    def get_row(self, identifier):
+        """
+        Values stored on the index for one entry
+
+        :return: (dict) Dictionary with keys 'formula', 'natom', 'nspecies', 'density', 'hash',
+                 'species' and 'tags', None if the entry is not on the index
+        """
+        rows = self._query('SELECT formula, natom, nspecies, density, hash FROM entries WHERE identifier = ?',
+                           (identifier,))
+        if len(rows) == 0:
+            return None
+        ret = dict(zip(['formula', 'natom', 'nspecies', 'density', 'hash'], rows[0]))
+        ret['species'] = [x[0] for x in self._query('SELECT specie FROM species WHERE identifier = ?',
+                                                    (identifier,))]
+        ret['tags'] = [x[0] for x in self._query('SELECT tag FROM tags WHERE identifier = ?', (identifier,))]
+        return ret
+
+    def search(self, formula=None, species=None, natom=None, density=None, tags=None):
+        """
+        Identifiers of the entries that satisfy all the given conditions
+
+        :param formula: (str) Formula as returned by Structure.formula
+        :param species: (str, list) Species that must be present on the structure
+        :param natom: (int, tuple) Number of atoms or range (min, max), None for an open limit
+        :param density: (tuple) Range of density (min, max), None for an open limit
+        :param tags: (str, list) Tags that the entry must have
+
+        :rtype : list
+        """
+        conditions = []
+        parameters = []
+        if formula is not None:
+            conditions.append('formula = ?')
+            parameters.append(formula)
+        if natom is not None:
+            if isinstance(natom, int):
+                natom = (natom, natom)
+            _add_range('natom', natom, conditions, parameters)
+        if density is not None:
+            _add_range('density', density, conditions, parameters)
+        for table, column, values in [('species', 'specie', species), ('tags', 'tag', tags)]:
+            if values is None:
+                continue
+            if isinstance(values, basestring):
+                values = [values]
+            for value in values:
+                conditions.append('identifier IN (SELECT identifier FROM %s WHERE %s = ?)' % (table, column))
+                parameters.append(value)
+
+        sql = 'SELECT identifier FROM entries'
+        if len(conditions) > 0:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        return [x[0] for x in self._query(sql + ' ORDER BY identifier', tuple(parameters))]
+
+
+def _add_range(column, limits, conditions, parameters):
+    if limits[0] is not None:
+        conditions.append('%s >= ?' % column)
+        parameters.append(limits[0])
+    if limits[1] is not None:
+        conditions.append('%s <= ?' % column)
+        parameters.append(limits[1])
@@ -15,21 +15,33 @@ import json as _json
 import os as _os
 import uuid as _uuid
 import shutil as _shutil
-import math
 
-from pychemia.core.structure import load_structure_json
+from pychemia.core.structure import Structure, load_structure_json
+from pychemia.analysis._duplicates import DuplicateIndex
 from pychemia.utils.computing import unicode2string
+from _index import StructureIndex
 
 
 class StructureEntry():
     """
     Defines one entry in the repository of Structures
+
+    The entries read from a repository load only the metadata (tags, parents
+    and children), the structure, the properties and the list of original
+    files are read from the repository the first time they are accessed
     """
 
-    def __init__(self, structure=None, repository=None, identifier=None, original_file=None, tags=None):
+    # Attributes loaded on demand and the methods that load them
+    _lazy_attributes = {'structure': 'load_structure',
+                        'properties': 'load_properties',
+                        'original_file': 'load_originals'}
+
+    def __init__(self, structure=None, repository=None, identifier=None, original_file=None, tags=None,
+                 header=False):
         """
         Creates a new Entry for Structures
-        If identifier is provided the corresponding Structure is load in the Entry
+        If identifier is provided the metadata of the corresponding entry is
+        read and the Structure is load in the Entry when it is used
         Otherwise a new entry is created with a UUID random identifier
 
         Args:
@@ -37,10 +49,11 @@ class StructureEntry():
         repository: (object) The StructureRepository that will be associated
         original_file: (string) Path to the original file (CIF, POSCAR, etc)
         tags: (string or list) Tags that will be associated to that structure
+        header: (bool) If True only the file metadata.json is checked and read,
+                intended for scans over all the entries of a repository
         """
-        self.properties = None
-
         if identifier is None:
+            self.properties = None
             self.structure = structure
             self.identifier = str(_uuid.uuid4())
             self.path = None
@@ -74,14 +87,23 @@ class StructureEntry():
             assert (repository is not None)
             self.identifier = identifier
             self.repository = repository
-            self.path = self.repository.path + '/' + self.identifier
-            if not _os.path.isdir(self.path):
-                raise ValueError("Directory not found: " + self.path)
+            self.path = self.repository.locate(self.identifier)
+            if not header:
+                if not _os.path.isdir(self.path):
+                    raise ValueError("Directory not found: " + self.path)
+                if not _os.path.isfile(self.path + '/structure.npz') and \
+                        not _os.path.isfile(self.path + '/structure.json'):
+                    raise ValueError("No structure found in " + self.path)
             if not _os.path.isfile(self.path + '/metadata.json'):
                 raise ValueError("No metadata found in " + self.path)
-            if not _os.path.isfile(self.path + '/structure.json'):
-                raise ValueError("No structure found in " + self.path)
-            self.load()
+            self.load_metadata()
+
+    def __getattr__(self, name):
+        # Only called when the attribute is not set yet
+        if name in self._lazy_attributes and 'path' in self.__dict__:
+            getattr(self, self._lazy_attributes[name])()
+            return self.__dict__[name]
+        raise AttributeError(name)
 
     def metadatatodict(self):
         ret = {'tags': self.tags,
@@ -90,6 +112,15 @@ class StructureEntry():
         return ret
 
     def load(self):
+        """
+        Read all the contents of the entry from the repository
+        """
+        self.load_metadata()
+        self.load_structure()
+        self.load_properties()
+        self.load_originals()
+
+    def load_metadata(self):
         assert isinstance(self.identifier, str)
         rf = open(self.path + '/metadata.json', 'r')
         self.metadatafromdict(unicode2string(_json.load(rf)))
@@ -100,7 +131,19 @@ class StructureEntry():
             self.children = []
         if self.parents is None:
             self.parents = []
-        self.structure = load_structure_json(self.path + '/structure.json')
+
+    def load_structure(self):
+        """
+        Read the structure from the binary file structure.npz or
+        from structure.json for entries saved with the JSON format
+        """
+        if _os.path.isfile(self.path + '/structure.npz'):
+            self.structure = Structure.load_npz(self.path + '/structure.npz')
+        else:
+            self.structure = load_structure_json(self.path + '/structure.json')
+
+    def load_properties(self):
+        self.properties = None
         if _os.path.isfile(self.path + '/properties.json'):
             rf = open(self.path + '/properties.json', 'r')
             try:
@@ -109,7 +152,6 @@ class StructureEntry():
                 _os.rename(self.path + '/properties.json', self.path + '/properties.json.FAILED')
                 self.properties = None
             rf.close()
-        self.load_originals()
 
     def load_originals(self):
         orig_dir = self.path + '/original'
@@ -120,11 +162,19 @@ class StructureEntry():
 
     def save(self):
         if self.path is None:
-            self.path = self.repository.path + '/' + self.identifier
+            self.path = self.repository.entry_path(self.identifier)
         wf = open(self.path + '/metadata.json', 'w')
         _json.dump(self.metadatatodict(), wf, sort_keys=True, indent=4, separators=(',', ': '))
         wf.close()
-        self.structure.save_json(self.path + '/structure.json')
+        # The structure is saved on the format of the repository and the other file is removed
+        if getattr(self.repository, 'structure_format', 'json') == 'npz':
+            self.structure.save_npz(self.path + '/structure.npz')
+            obsolete = self.path + '/structure.json'
+        else:
+            self.structure.save_json(self.path + '/structure.json')
+            obsolete = self.path + '/structure.npz'
+        if _os.path.isfile(obsolete):
+            _os.remove(obsolete)
         if self.properties is not None:
             wf = open(self.path + '/properties.json', 'w')
             _json.dump(self.properties, wf, sort_keys=True, indent=4, separators=(',', ': '))
@@ -276,17 +326,41 @@ class StructureRepository():
     and check those db
     """
 
-    def __init__(self, path):
+    # Layouts of the directories of the entries
+    layouts = ['flat', 'sharded']
+    # Formats of the files with the structures of the entries
+    structure_formats = ['json', 'npz']
+
+    def __init__(self, path, layout='flat', structure_format='json'):
         """
         Creates new db for calculations and structures
+        The entries are indexed on the SQLite file 'index.db', the index
+        is built from the entries for repositories created without it
 
         Args:
         path: (string) Directory path for the structure repository
+        layout: (string) Layout for a new repository, 'flat' stores each entry
+                as a subdirectory of path, 'sharded' nests the entries in two levels of
+                subdirectories named after the hash of the identifier (ab/cd/identifier).
+                Existing repositories keep their layout, use migrate() to change it
+        structure_format: (string) Format of the structures for a new repository, 'json' (default)
+                or 'npz' for binary numpy files. Entries on both formats are read on any repository
         """
+        if layout not in self.layouts:
+            raise ValueError('Unknown layout: %s' % layout)
+        if structure_format not in self.structure_formats:
+            raise ValueError('Unknown structure format: %s' % structure_format)
         self.path = _os.path.abspath(path)
+        self.layout = layout
+        self.structure_format = structure_format
+        self.index = None
 
         if _os.path.isfile(self.path + '/db.json'):
             self.load()
+            missing_index = not _os.path.isfile(self.path + '/index.db')
+            self.index = StructureIndex(self.path + '/index.db')
+            if missing_index:
+                self.rebuild()
         else:
             self.tags = {}
 
@@ -295,18 +369,110 @@ class StructureRepository():
                     raise ValueError('Path exists already and it is not a directory')
             else:
                 _os.mkdir(self.path)
+            self.index = StructureIndex(self.path + '/index.db')
             self.save()
 
     def todict(self):
         """
         Serialize the values of the db into a dictionary
         """
-        repos_dict = {'tags': self.tags}
+        repos_dict = {'tags': self.tags, 'layout': self.layout, 'structure_format': self.structure_format}
 
         return repos_dict
 
     def fromdict(self, repos_dict):
         self.tags = repos_dict['tags']
+        # Repositories created before the layouts and formats were introduced are flat and use JSON
+        self.layout = repos_dict.get('layout', 'flat')
+        self.structure_format = repos_dict.get('structure_format', 'json')
+
+    def entry_path(self, identifier, layout=None):
+        """
+        Directory of an entry on the layout of the repository or on a given layout
+
+        :param identifier: (str) Identifier of the entry
+        :param layout: (str) 'flat' or 'sharded', by default the layout of the repository
+
+        :rtype : str
+        """
+        if layout is None:
+            layout = self.layout
+        if layout == 'sharded':
+            prefix = hashlib.md5(identifier).hexdigest()
+            return self.path + '/' + prefix[:2] + '/' + prefix[2:4] + '/' + identifier
+        return self.path + '/' + identifier
+
+    def locate(self, identifier):
+        """
+        Directory of an existing entry in any layout, entries on the layout of the
+        repository are found first. If the entry does not exist the path on the
+        layout of the repository is returned
+
+        :rtype : str
+        """
+        for layout in [self.layout] + [x for x in self.layouts if x != self.layout]:
+            path = self.entry_path(identifier, layout)
+            if _os.path.isfile(path + '/metadata.json'):
+                return path
+        return self.entry_path(identifier)
+
+    def scan_entries(self):
+        """
+        Identifiers of the entries found on disk in any layout, the index is not used
+
+        :rtype : list
+        """
+        ret = []
+        for name in _os.listdir(self.path):
+            if _os.path.isfile(self.path + '/' + name + '/metadata.json'):
+                ret.append(name)
+            elif len(name) == 2 and _os.path.isdir(self.path + '/' + name):
+                # Shards of the sharded layout
+                for second in _os.listdir(self.path + '/' + name):
+                    shard = self.path + '/' + name + '/' + second
+                    if len(second) == 2 and _os.path.isdir(shard):
+                        ret += [x for x in _os.listdir(shard) if _os.path.isfile(shard + '/' + x + '/metadata.json')]
+        return ret
+
+    def migrate(self, layout, verbose=False):
+        """
+        Move all the entries to a new layout, the migration could be interrupted
+        and executed again to move the remaining entries
+
+        :param layout: (str) 'flat' or 'sharded'
+        :param verbose: (bool) Print the progress
+
+        :return: (int) Number of entries moved
+        """
+        if layout not in self.layouts:
+            raise ValueError('Unknown layout: %s' % layout)
+        # New entries are created on the new layout from now
+        self.layout = layout
+        self.save()
+        moved = 0
+        for ident in self.scan_entries():
+            orig = self.locate(ident)
+            dest = self.entry_path(ident)
+            if orig == dest:
+                continue
+            if not _os.path.isdir(_os.path.dirname(dest)):
+                _os.makedirs(_os.path.dirname(dest))
+            _os.rename(orig, dest)
+            moved += 1
+            if verbose and moved % 1000 == 0:
+                print 'Moved %d entries' % moved
+        # Remove the empty shards
+        if layout == 'flat':
+            for name in _os.listdir(self.path):
+                if len(name) == 2 and _os.path.isdir(self.path + '/' + name):
+                    for second in _os.listdir(self.path + '/' + name):
+                        if len(second) == 2 and len(_os.listdir(self.path + '/' + name + '/' + second)) == 0:
+                            _os.rmdir(self.path + '/' + name + '/' + second)
+                    if len(_os.listdir(self.path + '/' + name)) == 0:
+                        _os.rmdir(self.path + '/' + name)
+        if verbose:
+            print 'Moved %d entries to the %s layout' % (moved, layout)
+        return moved
 
     def save(self):
         """
@@ -330,34 +496,47 @@ class StructureRepository():
         rf.close()
 
     def rebuild(self):
-        ids = self.get_all_entries
+        """
+        Build again the tags and the index from the entries found on the repository
+        """
+        ids = self.scan_entries()
         self.tags = {}
+        self.index.clear()
         for ident in ids:
-            struct_entry = StructureEntry(identifier=ident, repository=self)
+            struct_entry = StructureEntry(identifier=ident, repository=self, header=True)
             for i in struct_entry.tags:
                 if i in self.tags:
                     self.tags[i].append(ident)
                 else:
                     self.tags[i] = [ident]
+            self.index.add(struct_entry, commit=False)
+        self.index.commit()
         self.save()
 
     @property
     def get_all_entries(self):
-        return [x for x in _os.listdir(self.path) if _os.path.isfile(self.path + '/' + x + '/metadata.json')]
+        return self.index.get_identifiers()
 
     def __len__(self):
-        return len(self.get_all_entries)
+        return len(self.index)
 
     def get_formulas(self):
-        formulas = {}
-        for i in self.get_all_entries:
-            ientry = StructureEntry(repository=self, identifier=i)
-            formula = ientry.structure.formula
-            if formula in formulas:
-                formulas[formula].append(i)
-            else:
-                formulas[formula] = [i]
-        return formulas
+        return self.index.get_formulas()
+
+    def search(self, formula=None, species=None, natom=None, density=None, tags=None):
+        """
+        Identifiers of the entries that satisfy all the given conditions,
+        the entries are not read, only the index is used
+
+        :param formula: (str) Formula as returned by Structure.formula
+        :param species: (str, list) Species that must be present on the structure
+        :param natom: (int, tuple) Number of atoms or range (min, max), None for an open limit
+        :param density: (tuple) Range of density (min, max), None for an open limit
+        :param tags: (str, list) Tags that the entry must have
+
+        :rtype : list
+        """
+        return self.index.search(formula=formula, species=species, natom=natom, density=density, tags=tags)
 
     def merge2entries(self, orig, dest):
         assert(orig.structure == dest.structure)
@@ -367,26 +546,40 @@ class StructureRepository():
         if orig.original_file is not None and len(orig.original_file) > 0:
             dest.add_original_file(orig.original_file)
         dest.save()
+        self.index.add(dest)
         self.del_entry(orig)
 
     def clean(self):
         for i in self.tags:
-            for j in self.tags[i]:
-                if not _os.path.isdir(self.path+'/'+j) or not _os.path.isfile(self.path+'/'+j+'/metadata.json'):
+            for j in list(self.tags[i]):
+                if not _os.path.isfile(self.locate(j)+'/metadata.json'):
                     print 'Removing', j
                     self.tags[i].remove(j)
+        for j in self.get_all_entries:
+            if not _os.path.isfile(self.locate(j)+'/metadata.json'):
+                print 'Removing', j
+                self.index.remove(j)
         self.save()
 
     def refine(self):
-        formulas = self.get_formulas()
-        for j in formulas:
-            print j
-            if len(formulas[j]) > 1:
-                for i in range(len(formulas[j])-1):
-                    stru1 = StructureEntry(repository=self, identifier=formulas[j][i])
-                    stru2 = StructureEntry(repository=self, identifier=formulas[j][i+1])
-                    if stru1 == stru2:
-                        self.merge2entries(stru1, stru2)
+        """
+        Merge the entries that are equal, the entries are first indexed by
+        the canonical hash of their structures and only the entries with the
+        same hash are compared. Entries with a hash not shared with other
+        entries on the index are not read
+        """
+        entries = {}
+
+        def equal_entries(ident1, ident2):
+            return entries[ident1] == entries[ident2]
+
+        index = DuplicateIndex(confirm=equal_entries)
+        candidates = [x for ids in self.index.get_hashes().values() if len(ids) > 1 for x in ids]
+        for ident in sorted(candidates):
+            entries[ident] = StructureEntry(repository=self, identifier=ident)
+            duplicate = index.add(ident, entries[ident].structure)
+            if duplicate is not None:
+                self.merge2entries(entries[ident], entries[duplicate])
         self.save()
 
     def merge(self, other):
@@ -397,16 +590,17 @@ class StructureRepository():
         :param other: StructureRepository
         """
         conflict_entries = []
-        for i in other.get_all_enties:
-            if i in self.get_all_entries:
+        for i in other.get_all_entries:
+            if i in self.index:
                 other_structure = StructureEntry(repository=other, identifier=i)
                 this_structure = StructureEntry(repository=self, identifier=i)
                 if this_structure != other_structure:
                     conflict_entries.append(i)
         if len(conflict_entries) == 0:
-            for i in other.get_all_enties:
-                if i not in self.get_all_entries:
-                    _shutil.copytree(other.path+'/'+i, self.path+'/'+i)
+            for i in other.get_all_entries:
+                if i not in self.index:
+                    _shutil.copytree(other.locate(i), self.entry_path(i))
+                    self.index.add(StructureEntry(repository=self, identifier=i))
         else:
             print('Conflict entries found, No merge done')
             return conflict_entries
@@ -416,9 +610,9 @@ class StructureRepository():
         Add a new StructureEntry into the repository
         """
         entry.repository = self
-        entry.path = self.path + '/' + entry.identifier
+        entry.path = self.entry_path(entry.identifier)
         if not _os.path.isdir(entry.path):
-            _os.mkdir(entry.path)
+            _os.makedirs(entry.path)
         entry.save()
         if entry.tags is not None:
             for itag in entry.tags:
@@ -427,42 +621,63 @@ class StructureRepository():
                         self.tags[itag].append(entry.identifier)
                 else:
                     self.tags[itag] = [entry.identifier]
+        self.index.add(entry)
         self.save()
 
+    def add_entries(self, entries, hashes=None):
+        """
+        Add several new StructureEntry objects into the repository,
+        the index and the file db.json are updated only once
+
+        :param entries: (list) The new entries
+        :param hashes: (list) The canonical hashes of their structures if they were already computed
+        """
+        if hashes is None:
+            hashes = len(entries) * [None]
+        for entry, structure_hash in zip(entries, hashes):
+            entry.repository = self
+            entry.path = self.entry_path(entry.identifier)
+            if not _os.path.isdir(entry.path):
+                _os.makedirs(entry.path)
+            entry.save()
+            if entry.tags is not None:
+                for itag in entry.tags:
+                    if itag in self.tags:
+                        if not entry.identifier in self.tags[itag]:
+                            self.tags[itag].append(entry.identifier)
+                    else:
+                        self.tags[itag] = [entry.identifier]
+            self.index.add(entry, commit=False, structure_hash=structure_hash)
+        self.index.commit()
+        self.save()
+
+    def import_files(self, filenames, tags=None, reader=None, nproc=1, batch_size=100, resume=True, verbose=False):
+        """
+        Import many structure files (CIF by default) into the repository.
+        The files are read by a pool of processes and the entries are written
+        in batches, an interrupted import continues where it stopped.
+        See pychemia.db._importer.import_files for the arguments
+
+        :rtype : dict
+        """
+        from _importer import import_files
+        return import_files(self, filenames, tags=tags, reader=reader, nproc=nproc, batch_size=batch_size,
+                            resume=resume, verbose=verbose)
+
     def add_many_entries(self, list_of_entries, tag, number_threads=1):
+        """
+        Import many CIF files using 'number_threads' processes, the import
+        finishes before returning
 
-        from threading import Thread
-        from pychemia.external.pymatgen import cif2structure
-
-        def worker(cifs, tags, results):
-            results['succeed'] = []
-            results['failed'] = []
-            for icif in cifs:
-                try:
-                    struct = cif2structure(icif, primitive=True)
-                except ValueError:
-                    struct = None
-                    results['failed'].append(icif)
-                if struct is not None:
-                    structentry = StructureEntry(structure=struct, original_file=icif, tags=[tags])
-                    self.add_entry(structentry)
-                    results['succeed'].append(icif)
-
-        th = []
-        result_list = []
-        num = int(math.ceil(float(len(list_of_entries))/number_threads))
-        for i in range(number_threads):
-            result_list.append({})
-            th.append(Thread(target=worker,
-                             args=(list_of_entries[i*num:min((i+1)*num, len(list_of_entries))], tag, result_list[i])))
-        for i in th:
-            i.start()
-        return th, result_list
+        :return: (dict) The report of import_files
+        """
+        return self.import_files(list_of_entries, tags=tag, nproc=number_threads)
 
     def del_entry(self, entry):
         print 'Deleting ', entry.identifier
         for i in entry.tags:
             self.tags[i].remove(entry.identifier)
+        self.index.remove(entry.identifier)
         _shutil.rmtree(entry.path)
 
     def __str__(self):
@@ -498,6 +713,6 @@ def _add2list(orig, dest):
         if not orig in dest:
             dest.append(orig)
     elif isinstance(orig, list):
-        for iorig in dest:
+        for iorig in orig:
             if not iorig in dest:
                 dest.append(iorig)
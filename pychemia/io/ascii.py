@@ -87,9 +87,9 @@ def load(filep):
                 [unit * box[3], unit * box[4], unit * box[5]]]
 
     if "reduced" in keywords:
-        struct = Structure(cell=cell, reduced=positions, symbols=symbols, name=comment)
+        struct = Structure.from_arrays(symbols, reduced=positions, cell=cell, name=comment)
     else:
-        struct = Structure(cell=cell, reduced=positions, symbols=symbols, name=comment)
+        struct = Structure.from_arrays(symbols, positions=positions, cell=cell, name=comment)
 
     return struct
 
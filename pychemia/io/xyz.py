@@ -7,10 +7,9 @@ def load(filename):
 
     symbols = _np.loadtxt(filename, skiprows=2, usecols=[0], dtype='|S2', ndmin=1)
     positions = _np.loadtxt(filename, skiprows=2, usecols=(1, 2, 3), ndmin=2)
-    natom = len(symbols)
     periodicity = 3*[False]
 
-    struct = pychemia.core.Structure(symbols=symbols, positions=positions, periodicity=periodicity, natom=natom)
+    struct = pychemia.core.Structure.from_arrays(list(symbols), positions=positions, periodicity=periodicity)
     return struct
 
 
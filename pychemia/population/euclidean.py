@@ -77,6 +77,16 @@ class EuclideanPopulation():
         x2 = self.db[jmember]['x']
         return np.linalg.norm(x2-x1)
 
+    def distance_matrix(self, members=None):
+        """
+        Matrix of distances between members, ordered as 'members'
+        by default the actives are used
+        """
+        if members is None:
+            members = self.actives
+        x = np.array([self.db[imember]['x'] for imember in members]).reshape((len(members), -1))
+        return np.sqrt(np.sum((x[:, None, :] - x[None, :, :]) ** 2, axis=2))
+
     @staticmethod
     def new_identifier():
         return str(uuid.uuid4())[-12:]
@@ -9,15 +9,16 @@ import json
 import numpy as np
 
 from pychemia import Composition, Structure
+from pychemia.core.generator import random_structures
 from pychemia.db import USE_MONGO
 if USE_MONGO:
     from pychemia.db import PyChemiaDB
-from pychemia.analysis import StructureAnalysis, StructureChanger
+from pychemia.analysis import StructureChanger, FingerprintCache, DuplicateIndex, composition_key
 from pychemia.utils.mathematics import unit_vector
 
 
 class StructurePopulation():
-    def __init__(self, name, composition, tag='global', delta=0.1, new=False):
+    def __init__(self, name, composition, tag='global', delta=0.1, new=False, fingerprints_path=None):
         """
         Defines a population of PyChemia Structures,
 
@@ -32,6 +33,8 @@ class StructurePopulation():
         :param tag: A tag to differentiate different instances running concurrently
         :param delta: The parameter to scale the changers and mixers
         :param new: If true the database will be erased
+        :param fingerprints_path: Directory to store the fingerprints of the structures, the fingerprints
+                                  are shared between populations and processes using the same directory
         :return: A new StructurePopulation object
         """
         self.composition = Composition(composition)
@@ -42,6 +45,7 @@ class StructurePopulation():
         self._members = []
         self._actives = []
         self._evaluated = []
+        self.fingerprints = FingerprintCache(path=fingerprints_path)
         if USE_MONGO:
             self.db = PyChemiaDB(name)
             if new:
@@ -167,64 +171,81 @@ class StructurePopulation():
         ident = self.new_entry(structure)
         return ident
 
-    def random_population(self, n):
+    def random_population(self, n, nproc=1):
         """
-        Create N new random structures to the population
+        Create N new random structures to the population,
+        all the structures are generated at once (see random_structures)
 
         :param n: (int) The number of new structures
+        :param nproc: (int) Number of processes used to generate the structures
         :return: (list) The identifiers for the new structures
         """
+        if self.composition is None:
+            raise ValueError('First set a composition')
         ret = []
-        for i in range(n):
-            ret.append(self.add_random())
+        for structure in random_structures(self.composition, n, nproc=nproc):
+            ret.append(self.new_entry(structure))
         return ret
 
     def value(self, imember):
         entry = self.get_member_dict(imember)
         return entry['properties']['energy']
 
-    def check_duplicates(self, value_tol=1E-2, distance_tol=0.3):
+    def check_duplicates(self, value_tol=1E-2, distance_tol=0.3, symprec=None):
+        """
+        Find the evaluated members that are duplicates of other member with a lower value.
+        The members are indexed by their composition and number of atoms (see composition_key)
+        and sorted by value, only the members with the same key and values closer than
+        'value_tol' are compared using the distance between their fingerprints.
+        A key built from lengths would separate relaxed members that differ only
+        by small displacements
+
+        :param value_tol: (float) Maximal difference of values between duplicates
+        :param distance_tol: (float) Maximal distance between the fingerprints of duplicates
+        :param symprec: (float) Tolerance to include the space group in the key, None to ignore it
+        :return: (list) The identifiers of the duplicates with the highest values
+        """
         ret = []
-        ids = self.actives
-        values = np.array([self.value(i) for i in self.actives if i in self.evaluated])
-        print 'Values= ', sorted(values)
+        evaluated = self.evaluated
+        ids = [i for i in self.actives if i in evaluated]
+        values = dict((i, self.value(i)) for i in ids)
+        print 'Values= ', sorted(values.values())
         if len(values) == 0:
             return ret
-        # else:
-        #    print 'Values', values
-        argsort = np.argsort(values)
-        diffs = np.ediff1d(values[argsort])
-        #print 'Values     ', values[argsort]
-        #print 'Differences', diffs
-        for i in range(len(values) - 1):
-            idiff = diffs[i]
-            if idiff < value_tol:
-                ident1 = ids[argsort[i]]
-                ident2 = ids[argsort[i + 1]]
-                print 'Testing distances between ', ident1, ' and ', ident2
-                distance = self.distance(ident1, ident2)
-                print 'Distance = ', distance
-                if distance < distance_tol:
-                    print "Very small distance ", distance
-                    fx1 = self.value(ident1)
-                    fx2 = self.value(ident2)
-                    if fx2 < fx1:
-                        ret.append(ident1)
-                    else:
-                        ret.append(ident2)
+
+        def is_duplicate(ident1, ident2):
+            if abs(values[ident1] - values[ident2]) >= value_tol:
+                return False
+            distance = self.distance(ident1, ident2)
+            print 'Distance between ', ident1, ' and ', ident2, ' = ', distance
+            return distance < distance_tol
+
+        # The members with lower values are added first and kept on the index
+        index = DuplicateIndex(confirm=is_duplicate, key=lambda x: composition_key(x, symprec=symprec),
+                               window=value_tol)
+        for ident in sorted(ids, key=lambda x: values[x]):
+            if index.add(ident, self.get_structure(ident), scalar=values[ident]) is not None:
+                ret.append(ident)
         if len(ret) > 0:
             print 'Duplicates', ret
         else:
             print 'No duplicates'
         return ret
 
+    def get_fingerprint(self, imember):
+        """
+        Return the Oganov fingerprint of a member, the fingerprints
+        are computed once and kept in the cache 'fingerprints'
+
+        :param imember: A database identifier
+        :return: (tuple) The array of bins and a dictionary with the fingerprint
+                 for each pair of species
+        """
+        return self.fingerprints.get(self.get_structure(imember), rcut=10)
+
     def distance(self, imember, jmember):
-        struct1 = Structure.from_dict(self.get_member_dict(imember)['structure'])
-        struct2 = Structure.from_dict(self.get_member_dict(jmember)['structure'])
-        analysis1 = StructureAnalysis(struct1)
-        analysis2 = StructureAnalysis(struct2)
-        x1, y1_dict = analysis1.fp_oganov(rcut=10)
-        x2, y2_dict = analysis2.fp_oganov(rcut=10)
+        x1, y1_dict = self.get_fingerprint(imember)
+        x2, y2_dict = self.get_fingerprint(jmember)
         # print len(x1)
         assert (len(x1) == len(x2))
         #print np.dot(unit_vector(x1), unit_vector(x2))
@@ -236,6 +257,39 @@ class StructurePopulation():
             dij.append(0.5 * (1.0 - np.dot(uvect1, uvect2)))
         return np.mean(dij)
 
+    def distance_matrix(self, members=None, chunk=None, nproc=1):
+        """
+        Computes the matrix of distances between members, the same values
+        returned by 'distance' for each pair. The fingerprints of all the
+        members are normalized and stacked in one matrix so all the
+        scalar products are computed with a single matrix product
+
+        :param members: (list) Identifiers of the members, by default the actives
+        :param chunk: (int) If given, the rows of the matrix are computed in blocks of this size
+                      to bound the memory used by temporal arrays
+        :param nproc: (int) Number of processes used to compute the fingerprints not in the cache
+
+        :return: (numpy.ndarray) Symmetric matrix of distances, ordered as 'members'
+        """
+        if members is None:
+            members = self.actives
+        nmembers = len(members)
+        if nmembers == 0:
+            return np.zeros((0, 0))
+
+        structures = [self.get_structure(imember) for imember in members]
+        fingerprints = self.fingerprints.get_many(structures, rcut=10, nproc=nproc)
+        spec_pairs = sorted(fingerprints[0][1].keys())
+        matrix = np.array([np.concatenate([unit_vector(fp[spec_pair]) for spec_pair in spec_pairs])
+                           for x, fp in fingerprints])
+
+        if chunk is None:
+            chunk = nmembers
+        ret = np.zeros((nmembers, nmembers))
+        for start in range(0, nmembers, chunk):
+            ret[start:start + chunk] = 0.5 * (1.0 - np.dot(matrix[start:start + chunk], matrix.T) / len(spec_pairs))
+        return ret
+
     def add_from_db(self, dbname, sizemax=1):
 
         comp = Composition(self.composition)
@@ -61,13 +61,16 @@ class FireFly(Genealogy, Searcher):
         for imember in selection:
             new_selection[imember] = None
 
+        # All the distances between members of the selection at once
+        distances = self.population.distance_matrix(selection)
+
         # Move all the fireflies (Except the most brightness)
         for i in range(len(selection)):
             imember = selection[i]
             print imember, self.population.member_str(imember)
             for j in range(len(selection)):
                 jmember = selection[j]
-                distance = self.population.distance(imember, jmember)
+                distance = distances[i, j]
                 if abs(intensity[imember]) < 1E-7:
                     intensity[imember] += 1E-7
                 if abs(intensity[jmember]) < 1E-7:
@@ -61,10 +61,12 @@ def generic_serializer(value):
     if value is None:
         return None
     elif isinstance(value, np.ndarray):
-        if len(value.shape) == 1:
-            return list(value)
-        elif len(value.shape) == 2:
-            return [list(i) for i in value]
+        # Nested lists of python int and float, numpy scalars are not serializable
+        return value.tolist()
+    elif isinstance(value, np.integer):
+        return int(value)
+    elif isinstance(value, np.floating):
+        return float(value)
     elif isinstance(value, basestring):
         return value
     elif isinstance(value, float):
@@ -39,21 +39,8 @@ class Symmetry(object):
             self._transposed_cell, dtype='double', order='C')
         self._reduced = np.array(structure.reduced, dtype='double', order='C')
 
-        numbers = list(structure.symbols)
-        index = 0
-        for i in range(structure.natom):
-            index += 1
-            if numbers[i].isalpha():
-                for j in range(i, structure.natom):
-                    if numbers[j] == structure.symbols[i]:
-                        numbers[j] = str(index)
-            else:
-                index -= 1
-
-        for i in range(structure.natom):
-            numbers[i] = int(numbers[i])
-
-        self._numbers = np.array(numbers, dtype='intc')
+        # Spglib identifies the species by integers, the atomic numbers are used
+        self._numbers = np.array(structure.numbers, dtype='intc')
         self._spacegroup_data = spg.spacegroup(
             self._transposed_cell.copy(), self._reduced.copy(),
             self._numbers, self._tolerance, self._angle_tolerance)
@@ -53,3 +53,37 @@ def test_valence():
     """
     assert (valence(1) == 1)
     assert (valence([1, 2]) == [1, 0])
+
+
+def test_property_arrays():
+    """
+    Testing vectorized properties       :
+    """
+    import numpy as np
+    numbers = atomic_number_array(['H', 'He', 'H'])
+    assert (list(numbers) == [1, 2, 1])
+    assert (list(covalent_radius_array(numbers)) == covalent_radius([1, 2, 1]))
+    assert (list(mass_array(numbers)) == mass([1, 2, 1]))
+    out = np.zeros(3)
+    ret = valence_array(numbers, out=out)
+    assert (ret is out)
+    assert (list(out) == valence([1, 2, 1]))
+
+
+def test_wrapping():
+    """
+    Testing wrapping of coordinates     :
+    """
+    import numpy as np
+    from pychemia.utils.mathematics import wrap2_pmhalf, wrap2_unit, snap
+    values = np.array([[-0.75, -0.5, -0.25], [0.0, 0.25, 0.5], [0.75, 1.0 - 1e-13, 2.3]])
+    expected = np.array([[0.25, 0.5, -0.25], [0.0, 0.25, 0.5], [-0.25, 0.0, 0.3]])
+    assert np.allclose(wrap2_pmhalf(values), expected)
+    ret = wrap2_pmhalf(values, out=values)
+    assert (ret is values)
+    assert np.allclose(values, expected)
+    assert (wrap2_pmhalf(-0.5) == 0.5)
+    reduced = wrap2_unit(np.array([-0.75, -1e-20, 1.0, 3.25]))
+    assert np.allclose(reduced, [0.25, 0.0, 0.0, 0.25])
+    assert np.all(reduced < 1.0)
+    assert (list(snap([0.1, 0.5 + 1e-13], [0.5])) == [0.1, 0.5])
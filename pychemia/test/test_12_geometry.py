@@ -0,0 +1,551 @@
+import numpy as np
+
+from pychemia.core import Lattice
+
+
+def test_all_distances():
+    """
+    Test all distances in one pass       :
+    """
+    lattice = Lattice([[3.5, 0.3, 0.0], [0.0, 3.9, 0.2], [0.5, 0.0, 3.2]])
+    reduced = np.array([[0.0, 0.0, 0.0], [0.5, 0.5, 0.0], [0.25, 0.3, 0.7]])
+    pairs_i, pairs_j, images, distances = lattice.all_distances(reduced, radius=8)
+    for i in range(len(reduced)):
+        for j in range(i, len(reduced)):
+            ret = lattice.distance2(reduced[i], reduced[j], radius=8)
+            mask = np.logical_and(pairs_i == i, pairs_j == j)
+            assert len(ret) == np.sum(mask)
+            assert np.allclose(sorted([ret[k]['distance'] for k in ret]), sorted(distances[mask]))
+    vectors = reduced[pairs_j] + images - reduced[pairs_i]
+    assert np.allclose(np.sqrt(np.sum(np.dot(vectors, lattice.cell) ** 2, axis=1)), distances)
+
+
+def test_get_neighbors():
+    """
+    Test neighbors from cell lists       :
+    """
+    from pychemia.core.neighbors import get_neighbors
+
+    np.random.seed(1)
+    lattice = Lattice([[4.0, 0.0, 0.0], [1.5, 3.8, 0.0], [0.7, 0.9, 4.2]])
+    reduced = np.random.rand(12, 3)
+    ret1 = lattice.all_distances(reduced, radius=4.1)
+    ret2 = get_neighbors(lattice.cell, reduced, 4.1)
+    assert len(ret1[3]) == len(ret2[3])
+    key1 = sorted(zip(ret1[0], ret1[1], [tuple(x) for x in ret1[2]]))
+    key2 = sorted(zip(ret2[0], ret2[1], [tuple(x) for x in ret2[2]]))
+    assert key1 == key2
+    assert np.allclose(sorted(ret1[3]), sorted(ret2[3]))
+
+
+def test_neighbor_list():
+    """
+    Test NeighborList CSR layout         :
+    """
+    from pychemia.core import NeighborList
+
+    np.random.seed(2)
+    cell = [[4.0, 0.0, 0.0], [0.0, 4.5, 0.0], [0.5, 0.0, 5.0]]
+    reduced = np.random.rand(6, 3)
+    nl = NeighborList.build(cell, reduced, 5.0)
+    assert nl.offsets[-1] == len(nl.indices)
+    for i in range(6):
+        indices = nl.get_indices(i)
+        assert np.all(np.any(nl.pairs[indices] == i, axis=1))
+        assert np.all(nl.pairs[indices].sum(axis=1) - i == nl.get_neighbors(i))
+        assert len(indices) == np.sum(nl.pairs[:, 0] == i) + np.sum(np.logical_and(nl.pairs[:, 1] == i,
+                                                                                    nl.pairs[:, 0] != i))
+    small = nl.restrict(3.0)
+    assert np.all(small.distances < 3.0)
+    assert len(small) == np.sum(nl.distances < 3.0)
+
+
+def test_lattice_cache():
+    """
+    Test cached lattice quantities       :
+    """
+    lattice = Lattice([[3.5, 0.3, 0.0], [0.0, 3.9, 0.2], [0.5, 0.0, 3.2]])
+    assert lattice.reciprocal() is lattice.reciprocal()
+    assert lattice.get_limits_for_distance2() is lattice.get_limits_for_distance2()
+    lattice.set_cell(2 * np.eye(3))
+    assert np.allclose(lattice.metric, 4 * np.eye(3))
+    assert np.allclose(lattice.reciprocal().cell, 0.5 * np.eye(3))
+    assert np.allclose(lattice.lengths, [2, 2, 2])
+    assert np.allclose(lattice.angles, [90, 90, 90])
+
+
+def test_spatial_index():
+    """
+    Test neighbor queries on Structure   :
+    """
+    from pychemia.core import Structure
+    from pychemia.core.neighbors import get_minimal_distances
+
+    np.random.seed(3)
+    cell = [[6.0, 0.5, 0.2], [0.3, 7.0, 0.0], [1.0, 0.4, 5.5]]
+    structure = Structure(symbols=8 * ['H'], reduced=np.random.rand(8, 3), cell=cell)
+    matrix = get_minimal_distances(structure.cell, structure.reduced, 10.0)
+    for i in range(8):
+        atoms, images, distances = structure.get_neighbors(i, 6.0)
+        vectors = np.dot(structure.reduced[atoms] + images - structure.reduced[i], structure.cell)
+        assert np.allclose(np.sqrt(np.sum(vectors ** 2, axis=1)), distances)
+        assert np.all(np.diff(distances) >= 0)
+        atoms, images, nearest = structure.get_nearest_neighbors(i, 4)
+        assert np.allclose(nearest, distances[:4])
+        for j in range(8):
+            assert abs(structure.get_distance(i, j) - matrix[i, j]) < 1E-10
+    index = structure.get_spatial_index()
+    assert structure.get_spatial_index() is index
+    structure.set_cell(2 * structure.cell)
+    assert structure.get_spatial_index() is not index
+
+
+def test_species_arrays():
+    """
+    Test numbers and species_index       :
+    """
+    from pychemia.core import Structure
+
+    structure = Structure(symbols=['O', 'Si', 'O'], positions=[[0, 0, 0], [1, 1, 1], [2, 2, 2]], cell=5)
+    assert list(structure.numbers) == [8, 14, 8]
+    assert [structure.species[i] for i in structure.species_index] == structure.symbols
+    structure.symbols[1] = 'C'
+    assert list(structure.numbers) == [8, 6, 8]
+    assert [structure.species[i] for i in structure.species_index] == structure.symbols
+
+    # Symbols that are not elements
+    dummy = Structure(symbols=['X', 'O', '1', 'X'], positions=np.random.rand(4, 3), cell=5)
+    assert list(dummy.numbers) == [120, 8, 119, 120]
+    try:
+        dummy.species_index
+        assert False
+    except ValueError as exc:
+        assert '1' in str(exc)
+    dummy = Structure(symbols=['X', 'Fe'], positions=[[0, 0, 0], [1, 1, 1]], cell=5)
+    for method in [lambda: dummy.density, dummy.center_mass]:
+        try:
+            method()
+            assert False
+        except ValueError as exc:
+            assert 'X' in str(exc)
+
+
+def test_random_structures():
+    """
+    Test random structures generator     :
+    """
+    from pychemia.core import random_structures
+    from pychemia.utils.periodic import covalent_radius
+
+    structures = random_structures({'Si': 2, 'O': 4}, 4, maxtrial=20, seed=0)
+    assert len(structures) == 4
+    for structure in structures:
+        assert structure.natom == 6
+        for i in range(structure.natom):
+            for j in range(i + 1, structure.natom):
+                covalent_dim = covalent_radius(structure.symbols[i]) + covalent_radius(structure.symbols[j])
+                distance = structure.lattice.minimal_distance(structure.reduced[i], structure.reduced[j])
+                assert distance > covalent_dim - 1E-6
+    other = random_structures({'Si': 2, 'O': 4}, 4, maxtrial=20, seed=0)
+    assert np.allclose([x.cell for x in structures], [x.cell for x in other])
+
+
+def test_supercell_view():
+    """
+    Test supercell and SupercellView     :
+    """
+    from pychemia.core import Structure, NeighborList, SupercellView
+
+    np.random.seed(7)
+    structure = Structure(symbols=['Si', 'O', 'O'], reduced=np.random.rand(3, 3),
+                          cell=[[4.0, 0.3, 0.0], [0.5, 3.7, 0.1], [0.2, 0.4, 4.2]])
+    supercell = structure.supercell((2, 1, 3))
+    view = SupercellView(structure, (2, 1, 3))
+    assert view.natom == supercell.natom == 18
+    assert view.symbols == supercell.symbols
+    assert np.allclose(view.cell, supercell.cell)
+    assert np.allclose(view.positions, supercell.positions)
+    assert np.allclose(view.reduced, supercell.reduced)
+    for i in range(view.natom):
+        assert np.allclose(view.get_position(i), supercell.positions[i])
+    copy = view.copy()
+    assert isinstance(copy, Structure) and np.allclose(copy.positions, supercell.positions)
+
+    def sorted_rows(nl):
+        rows = np.column_stack((nl.pairs, nl.images, np.round(nl.distances, 8)))
+        return rows[np.lexsort(rows.T[::-1])]
+
+    expected = NeighborList.build(supercell.cell, supercell.reduced, 6.0)
+    assert np.allclose(sorted_rows(view.get_neighbor_list(6.0)), sorted_rows(expected))
+
+
+def test_memoized_properties():
+    """
+    Test memoized properties of Structure:
+    """
+    from pychemia.core import Structure
+
+    structure = Structure(symbols=['Si', 'O', 'O'], positions=[[0, 0, 0], [1, 1, 1], [2, 2, 2]], cell=5)
+    volume = structure.volume
+    density = structure.density
+    assert structure.volume == volume
+    assert structure.formula == 'O2Si'
+    structure.set_cell(6)
+    assert abs(structure.volume - 216) < 1E-10
+    assert structure.density < density
+    structure.symbols[0] = 'C'
+    assert structure.formula == 'CO2'
+    assert structure.composition == {'C': 1, 'O': 2}
+    structure.set_periodicity(False)
+    assert not structure.is_crystal
+
+
+def test_from_arrays():
+    """
+    Test Structure.from_arrays           :
+    """
+    from pychemia.core import Structure
+
+    cell = [[4.0, 0.3, 0.0], [0.5, 3.7, 0.1], [0.2, 0.4, 4.2]]
+    reduced = np.array([[0.0, 0.0, 0.0], [0.5, 0.5, 0.5], [0.25, 0.75, 0.1]])
+    structure = Structure.from_arrays(['Si', 'O', 'O'], reduced=reduced, cell=cell, comment='test')
+    assert structure.natom == 3
+    assert structure.comment == 'test'
+    assert np.allclose(structure.positions, np.dot(reduced, cell))
+    other = Structure.from_arrays(structure.symbols, positions=structure.positions, cell=cell)
+    assert np.allclose(other.reduced, reduced)
+    assert other.symbols == structure.symbols and other.symbols is not structure.symbols
+    molecule = Structure.from_arrays(['N', 'N'], positions=[[0, 0, 0], [0, 0, 1.1]], periodicity=False)
+    assert not molecule.is_periodic and molecule.natom == 2
+
+
+def test_canonical_hash():
+    """
+    Test canonical hash and DuplicateIndex:
+    """
+    from pychemia.core import Structure
+    from pychemia.analysis import canonical_hash, DuplicateIndex
+
+    cell = [[0.0, 2.7, 2.7], [2.7, 0.0, 2.7], [2.7, 2.7, 0.0]]
+    reduced = np.array([[0.0, 0.0, 0.0], [0.25, 0.25, 0.25], [0.5, 0.1, 0.3], [0.2, 0.6, 0.7]])
+    structure = Structure(symbols=['Si', 'Si', 'O', 'O'], reduced=reduced, cell=cell)
+    order = [2, 0, 3, 1]
+    shifted = Structure(symbols=[structure.symbols[i] for i in order], reduced=(reduced[order] + 0.37) % 1, cell=cell)
+    other_cell = Structure(symbols=structure.symbols, positions=structure.positions,
+                           cell=np.dot([[1, 1, 0], [0, 1, 0], [0, 0, 1]], cell))
+    different = Structure(symbols=['Si', 'O', 'Si', 'O'], reduced=reduced, cell=cell)
+    assert canonical_hash(structure) == canonical_hash(shifted) == canonical_hash(other_cell)
+    assert canonical_hash(structure) != canonical_hash(different)
+
+    index = DuplicateIndex()
+    assert index.add('a', structure) is None
+    assert index.add('b', different) is None
+    assert index.add('c', shifted) == 'a'
+    assert len(index) == 2
+    index.remove('a')
+    assert index.add('c', shifted) is None
+
+
+def test_near_duplicates():
+    """
+    Test DuplicateIndex with near duplicates:
+    """
+    from pychemia.core import Structure
+    from pychemia.analysis import StructureMatcher, canonical_hash, composition_key, DuplicateIndex
+
+    rnd = np.random.RandomState(7)
+    cell = 6.0 * np.eye(3) + 0.3 * rnd.rand(3, 3)
+    reduced = rnd.rand(20, 3)
+    symbols = 10 * ['Mg'] + 10 * ['O']
+    structures = {}
+    for ident in ['a', 'b']:
+        noise = 0.01 * (rnd.rand(20, 3) - 0.5)
+        structures[ident] = Structure(symbols=symbols, positions=np.dot(reduced, cell) + noise, cell=cell)
+    # Small displacements cross the quantization boundaries of the canonical hash
+    assert canonical_hash(structures['a']) != canonical_hash(structures['b'])
+
+    matcher = StructureMatcher()
+    index = DuplicateIndex(confirm=lambda x, y: matcher.match(structures[x], structures[y]), key=composition_key)
+    assert index.add('a', structures['a']) is None
+    assert index.add('b', structures['b']) == 'a'
+
+    # Only the candidates with the same key and a scalar inside the window are confirmed
+    confirmed = []
+
+    def confirm(ident1, ident2):
+        confirmed.append((ident1, ident2))
+        return False
+
+    silica = Structure(symbols=['Si', 'O', 'O'], positions=np.dot(reduced[:3], cell), cell=cell)
+    index = DuplicateIndex(confirm=confirm, key=composition_key, window=0.01)
+    for ident, structure, scalar in [('a', structures['a'], -1.0), ('c', silica, -1.0), ('d', structures['b'], -0.5),
+                                     ('e', structures['b'], -1.005), ('f', structures['b'], -0.995)]:
+        assert index.add(ident, structure, scalar=scalar) is None
+    assert confirmed == [('a', 'e'), ('e', 'f'), ('a', 'f')]
+    assert index.get_candidates(structures['a'], scalar=-0.5) == ['d']
+    index.remove('a')
+    assert index.get_candidates(structures['a'], scalar=-1.0) == ['e', 'f']
+
+
+def test_structure_matcher():
+    """
+    Test StructureMatcher                :
+    """
+    from pychemia.core import Structure
+    from pychemia.analysis import StructureMatcher
+
+    cell = np.array([[0.0, 2.7, 2.7], [2.7, 0.0, 2.7], [2.7, 2.7, 0.0]])
+    reduced = np.array([[0.0, 0.0, 0.0], [0.25, 0.25, 0.25], [0.5, 0.1, 0.3], [0.2, 0.6, 0.7]])
+    structure = Structure(symbols=['Si', 'Si', 'O', 'O'], reduced=reduced, cell=cell)
+    order = [2, 0, 3, 1]
+    rotation = np.array([[0.0, -1.0, 0.0], [1.0, 0.0, 0.0], [0.0, 0.0, 1.0]])
+    rotated = Structure(symbols=[structure.symbols[i] for i in order], reduced=(reduced[order] + 0.37) % 1,
+                        cell=np.dot(cell, rotation.T))
+    other_cell = Structure(symbols=structure.symbols, positions=structure.positions,
+                           cell=np.dot([[1, 1, 0], [0, 1, 0], [0, 0, 1]], cell))
+    expanded = Structure(symbols=structure.symbols, reduced=reduced, cell=1.2 * cell)
+    different = Structure(symbols=['Si', 'O', 'Si', 'O'], reduced=reduced, cell=cell)
+    silicon = Structure(symbols=['Si', 'Si'], reduced=reduced[:2], cell=cell)
+
+    matcher = StructureMatcher()
+    assert matcher.match(structure, rotated)
+    assert matcher.match(structure, other_cell)
+    assert not matcher.match(structure, expanded)
+    assert not matcher.match(structure, different)
+    assert not matcher.match(structure, silicon)
+    assert matcher.counters['match'] == 2
+    assert matcher.counters['composition'] == 1
+    assert matcher.counters['volume'] == 1
+
+
+def test_reduced_cell():
+    """
+    Test Delaunay and Niggli reductions  :
+    """
+    from pychemia.core import Structure
+
+    cell = np.dot([[1, 2, 0], [0, 1, 3], [0, 1, 2]], [[3.5, 0.3, 0.0], [0.0, 3.9, 0.2], [0.5, 0.0, 3.2]])
+    lattice = Lattice(cell)
+    for method in ['delaunay', 'niggli']:
+        basis, matrix, inverse = lattice.get_reduced_cell(method)
+        assert lattice.get_reduced_cell(method)[0] is basis
+        assert np.allclose(np.dot(matrix, cell), basis)
+        assert np.all(np.dot(matrix, inverse) == np.eye(3))
+        assert np.allclose(sorted(np.sum(basis ** 2, axis=1)), [10.49, 12.34, 15.25])
+    niggli = lattice.get_reduced_cell('niggli')[0]
+    assert np.linalg.det(niggli) * np.linalg.det(cell) > 0
+    assert np.all(np.diff(np.sum(niggli ** 2, axis=1)) >= 0)
+
+    np.random.seed(3)
+    reduced = np.random.rand(5, 3)
+    structure = Structure(symbols=5 * ['H'], reduced=reduced, cell=cell)
+    distances = lattice.minimal_distances(reduced, reduced)
+    for i in range(5):
+        for j in range(5):
+            if i != j:
+                assert abs(distances[i, j] - structure.get_distance(i, j)) < 1E-8
+
+
+def test_bonds_coordination():
+    """
+    Test cutoff radius to connect atoms  :
+    """
+    import scipy.sparse
+    import scipy.sparse.csgraph
+    from pychemia.core import Structure
+    from pychemia.analysis import StructureAnalysis
+    from pychemia.utils.periodic import covalent_radius
+
+    def ncomponents(nl, bonds):
+        pairs = nl.pairs[np.concatenate(bonds)]
+        graph = scipy.sparse.coo_matrix((np.ones(len(pairs)), (pairs[:, 0], pairs[:, 1])),
+                                        shape=(nl.natom, nl.natom))
+        return scipy.sparse.csgraph.connected_components(graph, directed=False, return_labels=False)
+
+    # Simple cubic: the atoms are connected at the lattice parameter
+    ratio = 3.0 / (2 * covalent_radius('Si'))
+    analysis = StructureAnalysis(Structure(symbols=['Si'], reduced=[[0, 0, 0]], cell=3.0), supercell=(2, 2, 2))
+    bonds, coordination, nl, tolerances, cutoff = analysis.get_bonds_coordination(jump=0)
+    assert abs(cutoff - ratio) < 1E-10
+    assert coordination == 8 * [6]
+    cutoff = analysis.get_bonds_coordination()[4]
+    assert abs(cutoff - 1.36) < 1E-10
+
+    # Minimal cutoff on a random structure
+    np.random.seed(5)
+    structure = Structure(symbols=['Si', 'O', 'O', 'Si', 'O', 'O'], reduced=np.random.rand(6, 3),
+                          cell=[[4.5, 0.3, 0.0], [0.5, 4.7, 0.1], [0.2, 0.4, 4.9]])
+    analysis = StructureAnalysis(structure, supercell=(2, 2, 2))
+    bonds, coordination, nl, tolerances, cutoff = analysis.get_bonds_coordination(jump=0)
+    assert ncomponents(nl, bonds) == 1 and min(coordination) > 0
+    covalent = np.array(covalent_radius(analysis.structure.symbols))
+    proportions = nl.distances / (covalent[nl.pairs[:, 0]] + covalent[nl.pairs[:, 1]])
+    below = np.max(proportions[proportions < cutoff])
+    bonds, coordination, nl = analysis.get_bonds_coordination(initial_cutoff_radius=below, use_laplacian=False)[:3]
+    assert ncomponents(nl, bonds) > 1 or min(coordination) == 0
+    # The grid of cutoffs is initial_cutoff_radius + n * jump
+    grid = analysis.get_bonds_coordination()[4]
+    assert cutoff <= grid < cutoff + 0.01 + 1E-10
+    assert abs(round((grid - 0.8) / 0.01) * 0.01 + 0.8 - grid) < 1E-10
+
+    # A dimer: use_jump=False stops when the first two atoms are bonded
+    dimer = Structure(symbols=['Si', 'Si'], positions=[[0, 0, 0], [2.3, 0, 0]], cell=6.0)
+    analysis = StructureAnalysis(dimer, supercell=(2, 2, 2))
+    assert abs(analysis.get_bonds_coordination(jump=0)[4] - 6.0 / 2.22) < 1E-10
+    assert abs(analysis.get_bonds_coordination(jump=0, use_jump=False)[4] - 2.3 / 2.22) < 1E-10
+
+    # ensure_conectivity raises the cutoff until each atom has one bond
+    bonds, coordination, nl, tolerances, cutoff = analysis.get_bonds_coordination(use_laplacian=False)
+    assert cutoff == 0.8 and coordination == 16 * [0]
+    bonds, coordination, nl, tolerances, cutoff = analysis.get_bonds_coordination(use_laplacian=False,
+                                                                                  ensure_conectivity=True)
+    assert abs(cutoff - 2.3 / 2.22) < 1E-10 and coordination == 16 * [1]
+    assert np.allclose(tolerances, 2.3 / 2.22)
+
+
+def test_hardness(capsys):
+    """
+    Test hardness kernel and batch       :
+    """
+    import math
+    from pychemia.core import Structure
+    from pychemia.analysis import StructureAnalysis, hardness_batch
+    from pychemia.utils.periodic import valence, covalent_radius
+
+    np.random.seed(11)
+    structures = [Structure(symbols=['Si', 'O', 'O', 'Si', 'O', 'O'], reduced=np.random.rand(6, 3),
+                            cell=[[4.5, 0.3, 0.0], [0.5, 4.7, 0.1], [0.2, 0.4, 4.9]]) for i in range(3)]
+
+    # The product over bonds of the original formula
+    for structure in structures:
+        analysis = StructureAnalysis(structure, supercell=(2, 2, 2))
+        bonds, coordination, nl, tolerances, cutoff = analysis.get_bonds_coordination()
+        symbols = analysis.structure.symbols
+        f_d = 0.0
+        f_n = 1.0
+        for specie in structure.species:
+            f_d += valence(specie) / covalent_radius(specie)
+            f_n *= valence(specie) / covalent_radius(specie)
+        f = 1.0 - (len(structure.species) * f_n ** (1.0 / len(structure.species)) / f_d) ** 2
+        x = 1.0
+        diff_bonds = np.unique(np.concatenate(bonds))
+        for i in diff_bonds:
+            i1, i2 = nl.pairs[i]
+            ei = valence(symbols[i1]) / covalent_radius(symbols[i1])
+            ej = valence(symbols[i2]) / covalent_radius(symbols[i2])
+            x *= math.sqrt(ei * ej) / (coordination[i1] * coordination[i2]) / nl.distances[i]
+        expected = 1300.0 / analysis.structure.volume * len(diff_bonds) * x ** (1.0 / len(diff_bonds)) * \
+            math.exp(-3.0 * f)
+        assert analysis.hardness()[0] == round(expected, 3)
+
+    # The results and the output do not depend on the number of processes
+    capsys.readouterr()
+    serial = hardness_batch(structures, nproc=1, supercell=(2, 2, 2), verbose=True)
+    serial_output = capsys.readouterr()[0]
+    assert serial_output.count('Structure coordination') == 3
+    parallel = hardness_batch(structures, nproc=2, supercell=(2, 2, 2), verbose=True)
+    assert serial == parallel
+    assert capsys.readouterr()[0] == serial_output
+
+
+def test_structure_distances():
+    """
+    Test radial distribution             :
+    """
+    import math
+    from pychemia.core import Structure
+    from pychemia.analysis import StructureAnalysis
+    from pychemia.utils.mathematics import integral_gaussian
+
+    np.random.seed(13)
+    structure = Structure(symbols=['Si', 'O', 'O'], reduced=np.random.rand(3, 3),
+                          cell=[[4.0, 0.3, 0.0], [0.5, 3.7, 0.1], [0.2, 0.4, 4.2]])
+    analysis = StructureAnalysis(structure)
+    delta = 0.05
+    sigma = 0.04
+    dist_spec = analysis.distances_between_species(radius=6)
+    for integrated in [True, False]:
+        x, rdf = analysis.structure_distances(delta=delta, sigma=sigma, radius=6, integrated=integrated)
+        # Reference with the gaussian of each distance evaluated on every bin
+        for spec_pair in dist_spec:
+            reference = np.zeros(len(x))
+            for rij in dist_spec[spec_pair]:
+                if rij > 0:
+                    for i in range(len(x)):
+                        if integrated:
+                            value = integral_gaussian(x[i], x[i] + delta, rij, sigma)
+                        else:
+                            value = math.exp(-((x[i] - rij) ** 2) / (2 * sigma * sigma))
+                        reference[i] += value / (4 * math.pi * rij * rij)
+            # Only the tails beyond 6 sigma are neglected
+            assert np.allclose(rdf[spec_pair], reference, rtol=0, atol=1E-8 * np.max(reference))
+        rdf32 = analysis.structure_distances(delta=delta, sigma=sigma, radius=6, integrated=integrated,
+                                             dtype=np.float32)[1]
+        for spec_pair in rdf:
+            assert rdf32[spec_pair].dtype == np.float32
+            assert np.allclose(rdf32[spec_pair], rdf[spec_pair], rtol=1E-6, atol=0)
+
+    x64, fp64 = analysis.fp_oganov(delta=delta, sigma=sigma, rcut=6)
+    x32, fp32 = analysis.fp_oganov(delta=delta, sigma=sigma, rcut=6, dtype=np.float32)
+    for spec_pair in fp64:
+        assert fp32[spec_pair].dtype == np.float32
+        assert np.allclose(fp32[spec_pair], fp64[spec_pair], rtol=1E-6, atol=1E-5 * np.max(np.abs(fp64[spec_pair])))
+
+
+def test_fingerprint_cache():
+    """
+    Test FingerprintCache                :
+    """
+    import shutil
+    import tempfile
+    from pychemia.core import Structure
+    from pychemia.analysis import FingerprintCache
+    from pychemia.analysis._fingerprint import geometry_hash
+
+    np.random.seed(17)
+    cell = [[4.0, 0.3, 0.0], [0.5, 3.7, 0.1], [0.2, 0.4, 4.2]]
+    reduced = np.random.rand(3, 3)
+    structure = Structure(symbols=['Si', 'O', 'O'], reduced=reduced, cell=cell)
+    # The hash does not change with the order of atoms or integer translations
+    order = [2, 0, 1]
+    relabeled = Structure(symbols=[structure.symbols[i] for i in order], reduced=reduced[order] + [1, -2, 3],
+                          cell=cell)
+    assert geometry_hash(structure) == geometry_hash(relabeled)
+    moved = Structure(symbols=structure.symbols, reduced=reduced + [0.1, 0, 0], cell=cell)
+    assert geometry_hash(structure) != geometry_hash(moved)
+
+    structures = [Structure(symbols=['Si', 'O', 'O'], reduced=np.random.rand(3, 3), cell=cell) for i in range(3)]
+
+    # The least recently used fingerprint is removed
+    cache = FingerprintCache(maxsize=2)
+    first = cache.get(structures[0], rcut=5)
+    cache.get(structures[1], rcut=5)
+    assert cache.get(structures[0], rcut=5) is first
+    cache.get(structures[2], rcut=5)
+    assert len(cache) == 2
+    assert FingerprintCache.get_key(structures[0], rcut=5) in cache
+    assert FingerprintCache.get_key(structures[1], rcut=5) not in cache
+    assert (cache.hits, cache.misses) == (1, 3)
+
+    # Fingerprints stored on disk are read by a new cache
+    path = tempfile.mkdtemp()
+    cache = FingerprintCache(path=path)
+    x, fp = cache.get(structure, rcut=5)
+    assert sorted(fp) == [('O', 'O'), ('O', 'Si'), ('Si', 'Si')]
+    other = FingerprintCache(path=path)
+    x2, fp2 = other.get(relabeled, rcut=5)
+    assert (other.hits, other.misses) == (1, 0)
+    assert np.all(x == x2)
+    for spec_pair in fp:
+        assert np.all(fp[spec_pair] == fp2[spec_pair])
+
+    # Pool of processes with repeated structures
+    other = FingerprintCache(path=path)
+    values = other.get_many([structures[0], structure, structures[1], structures[0]], rcut=5, nproc=2)
+    assert other.misses == 2
+    assert values[0] is values[3]
+    expected = FingerprintCache.compute(structures[1], rcut=5)
+    for spec_pair in expected[1]:
+        assert np.allclose(values[2][1][spec_pair], expected[1][spec_pair])
+    assert np.all(values[1][1][('O', 'Si')] == fp[('O', 'Si')])
+    shutil.rmtree(path)
@@ -0,0 +1,167 @@
+def test_repository_index():
+    """
+    Test index of StructureRepository   :
+    """
+    import os
+    import shutil
+    import tempfile
+    from pychemia.core import Structure
+    from pychemia.db import StructureRepository, StructureEntry
+
+    path = tempfile.mkdtemp()
+    repo = StructureRepository(path + '/repo')
+    nacl = Structure(symbols=['Na', 'Cl'], reduced=[[0, 0, 0], [0.5, 0.5, 0.5]], cell=4.0)
+    silicon = Structure(symbols=['Si', 'Si'], reduced=[[0, 0, 0], [0.25, 0.25, 0.25]],
+                        cell=[[0, 2.7, 2.7], [2.7, 0, 2.7], [2.7, 2.7, 0]])
+    entry1 = StructureEntry(structure=nacl, tags=['salt'])
+    entry2 = StructureEntry(structure=silicon)
+    repo.add_entry(entry1)
+    repo.add_entry(entry2)
+    assert len(repo) == 2
+    assert repo.get_formulas() == {'ClNa': [entry1.identifier], 'Si': [entry2.identifier]}
+    assert repo.search(species='Na') == [entry1.identifier]
+    assert repo.search(tags=['binary', 'salt']) == [entry1.identifier]
+    assert repo.search(natom=2, density=(None, 1.0)) == [entry1.identifier]
+    assert StructureEntry(repository=repo, identifier=entry2.identifier).structure == silicon
+
+    # The structure, properties and original files are read on demand
+    entry = StructureEntry(repository=repo, identifier=entry1.identifier, header=True)
+    assert sorted(entry.tags) == ['binary', 'salt']
+    assert 'structure' not in entry.__dict__
+    assert 'properties' not in entry.__dict__
+    assert entry.structure == nacl
+    assert entry.properties is None
+    assert entry.original_file == []
+
+    # The index is built again for repositories without it
+    os.remove(path + '/repo/index.db')
+    repo = StructureRepository(path + '/repo')
+    assert sorted(repo.get_all_entries) == sorted([entry1.identifier, entry2.identifier])
+    repo.del_entry(entry1)
+    assert repo.get_formulas() == {'Si': [entry2.identifier]}
+    repo.index.close()
+    shutil.rmtree(path)
+
+
+def test_import_files():
+    """
+    Test bulk import of files           :
+    """
+    import os
+    import shutil
+    import tempfile
+    from pychemia.db import StructureRepository
+    from pychemia.io.xyz import load
+    from pychemia.analysis import canonical_hash
+
+    path = tempfile.mkdtemp()
+    filenames = []
+    for i in range(3):
+        filename = path + '/anthracene_%d.xyz' % i
+        shutil.copy('pychemia/test/data/xyz/anthracene.xyz', filename)
+        filenames.append(filename)
+    wf = open(path + '/wrong.xyz', 'w')
+    wf.write('wrong\n')
+    wf.close()
+    repo = StructureRepository(path + '/repo')
+
+    report = repo.import_files(filenames[:2], tags='organic', reader=load, batch_size=1)
+    assert len(report['imported']) == 2
+    assert len(repo) == 2
+    # Files found on the journal are skipped
+    report = repo.import_files(filenames + [path + '/wrong.xyz'], tags='organic', reader=load, batch_size=1)
+    assert report['skipped'] == 2
+    assert report['imported'].keys() == [os.path.abspath(filenames[2])]
+    assert report['failed'].keys() == [os.path.abspath(path + '/wrong.xyz')]
+    assert sorted(repo.search(tags='organic', formula='C7H5')) == sorted(repo.get_all_entries)
+    assert len(repo) == 3
+    # The hashes computed by the readers are stored on the index
+    assert repo.index.get_hashes() == {canonical_hash(load(filenames[0])): sorted(repo.get_all_entries)}
+
+    # An import interrupted after writing the entries, but before recording them as imported
+    journal = repo.path + '/import_journal.txt'
+    lines = [x for x in open(journal) if not x.startswith('OK')]
+    wf = open(journal, 'w')
+    wf.writelines(lines)
+    wf.close()
+    report = repo.import_files(filenames, tags='organic', reader=load, batch_size=1)
+    assert report['skipped'] == 3
+    assert len(repo) == 3
+    repo.index.close()
+    shutil.rmtree(path)
+
+
+def test_repository_layout():
+    """
+    Test sharded layout and migration   :
+    """
+    import os
+    import shutil
+    import tempfile
+    from pychemia.core import Structure
+    from pychemia.db import StructureRepository, StructureEntry
+
+    path = tempfile.mkdtemp()
+    repo = StructureRepository(path + '/repo', layout='sharded')
+    entry = StructureEntry(structure=Structure(symbols=['Cu'], reduced=[[0, 0, 0]], cell=3.6))
+    repo.add_entry(entry)
+    assert entry.path == repo.entry_path(entry.identifier)
+    assert os.path.dirname(os.path.dirname(os.path.dirname(entry.path))) == repo.path
+    assert repo.scan_entries() == [entry.identifier]
+
+    # The layout is stored on the repository
+    repo = StructureRepository(path + '/repo')
+    assert repo.layout == 'sharded'
+    assert repo.migrate('flat') == 1
+    assert os.path.isdir(path + '/repo/' + entry.identifier)
+    assert sorted(os.listdir(path + '/repo')) == sorted(['db.json', 'index.db', entry.identifier])
+    assert StructureEntry(repository=repo, identifier=entry.identifier).structure.formula == 'Cu'
+    assert repo.migrate('sharded') == 1
+    assert repo.locate(entry.identifier) == repo.entry_path(entry.identifier, 'sharded')
+    repo.index.close()
+    shutil.rmtree(path)
+
+
+def test_structure_formats():
+    """
+    Test binary and JSON structures     :
+    """
+    import os
+    import shutil
+    import tempfile
+    import numpy as np
+    from pychemia.core import Structure
+    from pychemia.db import StructureRepository, StructureEntry
+
+    path = tempfile.mkdtemp()
+    np.random.seed(4)
+    structure = Structure(symbols=['Mg', 'O', 'O'], reduced=np.random.rand(3, 3), cell=[4.0, 4.1, 4.2], name='MgO2')
+    structure.save_npz(path + '/structure.npz')
+    loaded = Structure.load_npz(path + '/structure.npz')
+    assert loaded == structure
+    assert loaded.name == 'MgO2'
+    assert np.all(loaded.cell == structure.cell)
+
+    # New repositories store JSON unless binary files are requested
+    repo = StructureRepository(path + '/binary', structure_format='npz')
+    entry = StructureEntry(structure=structure)
+    repo.add_entry(entry)
+    assert os.path.isfile(entry.path + '/structure.npz')
+    repo.index.close()
+
+    # Entries of a JSON repository are read after changing the format
+    repo = StructureRepository(path + '/repo')
+    entry = StructureEntry(structure=structure)
+    repo.add_entry(entry)
+    assert os.path.isfile(entry.path + '/structure.json')
+    repo.structure_format = 'npz'
+    repo.save()
+    repo = StructureRepository(path + '/repo')
+    assert repo.structure_format == 'npz'
+    entry = StructureEntry(repository=repo, identifier=entry.identifier)
+    assert entry.structure == structure
+    entry.save()
+    assert sorted(os.listdir(entry.path)) == ['metadata.json', 'structure.npz']
+    assert StructureEntry(repository=repo, identifier=entry.identifier).structure == structure
+    repo.index.close()
+    shutil.rmtree(path)
@@ -0,0 +1,39 @@
+import numpy as np
+
+
+def test_structure_distance_matrix():
+    """
+    Test StructurePopulation distances  :
+    """
+    from pychemia.core import Structure
+    from pychemia.population.structure import StructurePopulation
+
+    population = StructurePopulation('test', {'Si': 1, 'O': 2})
+    np.random.seed(19)
+    members = [population.new_entry(Structure(symbols=['Si', 'O', 'O'], reduced=np.random.rand(3, 3),
+                                              cell=[[4.0, 0.3, 0.0], [0.5, 3.7, 0.1], [0.2, 0.4, 4.2]]))
+               for i in range(4)]
+    matrix = population.distance_matrix(members)
+    assert matrix.shape == (4, 4)
+    assert np.allclose(matrix, matrix.T)
+    for i in range(4):
+        for j in range(4):
+            assert abs(matrix[i, j] - population.distance(members[i], members[j])) < 1E-10
+    assert np.allclose(population.distance_matrix(members, chunk=3), matrix)
+
+
+def test_euclidean_distance_matrix():
+    """
+    Test EuclideanPopulation distances  :
+    """
+    from pychemia.population.euclidean import EuclideanPopulation
+
+    np.random.seed(23)
+    population = EuclideanPopulation(lambda x: np.sum(x ** 2), 3, [-1, 1])
+    population.random_population(5)
+    matrix = population.distance_matrix()
+    assert matrix.shape == (5, 5)
+    assert np.allclose(matrix, matrix.T)
+    for i in range(5):
+        for j in range(5):
+            assert abs(matrix[i, j] - population.distance(population.actives[i], population.actives[j])) < 1E-12
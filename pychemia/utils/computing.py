@@ -27,3 +27,33 @@ def unicode2string(value):
     else:
         return value
 
+
+def memoized_property(version='_version'):
+    """
+    Decorator for read-only properties whose value is stored on the object
+    and computed again only when the version of the object changes.
+    The argument is the name of the attribute of the object that changes
+    each time the object is modified
+
+    :param version: (str) Name of the attribute with the version of the object
+
+    :rtype : function
+    """
+
+    def decorator(function):
+        name = function.__name__
+
+        def getter(self):
+            current = getattr(self, version)
+            memo = self.__dict__.setdefault('_memoized', {})
+            if name in memo and memo[name][0] == current:
+                return memo[name][1]
+            value = function(self)
+            memo[name] = (current, value)
+            return value
+
+        getter.__name__ = name
+        getter.__doc__ = function.__doc__
+        return property(getter)
+
+    return decorator
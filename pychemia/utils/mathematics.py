@@ -211,12 +211,15 @@ def distances(m):
     return ret
 
 
-def wrap2_pmhalf(x):
+def wrap2_pmhalf(x, out=None):
     """
     Wraps a number or array in the interval ]-1/2, 1/2]
     values = -1/2 will be wrapped  to 1/2
+    The values close to -1/4, 0, 1/4 and 1/2 are snapped to them
 
-    :param x:
+    :param x: (float, list, numpy.ndarray) Values to wrap
+    :param out: (numpy.ndarray) Array of floats where the result is stored,
+                it could be 'x' itself to wrap the array in place
 
     Example:
 
@@ -230,22 +233,87 @@ def wrap2_pmhalf(x):
     array([[ 0.25,  0.5 , -0.25],
            [ 0.25,  0.5 , -0.25]])
     """
+    tol12 = 1e-12
+    if not _np.iterable(x) and out is None:
+        return float(wrap2_pmhalf(_np.array([x], dtype=float))[0])
+
+    x = _np.asarray(x, dtype=float)
+    if out is None:
+        out = _np.empty(x.shape)
+    negative = x <= 0
+
+    # Values not positive: -(-(x - 1/2 - tol) % 1) + 1/2 + tol
+    other = x - 0.5
+    other -= tol12
+    _np.negative(other, out=other)
+    _np.mod(other, 1.0, out=other)
+    _np.negative(other, out=other)
+    other += 0.5
+    other += tol12
+
+    # Positive values: (x + 1/2 - tol) % 1 - 1/2 + tol
+    _np.add(x, 0.5, out=out)
+    out -= tol12
+    _np.mod(out, 1.0, out=out)
+    out -= 0.5
+    out += tol12
+
+    _np.copyto(out, other, where=negative)
+    return snap(out, [-0.25, 0.0, 0.25, 0.5], tolerance=tol12, out=out)
+
+
+def wrap2_unit(x, out=None):
+    """
+    Wraps a number or array in the interval [0, 1[
+    as usual for reduced coordinates
 
-    def wrap(num):
-        tol12 = 1e-12
-        if num > 0:
-            ret = (num+0.5-tol12) % 1.0 - 0.5 + tol12
-        else:
-            ret = -(-(num - 0.5 - tol12) % 1.0) + 0.5 + tol12
-        for y in [-0.25, 0.0, 0.25, 0.5]:
-            ret = (lambda num2: y if abs(y-num2) < tol12 else num2)(ret)
-        return ret
-
-    if _np.iterable(x):
-        vec = _np.vectorize(wrap)
-        return vec(x)
-    else:
-        return wrap(x)
+    :param x: (float, list, numpy.ndarray) Values to wrap
+    :param out: (numpy.ndarray) Array of floats where the result is stored,
+                it could be 'x' itself to wrap the array in place
+
+    Example:
+
+    >>> wrap2_unit(-0.75)
+    0.25
+    >>> wrap2_unit(1.0)
+    0.0
+    """
+    if not _np.iterable(x) and out is None:
+        return float(wrap2_unit(_np.array([x], dtype=float))[0])
+
+    x = _np.asarray(x, dtype=float)
+    if out is None:
+        out = _np.empty(x.shape)
+    _np.subtract(x, _np.floor(x), out=out)
+    # Values slightly below an integer could round to 1.0
+    out[out >= 1.0] = 0.0
+    return out
+
+
+def snap(x, values, tolerance=1e-12, out=None):
+    """
+    Replaces the entries of an array that are closer than a
+    given tolerance to any of the values by that value
+
+    :param x: (list, numpy.ndarray) Array to modify
+    :param values: (list) Values for the snapping
+    :param tolerance: (float) Maximal difference with a value to be snapped
+    :param out: (numpy.ndarray) Array of floats where the result is stored,
+                it could be 'x' itself to snap the array in place
+
+    Example:
+
+    >>> snap([-0.1, 0.4999999999999, 0.75], [0.0, 0.5])
+    array([-0.1 ,  0.5 ,  0.75])
+    """
+    x = _np.asarray(x, dtype=float)
+    if out is None:
+        out = _np.array(x)
+    elif out is not x:
+        out[...] = x
+    for value in values:
+        out[_np.abs(out - value) < tolerance] = value
+    return out
 
 
 def vector_set_perpendicular(vector3):
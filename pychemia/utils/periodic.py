@@ -201,6 +201,27 @@ masses = [0.0, 1.00794, 4.002602, 6.941, 9.012182,
           253.0, 256.0, 254.0, 257.0, 260.0]
 
 
+# Atomic number for each atomic symbol
+_symbol2number = dict((atomic_symbols[i], i) for i in range(1, len(atomic_symbols)))
+
+
+def _table2array(table, dtype=float):
+    """
+    Read-only numpy array indexed by atomic number, missing values are set to NaN
+    """
+    table = [_np.nan if x is None else x for x in table]
+    table += (len(atomic_symbols) - len(table)) * [_np.nan]
+    ret = _np.array(table, dtype=dtype)
+    ret.flags.writeable = False
+    return ret
+
+# Properties as numpy arrays indexed by atomic number, used by the vectorized functions
+_masses = _table2array(masses)
+_covalent_radii = _table2array(covalent_radii)
+_valences = _table2array(valences)
+_electronegativities = _table2array(electronegativities)
+
+
 def _get_property(table, value=None, scale_factor=1):
     """
     Return a property from a given table of values.
@@ -224,17 +245,16 @@ def _get_property(table, value=None, scale_factor=1):
         ret = (scale_factor * table[value]) if value is not None else None
     elif isinstance(value, float):
         ret = (scale_factor * table[int(value)]) if value is not None else None
-    elif isinstance(value, str) and value in atomic_symbols:
-        ret = scale_factor * table[atomic_number(value)]
+    elif isinstance(value, str) and value in _symbol2number:
+        ret = scale_factor * table[_symbol2number[value]]
     elif _np.iterable(value):
         try:
             ret = [scale_factor * table[int(x)] for x in value]
         except ValueError:
-            if not all([(x in atomic_symbols) for x in value]):
+            if not all([(x in _symbol2number) for x in value]):
                 raise ValueError('Not all the values are valid:', value)
             else:
-                ret = [scale_factor * table[int(x)] for x in
-                       atomic_number(value)]
+                ret = [scale_factor * table[_symbol2number[x]] for x in value]
 
     return ret
 
@@ -343,9 +363,7 @@ def atomic_symbol(value=None):
     """
     ret = None
     if value is None:
-        ret = {}
-        for i in range(1, len(atomic_symbols)):
-            ret[atomic_symbols[i]] = i
+        ret = dict(_symbol2number)
     elif isinstance(value, int):
         ret = atomic_symbols[value]
     elif isinstance(value, float):
@@ -404,15 +422,98 @@ def atomic_number(value):
 >>> atomic_number(['H', 'He'])
 [1, 2]
     """
-    symbol_dict = dict(atomic_symbol())
-
-    if isinstance(value, str) and value in atomic_symbols:
-        ret = symbol_dict[str(value)]
-    elif isinstance(value, list):
-        assert (all([x in atomic_symbols for x in value]))
-        ret = [symbol_dict[x] for x in value]
+    if isinstance(value, str) and value in _symbol2number:
+        ret = _symbol2number[value]
     else:
-        assert (all([x in atomic_symbols for x in value]))
-        ret = [symbol_dict[x] for x in value]
+        assert (all([x in _symbol2number for x in value]))
+        ret = [_symbol2number[x] for x in value]
     return ret
 
+
+def atomic_number_array(symbols):
+    """
+    Return the atomic numbers of a list of atomic symbols
+    as a numpy array of integers
+
+    :param symbols: (list) Atomic symbols
+
+    :rtype : numpy.ndarray
+
+    Examples:
+
+>>> from pychemia.utils.periodic import atomic_number_array
+>>> atomic_number_array(['H', 'He', 'H'])
+array([1, 2, 1])
+    """
+    try:
+        return _np.array([_symbol2number[x] for x in symbols], dtype=int)
+    except KeyError:
+        raise ValueError('Not all the values are valid:', symbols)
+
+
+def mass_array(numbers, out=None):
+    """
+    Atomic masses for an array of atomic numbers.
+    The values are taken from a precomputed array, if 'out'
+    is given the values are stored there without allocating
+    a new array
+
+    :param numbers: (numpy.ndarray) Atomic numbers
+    :param out: (numpy.ndarray) Array of floats to store the result
+
+    :rtype : numpy.ndarray
+
+    Examples:
+
+>>> from pychemia.utils.periodic import mass_array
+>>> mass_array([1, 2])
+array([1.00794 , 4.002602])
+    """
+    return _masses.take(numbers, out=out)
+
+
+def covalent_radius_array(numbers, out=None):
+    """
+    Covalent radii in angstroms for an array of atomic numbers.
+    The values are taken from a precomputed array, if 'out'
+    is given the values are stored there without allocating
+    a new array
+
+    :param numbers: (numpy.ndarray) Atomic numbers
+    :param out: (numpy.ndarray) Array of floats to store the result
+
+    :rtype : numpy.ndarray
+
+    Examples:
+
+>>> from pychemia.utils.periodic import covalent_radius_array
+>>> covalent_radius_array([1, 2, 1])
+array([0.31, 0.28, 0.31])
+    """
+    return _covalent_radii.take(numbers, out=out)
+
+
+def valence_array(numbers, out=None):
+    """
+    Valences for an array of atomic numbers, see 'valence'
+
+    :param numbers: (numpy.ndarray) Atomic numbers
+    :param out: (numpy.ndarray) Array of floats to store the result
+
+    :rtype : numpy.ndarray
+    """
+    return _valences.take(numbers, out=out)
+
+
+def electronegativity_array(numbers, out=None):
+    """
+    Electronegativities for an array of atomic numbers,
+    NaN for the elements without value
+
+    :param numbers: (numpy.ndarray) Atomic numbers
+    :param out: (numpy.ndarray) Array of floats to store the result
+
+    :rtype : numpy.ndarray
+    """
+    return _electronegativities.take(numbers, out=out)
+
@@ -12,8 +12,8 @@ setup(
     license='LICENSE.txt',
     description='Python framework for Materials Discovery and Design',
     long_description=open('README.md').read(),
-    install_requires=["numpy >= 1.5",
-                      "scipy >= 0.9",
+    install_requires=["numpy >= 1.10",
+                      "scipy >= 0.17",
                       "pymatgen >= 2.9",
                       "matplotlib >= 1.2",
                       "mayavi >= 4.1",